@@ -1,8 +1,22 @@
-import streamlit as st
-import pickle
-import pandas as pd
-import numpy as np
-from streamlit_option_menu import option_menu
+import os
+import base64
+import logging
+
+# Startup timing starts before anything heavy is imported; see diagnosis/startup.py
+from diagnosis.startup import get_startup_report, start_warmup
+
+startup = get_startup_report()
+with startup.phase('import streamlit'):
+    import streamlit as st
+from diagnosis.registry import get_registry
+
+# NumPy, pandas and the scoring modules are imported inside the functions that need them,
+# so the home page renders without loading them; a background warm-up loads them right after
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+REMOTE_BACKGROUND_URL = "https://www.strategyand.pwc.com/m1/en/strategic-foresight/sector-strategies/healthcare/ai-powered-healthcare-solutions/img01-section1.jpg"
+# MEDAI_FAST_START=1: plain sidebar radio instead of the option_menu component, no remote images
+FAST_START = os.environ.get('MEDAI_FAST_START', '').lower() in ('1', 'true', 'yes')
 
 # Change Name & Logo
 st.set_page_config(
@@ -11,133 +25,279 @@ st.set_page_config(
     layout="wide"
 )
 
-# Hiding Streamlit add-ons
-hide_st_style = """
-            <style>
-            #MainMenu {visibility: hidden;}
-            footer {visibility: hidden;}
-            header {visibility: hidden;}
-            </style>
-            """
-st.markdown(hide_st_style, unsafe_allow_html=True)
-
-# Custom CSS for improved appearance
-custom_css = """
-<style>
-    .main-header {
-        font-size: 3rem !important;
-        font-weight: 700 !important;
-        color: #4FC3F7 !important;
-        text-align: center;
-        margin-bottom: 1rem;
-        text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);
-    }
-    .sub-header {
-        font-size: 1.5rem !important;
-        font-weight: 600 !important;
-        color: #B2EBF2 !important;
-        margin-bottom: 2rem;
-        text-align: center;
-    }
-    .section-header {
-        font-size: 2rem !important;
-        font-weight: 600 !important;
-        color: #81D4FA !important;
-        margin-bottom: 1rem;
-    }
-    .info-box {
-        background-color: rgba(13, 71, 161, 0.7);
-        border-radius: 10px;
-        padding: 20px;
-        margin-bottom: 20px;
-    }
-    .positive-result {
-        background-color: rgba(217, 48, 37, 0.8);
-        padding: 20px;
-        border-radius: 10px;
-        font-weight: bold;
-        text-align: center;
-    }
-    .negative-result {
-        background-color: rgba(46, 125, 50, 0.8);
-        padding: 20px;
-        border-radius: 10px;
-        font-weight: bold;
-        text-align: center;
-    }
-    .result-container {
-        margin-top: 30px;
-        font-size: 1.2rem;
-    }
-    .form-container {
-        background-color: rgba(25, 42, 86, 0.7);
-        padding: 20px;
-        border-radius: 10px;
-    }
-</style>
-"""
-st.markdown(custom_css, unsafe_allow_html=True)
-
-# Adding Background Image
-background_image_url = "https://www.strategyand.pwc.com/m1/en/strategic-foresight/sector-strategies/healthcare/ai-powered-healthcare-solutions/img01-section1.jpg"  # Replace with your image URL
-
-page_bg_img = f"""
-<style>
-[data-testid="stAppViewContainer"] {{
-background-image: url({background_image_url});
-background-size: cover;
-background-position: center;
-background-repeat: no-repeat;
-background-attachment: fixed;
-}}
-
-[data-testid="stAppViewContainer"]::before {{
-content: "";
-position: absolute;
-top: 0;
-left: 0;
-width: 100%;
-height: 100%;
-background-color: rgba(0, 0, 0, 0.75);
-}}
-
-[data-testid="stSidebar"] {{
-background-color: rgba(10, 25, 41, 0.8);
-}}
-</style>
-"""
-st.markdown(page_bg_img, unsafe_allow_html=True)
+# Page styles and the background are read from static/ once per process, not rebuilt on every rerun
+@st.cache_resource
+def load_page_style():
+    with open(os.path.join(STATIC_DIR, 'app.css')) as fh:
+        css = fh.read()
+    background_path = os.path.join(STATIC_DIR, 'background.svg')
+    if os.path.exists(background_path):
+        with open(background_path, 'rb') as fh:
+            background = 'data:image/svg+xml;base64,' + base64.b64encode(fh.read()).decode('ascii')
+    else:
+        background = None if FAST_START else REMOTE_BACKGROUND_URL
+    if background:
+        css += '\n[data-testid="stAppViewContainer"] {\n    background-image: url(%s);\n}\n' % background
+    return f'<style>\n{css}</style>'
+
+with startup.phase('styles'):
+    st.markdown(load_page_style(), unsafe_allow_html=True)
 
 # Header Section
 st.markdown('<p class="main-header">Medical AI Diagnosis System</p>', unsafe_allow_html=True)
 st.markdown('<p class="sub-header">Advanced disease prediction using machine learning</p>', unsafe_allow_html=True)
 
-# Load the saved models
-models = {
-    'diabetes': pickle.load(open('Models/diabetes_model.sav', 'rb')),
-    'heart_disease': pickle.load(open('Models/heart_disease_model.sav', 'rb')),
-    'parkinsons': pickle.load(open('Models/parkinsons_model.sav', 'rb')),
-    'lung_cancer': pickle.load(open('Models/lungs_disease_model.sav', 'rb')),
-    'thyroid': pickle.load(open('Models/Thyroid_model.sav', 'rb'))
+# Load the saved models lazily: each model is unpickled once per process, on first use,
+# and the registry is shared across all sessions instead of being rebuilt on every rerun
+@st.cache_resource
+def load_model_registry():
+    return get_registry()
+
+models = load_model_registry()
+
+# Repeated vectors (sample buttons, re-submitted forms) are answered from a cache shared by all
+# sessions; set MEDAI_PREDICTION_CACHE=sqlite:<path> to share it across processes, or none to disable
+@st.cache_resource
+def load_prediction_cache():
+    from diagnosis.cache import build_cache
+
+    return build_cache(os.environ.get('MEDAI_PREDICTION_CACHE', 'memory'))
+
+# Thread pool the screening panel dispatches the models on, shared by all sessions
+@st.cache_resource
+def load_panel_executor():
+    from diagnosis.panel import get_executor
+
+    return get_executor()
+
+def warm_services():
+    """Build the metrics, drift and router singletons and import the audit log off the request path"""
+    import diagnosis.audit  # noqa: F401
+    import diagnosis.profiling  # noqa: F401
+    from diagnosis.drift import get_drift_monitors
+    from diagnosis.metrics import get_metrics
+    from diagnosis.router import get_model_router
+
+    get_metrics()
+    get_drift_monitors()
+    get_model_router()
+
+# Once per process, after the first page has been rendered: load and exercise every model and
+# build the services below on a background thread; MEDAI_READY_FILE is touched when done
+# (for container readiness probes)
+@st.cache_resource
+def start_model_warmup():
+    return start_warmup(startup, models, os.environ.get('MEDAI_READY_FILE'), [warm_services])
+
+def services_warm():
+    """True once the warm-up has built the services, so the sidebar can read them without importing anything"""
+    return startup.as_dict()['warmup']['status'] == 'done'
+
+logger = logging.getLogger('medai.app')
+
+# Stage timings and counters for every prediction (diagnosis.metrics), shared by all sessions.
+# MEDAI_METRICS_FILE appends a JSON snapshot every MEDAI_METRICS_INTERVAL seconds (default 60)
+# and MEDAI_METRICS_PROM rewrites a Prometheus textfile; MEDAI_PROFILE=cprofile|sample keeps
+# profiles of predictions slower than MEDAI_PROFILE_SLOW_MS (see diagnosis/profiling.py).
+# Like the audit log and drift monitors below, it is created on first use, never at import time
+@st.cache_resource
+def load_metrics():
+    from diagnosis.metrics import SnapshotWriter, get_metrics
+    from diagnosis.profiling import profiler_from_env
+
+    metrics = get_metrics()
+    if os.environ.get('MEDAI_METRICS_FILE') or os.environ.get('MEDAI_METRICS_PROM'):
+        SnapshotWriter(metrics, os.environ.get('MEDAI_METRICS_FILE'),
+                       float(os.environ.get('MEDAI_METRICS_INTERVAL', 60)),
+                       os.environ.get('MEDAI_METRICS_PROM')).start()
+    return metrics, profiler_from_env(metrics)
+
+
+# Every prediction is queued to an append-only audit log (diagnosis.audit) and written by a
+# background thread; MEDAI_AUDIT_LOG sets the SQLite file (default audit/predictions.db) or none
+@st.cache_resource
+def load_audit_log():
+    from diagnosis.audit import DEFAULT_AUDIT_PATH, build_audit
+
+    try:
+        return build_audit(os.environ.get('MEDAI_AUDIT_LOG', DEFAULT_AUDIT_PATH))
+    except Exception:
+        logger.error("Audit log unavailable; predictions are not being recorded", exc_info=True)
+        return None
+
+# Inputs are binned against the training distributions as they are scored (diagnosis.drift);
+# MEDAI_DRIFT_WINDOW limits the comparison to the most recent observations
+@st.cache_resource
+def load_drift_monitors():
+    from diagnosis.drift import get_drift_monitors
+
+    return get_drift_monitors()
+
+# Nearest historical records per disease (diagnosis.similar), memory-mapped from Models/neighbors/
+@st.cache_resource
+def load_neighbor_indexes():
+    from diagnosis.similar import get_neighbor_indexes
+
+    return get_neighbor_indexes()
+
+SIMILAR_PATIENTS = 5
+
+# Primary, shadow and split versions of each model (diagnosis.router), declared in Models/deployments.json
+@st.cache_resource
+def load_model_router():
+    from diagnosis.router import get_model_router
+
+    return get_model_router()
+
+def predict(model_name, features):
+    """Predict a single patient with the version the router picks, going through the shared
+    prediction cache; returns (model, prediction, score)"""
+    import numpy as np
+    from diagnosis import batch
+
+    prediction_cache = load_prediction_cache()
+
+    def score(model, X):
+        def compute(row):
+            predictions, scores = batch.score_array(model, np.asarray([row], dtype=np.float64))
+            return int(predictions[0]), None if scores is None else float(scores[0])
+
+        if prediction_cache is None:
+            prediction, row_score = compute(X[0])
+        else:
+            prediction, row_score = prediction_cache.get_or_compute(model, X[0], compute)
+        return [prediction], None if row_score is None else [row_score]
+
+    version, predictions, scores = load_model_router().score(model_name, np.asarray([features], dtype=np.float64),
+                                                             score)
+    return version.model, predictions[0], None if scores is None else scores[0]
+
+def explain(model_name, features, model=None):
+    """Score, calibrated probability and top contributing features of one patient"""
+    from diagnosis.explain import get_explainer
+    from diagnosis.schema import get_schema
+
+    model = model or models[model_name]
+    return get_explainer(model, get_schema(model_name).columns).explain([features])[0]
+
+# Sidebar menu entry -> disease schema name
+DISEASE_PAGES = {
+    'Diabetes': 'diabetes',
+    'Heart Disease': 'heart_disease',
+    "Parkinson's": 'parkinsons',
+    'Lung Cancer': 'lung_cancer',
+    'Hypo-Thyroid': 'thyroid',
 }
+MENU_OPTIONS = ['Home', 'Screening Panel'] + list(DISEASE_PAGES)
+
+def navigation_menu():
+    """The option_menu component, or a plain radio in fast-start mode or when it is not installed"""
+    if not FAST_START:
+        try:
+            from streamlit_option_menu import option_menu
+        except ImportError:
+            pass
+        else:
+            return option_menu(
+                menu_title=None,
+                options=MENU_OPTIONS,
+                icons=['house', 'clipboard2-pulse', 'activity', 'heart', 'person', 'lungs', 'radioactive'],
+                menu_icon="cast",
+                default_index=0,
+                styles={
+                    "container": {"padding": "5!important", "background-color": "rgba(10, 25, 41, 0.8)"},
+                    "icon": {"color": "#4FC3F7", "font-size": "20px"}, 
+                    "nav-link": {"font-size": "16px", "text-align": "left", "margin":"0px", "--hover-color": "#4A4A4A"},
+                    "nav-link-selected": {"background-color": "#1E88E5"},
+                }
+            )
+    return st.radio("Go to", MENU_OPTIONS, label_visibility="collapsed")
 
 # Create a sidebar menu for disease prediction
-with st.sidebar:
-    st.image("https://cdn-icons-png.flaticon.com/512/4807/4807695.png", width=100)
+with st.sidebar, startup.phase('sidebar'):
+    if not FAST_START:
+        st.image("https://cdn-icons-png.flaticon.com/512/4807/4807695.png", width=100)
     st.title("Navigation")
-    selected = option_menu(
-        menu_title=None,
-        options=['Home', 'Diabetes', 'Heart Disease', 'Parkinson\'s', 'Lung Cancer', 'Hypo-Thyroid'],
-        icons=['house', 'activity', 'heart', 'person', 'lungs', 'radioactive'],
-        menu_icon="cast",
-        default_index=0,
-        styles={
-            "container": {"padding": "5!important", "background-color": "rgba(10, 25, 41, 0.8)"},
-            "icon": {"color": "#4FC3F7", "font-size": "20px"}, 
-            "nav-link": {"font-size": "16px", "text-align": "left", "margin":"0px", "--hover-color": "#4A4A4A"},
-            "nav-link-selected": {"background-color": "#1E88E5"},
-        }
-    )
+    selected = navigation_menu()
+
+def display_service_stats():
+    """Prediction metrics, model versions and input drift (inside the sidebar)"""
+    metrics, profiler = load_metrics()
+    drift_monitors = load_drift_monitors()
+    with st.expander("Prediction metrics", expanded=False):
+        snapshot = metrics.snapshot()
+        for counter in snapshot['counters']:
+            labels = ', '.join(f"{value}" for value in counter['labels'].values())
+            st.caption(f"{counter['name']} ({labels}): {counter['value']:,}")
+        for histogram in snapshot['histograms']:
+            if histogram['name'] == 'stage_seconds' and histogram['count']:
+                labels = histogram['labels']
+                st.caption(f"{labels.get('disease')} {labels.get('stage')}: {histogram['mean'] * 1000.0:.2f} ms mean over {histogram['count']:,}")
+        for capture in list(profiler.captures)[-5:]:
+            st.caption(f"Slow: {capture['name']} {capture['elapsed_ms']:.0f} ms -> {capture['path']}")
+        st.download_button("Prometheus metrics", data=metrics.to_prometheus(), file_name="medai_metrics.prom",
+                           mime="text/plain", key="metrics_download")
+
+    deployments = load_model_router().stats()['deployments']
+    if any(len(deployment['versions']) > 1 for deployment in deployments.values()):
+        with st.expander("Model versions", expanded=False):
+            for name, deployment in deployments.items():
+                for version, entry in deployment['versions'].items():
+                    # Shadows only score in the background; their latency is read from that traffic
+                    traffic = entry if entry['requests'] else entry['background']
+                    if not traffic['requests']:
+                        continue
+                    agreement = '' if entry['agreement'] is None else f", {entry['agreement']:.1%} agreement"
+                    st.caption(f"{name} {version} ({entry['mode']}): {entry['requests']:,} served, "
+                               f"{entry['background']['requests']:,} in background, "
+                               f"p50 {traffic['latency']['p50_ms']:.2f} ms{agreement}")
+
+    with st.expander("Input drift", expanded=False):
+        drift_report = drift_monitors.report()
+        if not drift_report:
+            st.caption("No inputs scored yet")
+        for name, entry in drift_report.items():
+            st.caption(f"{name}: {entry['rows']:,} inputs, max PSI {entry['max_psi']:.3f} ({entry['max_psi_feature']})")
+            if entry['drifted']:
+                st.caption(f"Shifted from training data: {', '.join(entry['drifted'])}")
+
+def display_sidebar_stats():
+    """Model load, cache and startup timings; rendered after the page so they never delay it"""
+    with st.sidebar:
+        # Cold-start / load cost of the models used so far in this process
+        with st.expander("Model load stats", expanded=False):
+            model_stats = models.stats()
+            if model_stats:
+                for name, stats in model_stats.items():
+                    st.caption(f"{name}: {stats['load_ms']:.1f} ms, {stats['memory_bytes'] / 1024:.1f} KiB")
+            else:
+                st.caption("No models loaded yet")
+            prediction_cache = load_prediction_cache()
+            if prediction_cache is not None:
+                cache_stats = prediction_cache.stats()
+                st.caption(f"Prediction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries")
+            audit_log = load_audit_log() if services_warm() else None
+            if audit_log is not None:
+                audit_stats = audit_log.stats()
+                st.caption(f"Audit log: {audit_stats['written']:,} written, {audit_stats['dropped']:,} dropped, {audit_stats['queue_depth']:,} queued")
+
+        # Read only once the warm-up has built them, so this never imports the scoring stack itself
+        if services_warm():
+            display_service_stats()
+        else:
+            st.caption("Metrics, model versions and drift appear once the warm-up has finished")
+
+        with st.expander("Startup timing", expanded=False):
+            report = startup.as_dict()
+            for name, ms in report['phases_ms'].items():
+                st.caption(f"{name}: {ms:.1f} ms")
+            if report['first_render_ms'] is not None:
+                st.caption(f"First render: {report['first_render_ms']:.1f} ms after process start")
+            warmup = report['warmup']
+            if warmup['status'] == 'done':
+                st.caption(f"Warm-up: {len(warmup['models_ms'])} models in {warmup['total_ms']:.1f} ms")
+            else:
+                st.caption(f"Warm-up: {warmup['status']}")
 
 def display_input(label, tooltip, key, min_val=None, max_val=None, type="text", options=None, default=None):
     """Enhanced input display function with better tooltips and validation"""
@@ -163,7 +323,7 @@ def display_input(label, tooltip, key, min_val=None, max_val=None, type="text",
             return st.slider(label, key=key, help=tooltip, min_value=min_val, max_value=max_val, 
                            value=default if default is not None else min_val)
     elif type == "select":
-        return st.selectbox(label, options, index=0 if default is None else options.index(default), help=tooltip)
+        return st.selectbox(label, options, index=0 if default is None else options.index(default), help=tooltip, key=key)
 
 def display_disease_info(title, description, symptoms, risk_factors):
     """Display formatted disease information"""
@@ -190,304 +350,220 @@ def display_result(prediction, positive_message, negative_message):
         st.markdown(f'<div class="negative-result">{negative_message}</div>', unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
-# Home Page
-if selected == 'Home':
-    st.markdown('<p class="section-header">Welcome to Medical AI Diagnosis</p>', unsafe_allow_html=True)
-    
-    st.markdown("""
-    <div class="info-box">
-        <h3>About This Application</h3>
-        <p>This application uses machine learning algorithms to predict the likelihood of five common medical conditions based on patient data. The models have been trained on medical datasets and can provide preliminary assessments.</p>
-        
-        <h3>Available Disease Predictions</h3>
-        <ul>
-            <li><strong>Diabetes</strong>: Predicts diabetes based on medical and demographic factors</li>
-            <li><strong>Heart Disease</strong>: Evaluates the risk of coronary heart disease</li>
-            <li><strong>Parkinson's Disease</strong>: Analyzes voice recordings for Parkinson's indicators</li>
-            <li><strong>Lung Cancer</strong>: Assesses lung cancer risk based on symptoms and history</li>
-            <li><strong>Hypo-Thyroid</strong>: Evaluates thyroid function and detects hypothyroidism</li>
-        </ul>
-        
-        <h3>How to Use</h3>
-        <p>Select a disease from the sidebar menu, fill in the required information, and click the prediction button to get your result.</p>
-        
-        <h3>Disclaimer</h3>
-        <p>This tool is for educational purposes only and does not replace professional medical advice. Always consult with a healthcare provider for proper diagnosis and treatment.</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-# Diabetes Prediction Page
-elif selected == 'Diabetes':
-    display_disease_info(
-        "Diabetes Prediction",
-        "Diabetes is a chronic disease that occurs when the pancreas is no longer able to make insulin, or when the body cannot make good use of the insulin it produces.",
-        "Frequent urination, increased thirst, extreme hunger, unexplained weight loss, fatigue, irritability, blurred vision, slow-healing sores.",
-        "Family history, age, excess weight, physical inactivity, race, high blood pressure, abnormal cholesterol levels."
-    )
-    
-    with st.form("diabetes_form"):
-        st.markdown('<div class="form-container">', unsafe_allow_html=True)
-        st.subheader("Enter Patient Details")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            Pregnancies = display_input('Number of Pregnancies', 'Number of times pregnant', 'Pregnancies', 0, 20, 'number')
-            Glucose = display_input('Glucose Level', 'Plasma glucose concentration (mg/dL)', 'Glucose', 0.0, 200.0, 'slider')
-            BloodPressure = display_input('Blood Pressure', 'Diastolic blood pressure (mm Hg)', 'BloodPressure', 0.0, 122.0, 'slider')
-            SkinThickness = display_input('Skin Thickness', 'Triceps skin fold thickness (mm)', 'SkinThickness', 0.0, 100.0, 'slider')
-        
-        with col2:
-            Insulin = display_input('Insulin Level', '2-Hour serum insulin (mu U/ml)', 'Insulin', 0, 846, 'number')
-            BMI = display_input('BMI value', 'Body Mass Index (weight in kg/(height in m)²)', 'BMI', 0.0, 67.1, 'slider')
-            DiabetesPedigreeFunction = display_input('Diabetes Pedigree Function', 'Diabetes pedigree function (genetic influence)', 'DiabetesPedigreeFunction', 0.078, 2.42, 'slider')
-            Age = display_input('Age', 'Age in years', 'Age', 21.0, 81.0, 'slider')
-        
-        # Submit buttons
-        col1, col2, col3 = st.columns([1, 1, 2])
-        with col1:
-            positive_sample = st.form_submit_button("Load & Predict with Positive Sample")
-        with col2:
-            negative_sample = st.form_submit_button("Load & Predict with Negative Sample")
-        with col3:
-            submitted = st.form_submit_button("Predict with Current Data")
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-    # Handle predictions with sample data or user input
-    if positive_sample:
-        # Load positive sample values
-        Pregnancies = 6
-        Glucose = 148
-        BloodPressure = 72
-        SkinThickness = 35
-        Insulin = 155 
-        BMI = 33.6
-        DiabetesPedigreeFunction = 0.627
-        Age = 50
-        
-        # Make prediction with positive sample
-        try:
-            diab_prediction = models['diabetes'].predict([[Pregnancies, Glucose, BloodPressure, SkinThickness, Insulin, BMI, DiabetesPedigreeFunction, Age]])
-            display_result(
-                diab_prediction[0], 
-                "POSITIVE: The analysis indicates diabetes. Please consult with a healthcare provider.",
-                "NEGATIVE: The analysis does not indicate diabetes. Maintain a healthy lifestyle."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            
-    elif negative_sample:
-        # Load negative sample values
-        Pregnancies = 1
-        Glucose = 85
-        BloodPressure = 66
-        SkinThickness = 29
-        Insulin = 85
-        BMI = 26.6
-        DiabetesPedigreeFunction = 0.351
-        Age = 31
-        
-        # Make prediction with negative sample
-        try:
-            diab_prediction = models['diabetes'].predict([[Pregnancies, Glucose, BloodPressure, SkinThickness, Insulin, BMI, DiabetesPedigreeFunction, Age]])
-            display_result(
-                diab_prediction[0], 
-                "POSITIVE: The analysis indicates diabetes. Please consult with a healthcare provider.",
-                "NEGATIVE: The analysis does not indicate diabetes. Maintain a healthy lifestyle."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            
-    elif submitted:
-        try:
-            diab_prediction = models['diabetes'].predict([[Pregnancies, Glucose, BloodPressure, SkinThickness, Insulin, BMI, DiabetesPedigreeFunction, Age]])
-            display_result(
-                diab_prediction[0], 
-                "POSITIVE: The analysis indicates diabetes. Please consult with a healthcare provider.",
-                "NEGATIVE: The analysis does not indicate diabetes. Maintain a healthy lifestyle."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
+def display_explanation(schema, explanation):
+    """Calibrated probability and the inputs that moved the model's score the most"""
+    if 'probability' in explanation:
+        st.metric("Probability of a positive result", f"{explanation['probability']:.1%}")
+    if explanation.get('top_features'):
+        st.markdown("**Main factors**, compared with the average patient in the training data:")
+        for item in explanation['top_features']:
+            feature = schema.feature(item['feature'])
+            label = feature.label if feature is not None else item['feature']
+            direction = "raises" if item['contribution'] > 0 else "lowers"
+            st.caption(f"{label} = {item['value']:g} {direction} the score by {abs(item['contribution']):.2f}")
 
-# Heart Disease Prediction Page
-elif selected == 'Heart Disease':
-    display_disease_info(
-        "Heart Disease Prediction",
-        "Heart disease refers to a range of conditions that affect your heart, including coronary artery disease, heart rhythm problems (arrhythmias), and congenital heart defects.",
-        "Chest pain, shortness of breath, pain in the neck, jaw, throat, upper abdomen or back, numbness, weakness, coldness in legs or arms.",
-        "Age, sex, family history, smoking, poor diet, high blood pressure, high blood cholesterol, diabetes, obesity, physical inactivity, stress."
-    )
-    
-    with st.form("heart_disease_form"):
-        st.markdown('<div class="form-container">', unsafe_allow_html=True)
-        st.subheader("Enter Patient Details")
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            age = display_input('Age', 'Age in years', 'age', 20.0, 100.0, 'slider')
-            sex = display_input('Sex', 'Gender of the person', 'sex', type='select', options=['Female', 'Male'])
-            sex = 1 if sex == 'Male' else 0
-            cp = display_input('Chest Pain Type', 'Type of chest pain experienced', 'cp', type='select', 
-                              options=['Typical Angina', 'Atypical Angina', 'Non-anginal Pain', 'Asymptomatic'])
-            cp_map = {'Typical Angina': 0, 'Atypical Angina': 1, 'Non-anginal Pain': 2, 'Asymptomatic': 3}
-            cp = cp_map[cp]
-            trestbps = display_input('Resting Blood Pressure', 'Resting blood pressure (mm Hg)', 'trestbps', 90.0, 200.0, 'slider')
-        
-        with col2:
-            chol = display_input('Serum Cholesterol', 'Serum cholesterol (mg/dl)', 'chol', 100.0, 600.0, 'slider')
-            fbs = display_input('Fasting Blood Sugar', 'Fasting blood sugar > 120 mg/dl', 'fbs', type='select', options=['No', 'Yes'])
-            fbs = 1 if fbs == 'Yes' else 0
-            restecg = display_input('Resting ECG', 'Resting electrocardiographic results', 'restecg', type='select', 
-                                   options=['Normal', 'ST-T Wave Abnormality', 'Left Ventricular Hypertrophy'])
-            restecg_map = {'Normal': 0, 'ST-T Wave Abnormality': 1, 'Left Ventricular Hypertrophy': 2}
-            restecg = restecg_map[restecg]
-            thalach = display_input('Max Heart Rate', 'Maximum heart rate achieved', 'thalach', 70.0, 220.0, 'slider')
-        
-        with col3:
-            exang = display_input('Exercise Induced Angina', 'Exercise induced angina', 'exang', type='select', options=['No', 'Yes'])
-            exang = 1 if exang == 'Yes' else 0
-            oldpeak = display_input('ST Depression', 'ST depression induced by exercise relative to rest', 'oldpeak', 0.0, 6.2, 'slider')
-            slope = display_input('Slope of ST Segment', 'Slope of the peak exercise ST segment', 'slope', type='select', 
-                                 options=['Upsloping', 'Flat', 'Downsloping'])
-            slope_map = {'Upsloping': 0, 'Flat': 1, 'Downsloping': 2}
-            slope = slope_map[slope]
-            ca = display_input('Number of Major Vessels', 'Number of major vessels colored by fluoroscopy', 'ca', 0.0, 3.0, 'slider')
-            thal = display_input('Thalassemia', 'Type of thalassemia', 'thal', type='select', 
-                               options=['Normal', 'Fixed Defect', 'Reversible Defect'])
-            thal_map = {'Normal': 0, 'Fixed Defect': 1, 'Reversible Defect': 2}
-            thal = thal_map[thal]
-        
-        # Submit buttons
-        col1, col2, col3 = st.columns([1, 1, 2])
-        with col1:
-            positive_sample = st.form_submit_button("Load & Predict with Positive Sample")
-        with col2:
-            negative_sample = st.form_submit_button("Load & Predict with Negative Sample")
-        with col3:
-            submitted = st.form_submit_button("Predict with Current Data")
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-    # Handle predictions with sample data or user input
-    if positive_sample:
-        # Sample values for a positive heart disease case
-        age = 65
-        sex = 1  # Male
-        cp = 3   # Asymptomatic
-        trestbps = 160
-        chol = 280
-        fbs = 0  # No
-        restecg = 2  # Left Ventricular Hypertrophy
-        thalach = 130
-        exang = 1  # Yes
-        oldpeak = 3.1
-        slope = 2  # Downsloping
-        ca = 2
-        thal = 2  # Reversible Defect
-        
-        # Make prediction with positive sample
+def display_similar_patients(schema, features):
+    """Outcomes of the most similar patients in the training data, as context for the prediction"""
+    result = load_neighbor_indexes().neighbors(schema.name, [features], SIMILAR_PATIENTS)[0]
+    cases = result['neighbors']
+    positives = sum(case['outcome'] for case in cases)
+    st.markdown(f"**{positives} of the {len(cases)} most similar patients** on record had a positive diagnosis.")
+    with st.expander("Similar patients", expanded=False):
+        rows = []
+        for case in cases:
+            row = {"Outcome": "Positive" if case['outcome'] == 1 else "Negative", "Distance": round(case['distance'], 3)}
+            for feature in schema.features:
+                value = case['values'][feature.column]
+                labels = {float(code): label for label, code in feature.options.items()}
+                row[feature.label] = labels.get(round(value), f"{value:g}") if feature.categorical else f"{value:g}"
+            rows.append(row)
+        st.dataframe(rows, hide_index=True)
+        st.caption("Distance is measured over all inputs, each scaled by its spread in the training data.")
+
+def display_batch_scoring(model_name):
+    """Score an uploaded CSV export in one vectorized pass and offer the results for download"""
+    from diagnosis import batch
+
+    with st.expander("Batch scoring (CSV upload)", expanded=False):
+        st.markdown("Upload a CSV with the same columns as the training dataset. Column order and case do not matter; extra columns are kept in the output, followed by the prediction, its probability and the three features that contributed most.")
+        uploaded = st.file_uploader("Patient records (CSV)", type=["csv"], key=f"{model_name}_batch_upload")
+        if uploaded is None:
+            return
+        metrics, _ = load_metrics()
         try:
-            heart_prediction = models['heart_disease'].predict([[age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca, thal]])
-            display_result(
-                heart_prediction[0], 
-                "POSITIVE: The analysis indicates heart disease. Please consult with a cardiologist.",
-                "NEGATIVE: The analysis does not indicate heart disease. Maintain a healthy lifestyle."
-            )
+            with metrics.time('batch', disease=model_name):
+                frame = batch.read_csv(uploaded)
+                result = batch.score_frame(models[model_name], model_name, frame, explain=True, audit=load_audit_log(),
+                                           drift=load_drift_monitors())
         except Exception as e:
+            metrics.inc('errors_total', disease=model_name, stage='batch')
+            logger.warning("%s batch scoring failed", model_name, exc_info=True)
             st.error(f"An error occurred: {e}")
-            
-    elif negative_sample:
-        # Sample values for a negative heart disease case
-        age = 40
-        sex = 0  # Female
-        cp = 1   # Atypical Angina
-        trestbps = 120
-        chol = 180
-        fbs = 0  # No
-        restecg = 0  # Normal
-        thalach = 178
-        exang = 0  # No
-        oldpeak = 0.8
-        slope = 0  # Upsloping
-        ca = 0
-        thal = 0  # Normal
-        
-        # Make prediction with negative sample
+            return
+        metrics.inc('batch_rows_total', result.rows, disease=model_name)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rows scored", f"{result.rows:,}")
+        col2.metric("Positive predictions", f"{result.positives:,}")
+        col3.metric("Throughput", f"{result.rows_per_second:,.0f} rows/s")
+        st.dataframe(result.frame.head(100))
+        st.download_button(
+            "Download results",
+            data=result.to_csv_bytes(),
+            file_name=f"{model_name}_predictions.csv",
+            mime="text/csv",
+            key=f"{model_name}_batch_download",
+        )
+
+# Cached per recording, so reruns (e.g. pressing the predict button) do not repeat the extraction
+@st.cache_data(max_entries=32, show_spinner=False)
+def extract_voice_features(data):
+    import io
+    import time
+
+    from diagnosis.voice import extract
+
+    start = time.perf_counter()
+    features, summary = extract(io.BytesIO(data))
+    summary['seconds'] = time.perf_counter() - start
+    return features, summary
+
+def display_voice_recording(schema):
+    """Compute the voice measures from an uploaded sustained-vowel recording and predict from them"""
+    with st.expander("Analyse a voice recording (WAV)", expanded=False):
+        st.markdown("Upload a recording of a sustained vowel (\"aaah\" held for 3 seconds or more, WAV). All 22 measures above are computed from it: pitch, jitter, shimmer, noise and nonlinear dynamics.")
+        uploaded = st.file_uploader("Sustained vowel (WAV)", type=["wav"], key=f"{schema.name}_voice_upload")
+        if uploaded is None:
+            return
+        metrics, profiler = load_metrics()
         try:
-            heart_prediction = models['heart_disease'].predict([[age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca, thal]])
-            display_result(
-                heart_prediction[0], 
-                "POSITIVE: The analysis indicates heart disease. Please consult with a cardiologist.",
-                "NEGATIVE: The analysis does not indicate heart disease. Maintain a healthy lifestyle."
-            )
+            with metrics.time('extract', disease=schema.name):
+                features, summary = extract_voice_features(uploaded.getvalue())
         except Exception as e:
-            st.error(f"An error occurred: {e}")
-            
-    elif submitted:
+            metrics.inc('errors_total', disease=schema.name, stage='extract')
+            logger.warning("Voice feature extraction failed", exc_info=not isinstance(e, ValueError))
+            st.error(f"Could not analyse the recording: {e}")
+            return
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Recording", f"{summary['audio_seconds']:.1f} s")
+        col2.metric("Glottal cycles", f"{summary['cycles']:,}")
+        col3.metric("Extraction time", f"{summary['seconds'] * 1000.0:.0f} ms")
+        st.dataframe({"Measure": list(features), "Value": [f"{value:.6g}" for value in features.values()]},
+                     hide_index=True)
+        if st.button("Predict from recording", key=f"{schema.name}_voice_predict"):
+            with profiler.profile(f'predict-{schema.name}'):
+                predict_and_display(schema, features)
+
+# Sweeps are scored at full resolution; 2-D surfaces are drawn on every few grid points only
+WHAT_IF_POINTS = 200
+WHAT_IF_DISPLAY_POINTS = 50
+
+def _what_if_axis(feature, values, field, axis):
+    """Chart columns and Altair channels for one swept feature: option labels if categorical, else cells"""
+    import altair as alt
+
+    channel, channel2 = (alt.X, alt.X2) if axis == 'x' else (alt.Y, alt.Y2)
+    if feature.categorical:
+        labels = {code: label for label, code in feature.options.items()}
+        return {field: [labels.get(value, f"{value:g}") for value in values]}, [channel(f"{field}:O", title=feature.label)]
+    step = values[1] - values[0] if len(values) > 1 else 1.0
+    return ({field: values, f"{field}_end": values + step},
+            [channel(f"{field}:Q", title=feature.label, scale=alt.Scale(zero=False)), channel2(f"{field}_end:Q")])
+
+def display_what_if(schema, values):
+    """Risk curve or surface as one or two inputs vary around a base patient, scored in one batched call"""
+    with st.expander("What-if analysis", expanded=False):
+        st.markdown("Pick one or two inputs to vary over their whole range while the others stay fixed. Every combination is scored in a single batched call; the chart shows the risk and the values where the prediction changes.")
+        labels = {feature.label: feature.key for feature in schema.features}
+        col1, col2 = st.columns([2, 1])
+        chosen = col1.multiselect("Inputs to vary", list(labels), max_selections=2, key=f"{schema.name}_what_if_features")
+        base_choice = col2.radio("Base patient", ["Form values", "Positive sample", "Negative sample"],
+                                 key=f"{schema.name}_what_if_base")
+        if not chosen:
+            return
+        base = {"Form values": values, "Positive sample": schema.positive_sample,
+                "Negative sample": schema.negative_sample}[base_choice]
+        metrics, _ = load_metrics()
         try:
-            heart_prediction = models['heart_disease'].predict([[age, sex, cp, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca, thal]])
-            display_result(
-                heart_prediction[0], 
-                "POSITIVE: The analysis indicates heart disease. Please consult with a cardiologist.",
-                "NEGATIVE: The analysis does not indicate heart disease. Maintain a healthy lifestyle."
-            )
+            from diagnosis.sensitivity import sweep
+
+            with metrics.time('sensitivity', disease=schema.name):
+                result = sweep(models[schema.name], schema.name, base, [labels[label] for label in chosen],
+                               WHAT_IF_POINTS, router=load_model_router())
         except Exception as e:
+            metrics.inc('errors_total', disease=schema.name, stage='sensitivity')
+            logger.warning("%s what-if sweep failed", schema.name, exc_info=not isinstance(e, ValueError))
             st.error(f"An error occurred: {e}")
+            return
+        display_what_if_result(result)
 
-# Parkinson's Prediction Page
-elif selected == "Parkinson's":
-    display_disease_info(
-        "Parkinson's Disease Prediction",
-        "Parkinson's disease is a progressive nervous system disorder that affects movement. Symptoms start gradually, sometimes with a barely noticeable tremor in just one hand.",
-        "Tremor, slowed movement, rigid muscles, impaired posture and balance, loss of automatic movements, speech changes, writing changes.",
-        "Age, heredity, sex (men are more likely to develop Parkinson's disease than women), exposure to toxins, serious head injury."
-    )
-    
-    with st.form("parkinsons_form"):
+def display_what_if_result(result):
+    """Line or bar chart of a one-feature sweep, heatmap of a two-feature sweep, plus the boundary crossings"""
+    import altair as alt
+    import numpy as np
+    import pandas as pd
+
+    risk_title = "Probability of a positive result" if result.risk_kind == 'probability' else "Decision score"
+    col1, col2 = st.columns(2)
+    col1.metric("Base patient", f"{result.base_risk:.1%}" if result.risk_kind == 'probability' else f"{result.base_risk:.3f}")
+    col2.metric("Grid scored", f"{result.rows:,} points in {result.seconds * 1000.0:.1f} ms")
+
+    features = result.features
+    if len(features) == 1:
+        columns, encodings = _what_if_axis(features[0], result.values[0], 'value', 'x')
+        frame = pd.DataFrame({**columns, 'risk': result.risk})
+        risk = alt.Y('risk:Q', title=risk_title)
+        if features[0].categorical:
+            chart = alt.Chart(frame).mark_bar().encode(encodings[0], risk)
+        else:
+            chart = alt.Chart(frame).mark_line().encode(encodings[0], risk)
+            chart += alt.Chart(pd.DataFrame({'value': result.base_values})).mark_rule(strokeDash=[4, 4]).encode(x='value:Q')
+        st.altair_chart(chart)
+        for crossing in result.crossings:
+            change = "positive" if crossing['prediction'] == 1 else "negative"
+            st.caption(f"The prediction turns {change} at {features[0].label} ≈ {crossing[features[0].column]:.4g}")
+    else:
+        # Keep every n-th grid point per axis for drawing; categorical axes are short and kept whole
+        steps = [1 if feature.categorical else max(1, len(axis) // WHAT_IF_DISPLAY_POINTS)
+                 for feature, axis in zip(features, result.values)]
+        xs, ys = result.values[0][::steps[0]], result.values[1][::steps[1]]
+        surface = result.risk[::steps[1], ::steps[0]]
+        x_columns, x_encodings = _what_if_axis(features[0], xs, 'x', 'x')
+        y_columns, y_encodings = _what_if_axis(features[1], ys, 'y', 'y')
+        frame = pd.DataFrame({
+            **{key: np.tile(np.asarray(value, dtype=object), len(ys)) for key, value in x_columns.items()},
+            **{key: np.repeat(np.asarray(value, dtype=object), len(xs)) for key, value in y_columns.items()},
+            'risk': surface.ravel(),
+        })
+        chart = alt.Chart(frame).mark_rect().encode(
+            *x_encodings, *y_encodings,
+            color=alt.Color('risk:Q', title=risk_title, scale=alt.Scale(scheme='redyellowblue', reverse=True)))
+        st.altair_chart(chart)
+        if result.crossings:
+            st.caption(f"The decision boundary crosses the grid at {len(result.crossings):,} points.")
+    if not result.crossings:
+        st.caption("The prediction does not change anywhere in this range.")
+
+def display_disease_form(schema):
+    """Render a disease's input form from its schema; returns the entered values and which button was pressed"""
+    with st.form(f"{schema.name}_form"):
         st.markdown('<div class="form-container">', unsafe_allow_html=True)
-        st.subheader("Enter Voice Recording Measurements")
-        st.markdown("*Note: These are technical voice parameters measured from recordings. For actual diagnosis, a professional analysis is required.*")
-        
-        # Use tabs to organize the many parameters
-        tab1, tab2, tab3 = st.tabs(["Frequency Measures", "Jitter & Shimmer", "Other Measures"])
-        
-        with tab1:
-            col1, col2 = st.columns(2)
-            with col1:
-                fo = display_input('MDVP:Fo(Hz)', 'Average vocal fundamental frequency', 'fo', 80, 260, 'number')
-                fhi = display_input('MDVP:Fhi(Hz)', 'Maximum vocal fundamental frequency', 'fhi', 100, 600, 'number')
-            with col2:
-                flo = display_input('MDVP:Flo(Hz)', 'Minimum vocal fundamental frequency', 'flo', 60, 240, 'number')
-                
-        with tab2:
-            col1, col2 = st.columns(2)
-            with col1:
-                Jitter_percent = display_input('MDVP:Jitter(%)', 'Frequency variation measure (percentage)', 'Jitter_percent', 0.0, 1.0, 'number')
-                Jitter_Abs = display_input('MDVP:Jitter(Abs)', 'Absolute jitter in microseconds', 'Jitter_Abs', 0.0, 0.01, 'number')
-                RAP = display_input('MDVP:RAP', 'Relative amplitude perturbation', 'RAP', 0.0, 0.05, 'number')
-                PPQ = display_input('MDVP:PPQ', 'Five-point period perturbation quotient', 'PPQ', 0.0, 0.05, 'number')
-                DDP = display_input('Jitter:DDP', 'Average absolute difference of differences of consecutive periods', 'DDP', 0.0, 0.1, 'number')
-            with col2:
-                Shimmer = display_input('MDVP:Shimmer', 'Amplitude variation measure', 'Shimmer', 0.0, 0.2, 'number')
-                Shimmer_dB = display_input('MDVP:Shimmer(dB)', 'Shimmer in decibels', 'Shimmer_dB', 0.0, 2.0, 'number')
-                APQ3 = display_input('Shimmer:APQ3', 'Three-point amplitude perturbation quotient', 'APQ3', 0.0, 0.05, 'number')
-                APQ5 = display_input('Shimmer:APQ5', 'Five-point amplitude perturbation quotient', 'APQ5', 0.0, 0.1, 'number')
-                APQ = display_input('MDVP:APQ', 'Amplitude perturbation quotient', 'APQ', 0.0, 0.15, 'number')
-                DDA = display_input('Shimmer:DDA', 'Average absolute differences of consecutive differences', 'DDA', 0.0, 0.15, 'number')
-                
-        with tab3:
-            col1, col2 = st.columns(2)
-            with col1:
-                NHR = display_input('NHR', 'Noise-to-harmonics ratio', 'NHR', 0.0, 0.5, 'number')
-                HNR = display_input('HNR', 'Harmonics-to-noise ratio', 'HNR', 0.0, 35.0, 'number')
-            with col2:
-                RPDE = display_input('RPDE', 'Recurrence period density entropy', 'RPDE', 0.0, 1.0, 'number')
-                DFA = display_input('DFA', 'Detrended fluctuation analysis', 'DFA', 0.0, 1.0, 'number')
-                spread1 = display_input('Spread1', 'Nonlinear measure of fundamental frequency variation', 'spread1', -10.0, 10.0, 'number')
-                spread2 = display_input('Spread2', 'Nonlinear measure of fundamental frequency variation', 'spread2', 0.0, 1.0, 'number')
-                D2 = display_input('D2', 'Correlation dimension', 'D2', 0.0, 5.0, 'number')
-                PPE = display_input('PPE', 'Pitch period entropy', 'PPE', 0.0, 1.0, 'number')
-        
+        st.subheader(schema.form_title)
+        if schema.form_note:
+            st.markdown(schema.form_note)
+
+        # Sections with a title become tabs (e.g. the many Parkinson's voice measures)
+        titles = [title for title, _ in schema.sections]
+        containers = st.tabs(titles) if any(titles) else [st.container() for _ in schema.sections]
+        values = {}
+        for container, (_, column_keys) in zip(containers, schema.sections):
+            with container:
+                for column, keys in zip(st.columns(len(column_keys)), column_keys):
+                    with column:
+                        for key in keys:
+                            feature = schema.by_key[key]
+                            values[key] = display_input(feature.label, feature.help, feature.key, feature.min_value,
+                                                        feature.max_value, feature.widget, feature.option_labels or None)
+
         # Submit buttons
         col1, col2, col3 = st.columns([1, 1, 2])
         with col1:
@@ -497,267 +573,174 @@ elif selected == "Parkinson's":
         with col3:
             submitted = st.form_submit_button("Predict with Current Data")
         st.markdown('</div>', unsafe_allow_html=True)
-        
+    return values, positive_sample, negative_sample, submitted
+
+def predict_and_display(schema, values):
+    """Parse, vectorize, score and render one patient, timing each stage and counting failures"""
+    metrics, _ = load_metrics()
+    stage = 'parse'
+    try:
+        with metrics.time('parse', disease=schema.name):
+            record = schema.canonical(values)
+            missing = schema.missing(record)
+            if missing:
+                raise ValueError(f"Please fill in: {', '.join(missing)}")
+        stage = 'vectorize'
+        with metrics.time('vectorize', disease=schema.name):
+            features = schema.vectorize_one(record)
+        stage = 'model'
+        with metrics.time('model', disease=schema.name):
+            model, prediction, score = predict(schema.name, features)
+            audit_log = load_audit_log()
+            if audit_log is not None:
+                audit_log.record(schema.name, model, features, prediction, score, source='app')
+            load_drift_monitors().observe(schema.name, features)
+        stage = 'explain'
+        with metrics.time('explain', disease=schema.name):
+            explanation = explain(schema.name, features, model)
+        stage = 'render'
+        with metrics.time('render', disease=schema.name):
+            display_result(prediction, schema.positive_message, schema.negative_message)
+            display_explanation(schema, explanation)
+        stage = 'similar'
+        with metrics.time('similar', disease=schema.name):
+            display_similar_patients(schema, features)
+    except Exception as e:
+        metrics.inc('errors_total', disease=schema.name, stage=stage)
+        logger.warning("%s prediction failed at %s", schema.name, stage, exc_info=not isinstance(e, ValueError))
+        st.error(f"An error occurred: {e}")
+        return
+    metrics.inc('predictions_total', disease=schema.name, result='positive' if prediction == 1 else 'negative')
+
+def display_disease_page(schema):
+    """Information, input form, prediction and batch scoring for one disease"""
+    display_disease_info(schema.title, schema.description, schema.symptoms, schema.risk_factors)
+    values, positive_sample, negative_sample, submitted = display_disease_form(schema)
+
     # Handle predictions with sample data or user input
     if positive_sample:
-        # Sample values for a positive Parkinson's case
-        fo = 119.992
-        fhi = 157.302
-        flo = 74.997
-        Jitter_percent = 0.00662
-        Jitter_Abs = 0.00004
-        RAP = 0.00401
-        PPQ = 0.00317
-        DDP = 0.01204
-        Shimmer = 0.04374
-        Shimmer_dB = 0.42600
-        APQ3 = 0.02182
-        APQ5 = 0.03130
-        APQ = 0.02971
-        DDA = 0.06545
-        NHR = 0.02211
-        HNR = 21.033
-        RPDE = 0.525867
-        DFA = 0.741751
-        spread1 = -6.759571
-        spread2 = 0.162699
-        D2 = 2.103956
-        PPE = 0.210859
-        
-        # Make prediction with positive sample
-        try:
-            parkinsons_prediction = models['parkinsons'].predict([[fo, fhi, flo, Jitter_percent, Jitter_Abs, RAP, PPQ, DDP, Shimmer, Shimmer_dB, APQ3, APQ5, APQ, DDA, NHR, HNR, RPDE, DFA, spread1, spread2, D2, PPE]])
-            display_result(
-                parkinsons_prediction[0], 
-                "POSITIVE: The analysis indicates Parkinson's disease. Please consult with a neurologist.",
-                "NEGATIVE: The analysis does not indicate Parkinson's disease."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            
+        values = schema.positive_sample
     elif negative_sample:
-        # Sample values for a negative Parkinson's case
-        fo = 169.571
-        fhi = 193.516
-        flo = 140.394
-        Jitter_percent = 0.00370
-        Jitter_Abs = 0.00002
-        RAP = 0.00168
-        PPQ = 0.00215
-        DDP = 0.00503
-        Shimmer = 0.01227
-        Shimmer_dB = 0.10628
-        APQ3 = 0.00558
-        APQ5 = 0.00695
-        APQ = 0.00781
-        DDA = 0.01675
-        NHR = 0.00458
-        HNR = 26.775
-        RPDE = 0.425493
-        DFA = 0.580295
-        spread1 = -5.288332
-        spread2 = 0.122535
-        D2 = 1.657522
-        PPE = 0.125272
-        
-        # Make prediction with negative sample
-        try:
-            parkinsons_prediction = models['parkinsons'].predict([[fo, fhi, flo, Jitter_percent, Jitter_Abs, RAP, PPQ, DDP, Shimmer, Shimmer_dB, APQ3, APQ5, APQ, DDA, NHR, HNR, RPDE, DFA, spread1, spread2, D2, PPE]])
-            display_result(
-                parkinsons_prediction[0], 
-                "POSITIVE: The analysis indicates Parkinson's disease. Please consult with a neurologist.",
-                "NEGATIVE: The analysis does not indicate Parkinson's disease."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            
-    elif submitted:
-        try:
-            parkinsons_prediction = models['parkinsons'].predict([[fo, fhi, flo, Jitter_percent, Jitter_Abs, RAP, PPQ, DDP, Shimmer, Shimmer_dB, APQ3, APQ5, APQ, DDA, NHR, HNR, RPDE, DFA, spread1, spread2, D2, PPE]])
-            display_result(
-                parkinsons_prediction[0], 
-                "POSITIVE: The analysis indicates Parkinson's disease. Please consult with a neurologist.",
-                "NEGATIVE: The analysis does not indicate Parkinson's disease."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
+        values = schema.negative_sample
+    if positive_sample or negative_sample or submitted:
+        metrics, profiler = load_metrics()
+        if positive_sample or negative_sample:
+            metrics.inc('sample_buttons_total', disease=schema.name,
+                        sample='positive' if positive_sample else 'negative')
+        with profiler.profile(f'predict-{schema.name}'):
+            predict_and_display(schema, values)
 
-# Lung Cancer Prediction Page
-elif selected == "Lung Cancer":
-    display_disease_info(
-        "Lung Cancer Prediction",
-        "Lung cancer is a type of cancer that begins in the lungs. It is the leading cause of cancer deaths worldwide.",
-        "Persistent cough, coughing up blood, chest pain, hoarseness, weight loss, shortness of breath, wheezing, weakness and fatigue.",
-        "Smoking, exposure to secondhand smoke, exposure to radon gas, exposure to asbestos, family history of lung cancer."
-    )
-    
-    with st.form("lung_cancer_form"):
+    if schema.name == 'parkinsons':
+        display_voice_recording(schema)
+    display_what_if(schema, values)
+    display_batch_scoring(schema.name)
+
+def display_screening_panel():
+    """Enter shared intake fields once and score every model whose inputs are provided"""
+    from diagnosis.panel import SHARED_FIELDS, disease_features, screen
+    from diagnosis.schema import get_schema
+
+    st.markdown('<p class="section-header">Screening Panel</p>', unsafe_allow_html=True)
+    st.markdown("Enter the shared patient details once, then tick each disease whose remaining inputs are available. All selected models are scored together; diseases left unticked are skipped.")
+
+    with st.form("panel_form"):
         st.markdown('<div class="form-container">', unsafe_allow_html=True)
-        st.subheader("Enter Patient Details")
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            GENDER = display_input('Gender', 'Gender of the person', 'GENDER', type='select', options=['Female', 'Male'])
-            GENDER = 1 if GENDER == 'Male' else 0
-            AGE = display_input('Age', 'Age in years', 'AGE', 1.0, 100.0, 'slider')
-            SMOKING = display_input('Smoking', 'Does the person smoke?', 'SMOKING', type='select', options=['No', 'Yes'])
-            SMOKING = 1 if SMOKING == 'Yes' else 0
-            YELLOW_FINGERS = display_input('Yellow Fingers', 'Does the person have yellow fingers?', 'YELLOW_FINGERS', type='select', options=['No', 'Yes'])
-            YELLOW_FINGERS = 1 if YELLOW_FINGERS == 'Yes' else 0
-            ANXIETY = display_input('Anxiety', 'Does the person have anxiety?', 'ANXIETY', type='select', options=['No', 'Yes'])
-            ANXIETY = 1 if ANXIETY == 'Yes' else 0
-        
-        with col2:
-            PEER_PRESSURE = display_input('Peer Pressure', 'Is the person under peer pressure?', 'PEER_PRESSURE', type='select', options=['No', 'Yes'])
-            PEER_PRESSURE = 1 if PEER_PRESSURE == 'Yes' else 0
-            CHRONIC_DISEASE = display_input('Chronic Disease', 'Does the person have a chronic disease?', 'CHRONIC_DISEASE', type='select', options=['No', 'Yes'])
-            CHRONIC_DISEASE = 1 if CHRONIC_DISEASE == 'Yes' else 0
-            FATIGUE = display_input('Fatigue', 'Does the person experience fatigue?', 'FATIGUE', type='select', options=['No', 'Yes'])
-            FATIGUE = 1 if FATIGUE == 'Yes' else 0
-            ALLERGY = display_input('Allergy', 'Does the person have allergies?', 'ALLERGY', type='select', options=['No', 'Yes'])
-            ALLERGY = 1 if ALLERGY == 'Yes' else 0
-            WHEEZING = display_input('Wheezing', 'Does the person experience wheezing?', 'WHEEZING', type='select', options=['No', 'Yes'])
-            WHEEZING = 1 if WHEEZING == 'Yes' else 0
-        
-        with col3:
-            ALCOHOL_CONSUMING = display_input('Alcohol Consuming', 'Does the person consume alcohol?', 'ALCOHOL_CONSUMING', type='select', options=['No', 'Yes'])
-            ALCOHOL_CONSUMING = 1 if ALCOHOL_CONSUMING == 'Yes' else 0
-            COUGHING = display_input('Coughing', 'Does the person experience coughing?', 'COUGHING', type='select', options=['No', 'Yes'])
-            COUGHING = 1 if COUGHING == 'Yes' else 0
-            SHORTNESS_OF_BREATH = display_input('Shortness Of Breath', 'Does the person experience shortness of breath?', 'SHORTNESS_OF_BREATH', type='select', options=['No', 'Yes'])
-            SHORTNESS_OF_BREATH = 1 if SHORTNESS_OF_BREATH == 'Yes' else 0
-            SWALLOWING_DIFFICULTY = display_input('Swallowing Difficulty', 'Does the person have difficulty swallowing?', 'SWALLOWING_DIFFICULTY', type='select', options=['No', 'Yes'])
-            SWALLOWING_DIFFICULTY = 1 if SWALLOWING_DIFFICULTY == 'Yes' else 0
-            CHEST_PAIN = display_input('Chest Pain', 'Does the person experience chest pain?', 'CHEST_PAIN', type='select', options=['No', 'Yes'])
-            CHEST_PAIN = 1 if CHEST_PAIN == 'Yes' else 0
-        
-        # Submit buttons
-        col1, col2, col3 = st.columns([1, 1, 2])
-        with col1:
-            positive_sample = st.form_submit_button("Load & Predict with Positive Sample")
-        with col2:
-            negative_sample = st.form_submit_button("Load & Predict with Negative Sample")
-        with col3:
-            submitted = st.form_submit_button("Predict with Current Data")
+        st.subheader("Shared Patient Details")
+        patient = {}
+        for column, field in zip(st.columns(len(SHARED_FIELDS)), SHARED_FIELDS):
+            with column:
+                feature = field.feature
+                patient[feature.key] = display_input(feature.label, feature.help, f"panel_{feature.key}", feature.min_value,
+                                                     feature.max_value, feature.widget, feature.option_labels or None)
+
+        for page, disease in DISEASE_PAGES.items():
+            with st.expander(page, expanded=False):
+                include = st.checkbox(f"Include {page}", key=f"panel_{disease}_include")
+                features = disease_features(disease)
+                values = {}
+                for i, column in enumerate(st.columns(3)):
+                    with column:
+                        for feature in features[i::3]:
+                            values[feature.key] = display_input(feature.label, feature.help, f"panel_{disease}_{feature.key}",
+                                                                feature.min_value, feature.max_value, feature.widget,
+                                                                feature.option_labels or None)
+                if include:
+                    patient[disease] = values
+
+        submitted = st.form_submit_button("Run Screening Panel")
         st.markdown('</div>', unsafe_allow_html=True)
-        
-    # Handle predictions with sample data or user input
-    if positive_sample:
-        # Sample values for a positive lung cancer case
-        GENDER = 1  # Male
-        AGE = 65
-        SMOKING = 1  # Yes
-        YELLOW_FINGERS = 1  # Yes
-        ANXIETY = 1  # Yes
-        PEER_PRESSURE = 0  # No
-        CHRONIC_DISEASE = 1  # Yes
-        FATIGUE = 1  # Yes
-        ALLERGY = 0  # No
-        WHEEZING = 1  # Yes
-        ALCOHOL_CONSUMING = 1  # Yes
-        COUGHING = 1  # Yes
-        SHORTNESS_OF_BREATH = 1  # Yes
-        SWALLOWING_DIFFICULTY = 1  # Yes
-        CHEST_PAIN = 1  # Yes
-        
-        # Make prediction with positive sample
-        try:
-            lungs_prediction = models['lung_cancer'].predict([[GENDER, AGE, SMOKING, YELLOW_FINGERS, ANXIETY, PEER_PRESSURE, CHRONIC_DISEASE, FATIGUE, ALLERGY, WHEEZING, ALCOHOL_CONSUMING, COUGHING, SHORTNESS_OF_BREATH, SWALLOWING_DIFFICULTY, CHEST_PAIN]])
-            display_result(
-                lungs_prediction[0], 
-                "POSITIVE: The analysis indicates a risk of lung cancer. Please consult with an oncologist immediately.",
-                "NEGATIVE: The analysis does not indicate lung cancer. Maintain a healthy lifestyle."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            
-    elif negative_sample:
-        # Sample values for a negative lung cancer case
-        GENDER = 0  # Female
-        AGE = 35
-        SMOKING = 0  # No
-        YELLOW_FINGERS = 0  # No
-        ANXIETY = 0  # No
-        PEER_PRESSURE = 0  # No
-        CHRONIC_DISEASE = 0  # No
-        FATIGUE = 0  # No
-        ALLERGY = 0  # No
-        WHEEZING = 0  # No
-        ALCOHOL_CONSUMING = 0  # No
-        COUGHING = 0  # No
-        SHORTNESS_OF_BREATH = 0  # No
-        SWALLOWING_DIFFICULTY = 0  # No
-        CHEST_PAIN = 0  # No
-        
-        # Make prediction with negative sample
-        try:
-            lungs_prediction = models['lung_cancer'].predict([[GENDER, AGE, SMOKING, YELLOW_FINGERS, ANXIETY, PEER_PRESSURE, CHRONIC_DISEASE, FATIGUE, ALLERGY, WHEEZING, ALCOHOL_CONSUMING, COUGHING, SHORTNESS_OF_BREATH, SWALLOWING_DIFFICULTY, CHEST_PAIN]])
-            display_result(
-                lungs_prediction[0], 
-                "POSITIVE: The analysis indicates a risk of lung cancer. Please consult with an oncologist immediately.",
-                "NEGATIVE: The analysis does not indicate lung cancer. Maintain a healthy lifestyle."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            
-    elif submitted:
-        try:
-            lungs_prediction = models['lung_cancer'].predict([[GENDER, AGE, SMOKING, YELLOW_FINGERS, ANXIETY, PEER_PRESSURE, CHRONIC_DISEASE, FATIGUE, ALLERGY, WHEEZING, ALCOHOL_CONSUMING, COUGHING, SHORTNESS_OF_BREATH, SWALLOWING_DIFFICULTY, CHEST_PAIN]])
-            display_result(
-                lungs_prediction[0], 
-                "POSITIVE: The analysis indicates a risk of lung cancer. Please consult with an oncologist immediately.",
-                "NEGATIVE: The analysis does not indicate lung cancer. Maintain a healthy lifestyle."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
 
-# Hypo-Thyroid Prediction Page
-elif selected == "Hypo-Thyroid":
-    display_disease_info(
-        "Hypo-Thyroid Prediction",
-        "Hypothyroidism is a condition in which the thyroid gland doesn't produce enough thyroid hormone. It can cause various health problems if left untreated.",
-        "Fatigue, increased sensitivity to cold, constipation, dry skin, weight gain, puffy face, hoarseness, muscle weakness, elevated blood cholesterol level, muscle aches, pain, stiffness or weakness, heavier or irregular menstrual periods, thinning hair, slowed heart rate, depression, impaired memory.",
-        "Autoimmune disease, thyroid surgery, radiation therapy, certain medications, pregnancy, congenital disease, pituitary disorder, iodine deficiency, age, sex (women are more likely to develop hypothyroidism)."
-    )
+    if not submitted:
+        return
+    metrics, profiler = load_metrics()
+    try:
+        with profiler.profile('screen'), metrics.time('panel', disease='panel'):
+            result = screen(patient, models, executor=load_panel_executor(), cache=load_prediction_cache(),
+                            audit=load_audit_log(), drift=load_drift_monitors(), router=load_model_router())
+    except Exception as e:
+        metrics.inc('errors_total', disease='panel', stage='panel')
+        logger.warning("Screening panel failed", exc_info=True)
+        st.error(f"An error occurred: {e}")
+        return
+    for outcome in result.outcomes:
+        if outcome['status'] == 'ok':
+            metrics.inc('predictions_total', disease=outcome['model'],
+                        result='positive' if outcome['prediction'] == 1 else 'negative')
+        elif outcome['status'] == 'error':
+            metrics.inc('errors_total', disease=outcome['model'], stage='panel')
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Models scored", len(result.scored))
+    col2.metric("Models skipped", len(result.skipped))
+    col3.metric("Panel time", f"{result.seconds * 1000.0:.1f} ms")
+    for outcome in result.outcomes:
+        schema = get_schema(outcome['model'])
+        if outcome['status'] == 'ok':
+            st.markdown(f"**{schema.title}** ({outcome['latency_ms']:.2f} ms)")
+            display_result(outcome['prediction'], schema.positive_message, schema.negative_message)
+        elif outcome['status'] == 'skipped':
+            st.caption(f"{schema.title}: skipped, no inputs provided")
+        else:
+            st.error(f"{schema.title}: {outcome['error']}")
+
+# Home Page
+with startup.phase(f'page: {selected}'):
+    if selected == 'Home':
+        st.markdown('<p class="section-header">Welcome to Medical AI Diagnosis</p>', unsafe_allow_html=True)
     
-    with st.form("thyroid_form"):
-        st.markdown('<div class="form-container">', unsafe_allow_html=True)
-        st.subheader("Enter Patient Details")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            age = display_input('Age', 'Age in years', 'age', 1.0, 100.0, 'slider')
-            sex = display_input('Gender', 'Gender of the person', 'sex', type='select', options=['Female', 'Male'])
-            sex = 1 if sex == 'Male' else 0
-            on_thyroxine = display_input('On Thyroxine', 'Is the person on thyroxine medication?', 'on_thyroxine', type='select', options=['No', 'Yes'])
-            on_thyroxine = 1 if on_thyroxine == 'Yes' else 0
-        
-        with col2:
-            tsh = display_input('TSH Level', 'Thyroid Stimulating Hormone level', 'tsh', 0.005, 500.0, 'number')
-            t3_measured = display_input('T3 Measured', 'Was T3 hormone measured?', 't3_measured', type='select', options=['No', 'Yes'])
-            t3_measured = 1 if t3_measured == 'Yes' else 0
-            t3 = display_input('T3 Level', 'Triiodothyronine hormone level', 't3', 0.0, 10.0, 'number')
-            tt4 = display_input('TT4 Level', 'Total Thyroxine level', 'tt4', 0.0, 500.0, 'number')
-        
-        # Sample data button
-        col1, col2, col3 = st.columns([1, 1, 2])
-        with col1:
-            positive_sample = st.form_submit_button("Load & Predict with Positive Sample")
-        with col2:
-            negative_sample = st.form_submit_button("Load & Predict with Negative Sample")
-        with col3:
-            submitted = st.form_submit_button("Predict with Current Data")
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-    if submitted:
-        try:
-            thyroid_prediction = models['thyroid'].predict([[age, sex, on_thyroxine, tsh, t3_measured, t3, tt4]])
-            display_result(
-                thyroid_prediction[0], 
-                "POSITIVE: The analysis indicates Hypo-Thyroid disease. Please consult with an endocrinologist.",
-                "NEGATIVE: The analysis does not indicate Hypo-Thyroid disease."
-            )
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
\ No newline at end of file
+        st.markdown("""
+        <div class="info-box">
+            <h3>About This Application</h3>
+            <p>This application uses machine learning algorithms to predict the likelihood of five common medical conditions based on patient data. The models have been trained on medical datasets and can provide preliminary assessments.</p>
+        
+            <h3>Available Disease Predictions</h3>
+            <ul>
+                <li><strong>Diabetes</strong>: Predicts diabetes based on medical and demographic factors</li>
+                <li><strong>Heart Disease</strong>: Evaluates the risk of coronary heart disease</li>
+                <li><strong>Parkinson's Disease</strong>: Analyzes voice recordings for Parkinson's indicators</li>
+                <li><strong>Lung Cancer</strong>: Assesses lung cancer risk based on symptoms and history</li>
+                <li><strong>Hypo-Thyroid</strong>: Evaluates thyroid function and detects hypothyroidism</li>
+            </ul>
+        
+            <h3>How to Use</h3>
+            <p>Select a disease from the sidebar menu, fill in the required information, and click the prediction button to get your result. To screen one patient for several conditions at once, open the Screening Panel: shared details such as age, sex, smoking and blood pressure are entered only once.</p>
+        
+            <h3>Disclaimer</h3>
+            <p>This tool is for educational purposes only and does not replace professional medical advice. Always consult with a healthcare provider for proper diagnosis and treatment.</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+    elif selected == 'Screening Panel':
+        display_screening_panel()
+
+    # Disease Prediction Pages, generated from the feature schemas in diagnosis/schema.py
+    else:
+        from diagnosis.schema import get_schema
+
+        display_disease_page(get_schema(DISEASE_PAGES[selected]))
+
+# Time to first render is logged once per process, then the models are warmed in the background
+if startup.mark_first_render():
+    startup.log('first_render')
+start_model_warmup()
+display_sidebar_stats()
@@ -0,0 +1 @@
+"""Lets `python -m pytest` import the `diagnosis` package from the repository root"""
@@ -0,0 +1 @@
+"""Shared, Streamlit-independent building blocks of the Medical AI Diagnosis app."""
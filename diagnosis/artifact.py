@@ -0,0 +1,235 @@
+"""Versioned, memory-mappable model artifacts (`Models/*.mdl`)
+
+Layout of a `.mdl` file::
+
+    b'MEDAIMDL'                  8-byte magic
+    uint32 little-endian         format version
+    uint32 little-endian         header length in bytes
+    header                       UTF-8 JSON, space-padded so the data starts 64-byte aligned
+    array data                   raw little-endian arrays, each at a 64-byte aligned offset
+
+The header records the model type and link, feature names and order, dtype, the
+scikit-learn version the model was fitted with, the SHA-256 of the training dataset,
+evaluation metrics, what `diagnosis.explain` needs (training feature means and, for
+SVMs, Platt calibration) and the offset/shape/dtype of every array. Loading maps the file
+read-only with `np.memmap`, so the parameters are views onto the page cache and every
+worker process that loads the same artifact shares one physical copy.
+
+    python -m diagnosis.artifact export     # Models/*.sav -> Models/*.mdl
+    python -m diagnosis.artifact inspect Models/heart_disease_model.mdl
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import pickletools
+import struct
+
+import numpy as np
+
+from diagnosis.kernel import LINK_LOGISTIC, LinearKernel, LogisticKernel
+from diagnosis.registry import MODEL_FILES, MODELS_DIR, ModelRegistry, load_pickle
+
+MAGIC = b'MEDAIMDL'
+FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = '.mdl'
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def artifact_path(pickle_path):
+    """Artifact that supersedes a `.sav` pickle: same basename, `.mdl` extension"""
+    return os.path.splitext(pickle_path)[0] + ARTIFACT_SUFFIX
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pickled_sklearn_version(path):
+    """scikit-learn version recorded inside a pickle, read without unpickling (newer sklearn drops it on load)"""
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    previous = None
+    for opcode, arg, _ in pickletools.genops(data):
+        if isinstance(arg, str):
+            if previous == '_sklearn_version':
+                return arg
+            previous = arg
+    return None
+
+
+def write_artifact(path, arrays, metadata):
+    """Write `arrays` (name -> ndarray) and JSON-able `metadata` atomically to `path`"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    for name, array in arrays.items():
+        if array.dtype.kind not in 'biuf':
+            raise TypeError(f"Array '{name}' has non-numeric dtype {array.dtype}")
+
+    # Offsets are relative to the data section, so they do not depend on the header length
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.newbyteorder('<').str}
+        offset += array.nbytes
+    header = dict(metadata, format_version=FORMAT_VERSION, arrays=layout)
+    header_bytes = json.dumps(header, sort_keys=True).encode('utf-8')
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+    header_bytes += b' ' * (data_start - _PREAMBLE.size - len(header_bytes))
+
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as fh:
+        fh.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        fh.write(header_bytes)
+        for name, array in arrays.items():
+            fh.seek(data_start + layout[name]['offset'])
+            fh.write(array.astype(layout[name]['dtype'], copy=False).tobytes())
+        # An empty last array still needs its (aligned) offset inside the file to be mapped
+        fh.truncate(data_start + offset)
+    # Readers never observe a half-written artifact
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_header(path):
+    with open(path, 'rb') as fh:
+        magic, version, header_length = _PREAMBLE.unpack(fh.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a model artifact")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"{path} uses artifact format {version}; this build reads up to {FORMAT_VERSION}")
+        header = json.loads(fh.read(header_length))
+    header['data_start'] = _PREAMBLE.size + header_length
+    return header
+
+
+def read_artifact(path):
+    """Return (arrays, header); arrays are read-only views onto a shared memory map"""
+    header = read_header(path)
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        arrays[name] = np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=mapped,
+                                  offset=header['data_start'] + spec['offset'])
+    return arrays, header
+
+
+def save_kernel(kernel, path, metadata=None):
+    arrays = {
+        'coef': kernel.coef,
+        'intercept': np.asarray([kernel.intercept], dtype=kernel.dtype),
+        'classes': kernel.classes_.astype(np.int64),
+    }
+    header = dict(metadata or {})
+    header.update({
+        'name': kernel.name,
+        'model_type': header.get('model_type', type(kernel).__name__),
+        'link': kernel.link,
+        'dtype': kernel.dtype.str,
+        'feature_names': [] if kernel.feature_names_in_ is None else [str(n) for n in kernel.feature_names_in_],
+    })
+    return write_artifact(path, arrays, header)
+
+
+def load_kernel(path):
+    """Load an artifact as a LinearKernel whose coefficients stay memory-mapped"""
+    arrays, header = read_artifact(path)
+    kernel_cls = LogisticKernel if header['link'] == LINK_LOGISTIC else LinearKernel
+    kernel = kernel_cls(arrays['coef'], arrays['intercept'], arrays['classes'],
+                        header['feature_names'], header.get('name'), header['dtype'])
+    kernel.metadata = header
+    kernel.source_path = path
+    # Hashed at load time, so the first audited prediction never reads the file
+    kernel.source_digest = 'sha256:' + file_sha256(path)
+    return kernel
+
+
+def build_timestamp():
+    """UTC creation time for artifacts and reports; SOURCE_DATE_EPOCH pins it for reproducible builds"""
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    moment = datetime.datetime.fromtimestamp(int(epoch), datetime.timezone.utc) if epoch \
+        else datetime.datetime.now(datetime.timezone.utc)
+    return moment.isoformat(timespec='seconds')
+
+
+def export_model(name, model, path, dataset_path=None, X=None, y=None, feature_names=None,
+                 sklearn_version=None, metadata=None):
+    """Compile a fitted sklearn model and write it with its provenance (plus any extra `metadata`)"""
+    kernel = LinearKernel.from_estimator(model, name)
+    if kernel.feature_names_in_ is None and feature_names is not None:
+        # Models fitted on bare arrays (lung cancer) get their column order recorded here
+        kernel.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    if sklearn_version is None:
+        import sklearn
+        sklearn_version = sklearn.__version__
+    extra = dict(metadata or {})
+    metadata = {
+        'model_type': type(model).__name__,
+        'sklearn_version': sklearn_version,
+        'created_at': build_timestamp(),
+        'metrics': dict(extra.pop('metrics', {})),
+    }
+    metadata.update(extra)
+    if dataset_path is not None:
+        metadata['dataset'] = {
+            'file': os.path.basename(dataset_path),
+            'sha256': file_sha256(dataset_path),
+            'rows': None if X is None else int(len(X)),
+        }
+    if X is not None and y is not None:
+        from diagnosis.explain import explain_metadata
+
+        metadata['metrics']['dataset_accuracy'] = float(np.mean(kernel.predict(X) == y))
+        # Feature means for per-feature contributions, plus Platt scaling for margin (SVM) models
+        metadata.update(explain_metadata(kernel, X, y))
+    return save_kernel(kernel, path, metadata)
+
+
+def export(models_dir=MODELS_DIR, names=None):
+    """Convert every pickled model in `models_dir` to an artifact next to it; returns {name: path}"""
+    from diagnosis.schema import get_schema
+
+    registry = ModelRegistry(models_dir, loader=load_pickle)
+    paths = {}
+    for name in names or registry.names():
+        model, schema = registry[name], get_schema(name)
+        schema.check_model(model)
+        frame = schema.load_dataset()
+        X, y = schema.vectorize_frame(frame), schema.labels(frame)
+        paths[name] = export_model(name, model, artifact_path(registry.path(name)), schema.dataset_path(), X, y,
+                                   schema.columns, pickled_sklearn_version(registry.path(name)))
+    return paths
+
+
+def artifact_registry(models_dir=MODELS_DIR):
+    """A ModelRegistry that only serves artifacts; scikit-learn is never imported"""
+    files = {name: artifact_path(filename) for name, filename in MODEL_FILES.items()}
+    return ModelRegistry(models_dir, files, loader=load_kernel)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert and inspect model artifacts')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='convert Models/*.sav pickles to .mdl artifacts')
+    export_parser.add_argument('--models-dir', default=MODELS_DIR)
+    inspect_parser = subparsers.add_parser('inspect', help='print an artifact header')
+    inspect_parser.add_argument('path')
+    args = parser.parse_args(argv)
+    if args.command == 'export':
+        for name, path in export(args.models_dir).items():
+            print(f"{name}: {path} ({os.path.getsize(path)} bytes)")
+    else:
+        print(json.dumps(read_header(args.path), indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""Asynchronous, batched audit log of every prediction
+
+The predict path only puts a record on a bounded in-memory queue; a background writer
+thread drains it and appends the records to a local SQLite database (WAL mode) in one
+transaction per batch, so the caller never waits for the disk. Each record holds the
+timestamp, disease, model version (sha256 of the artifact the model was loaded from, hashed
+by the loader so it matches `sha256sum Models/<file>`), source, input feature
+vector (model column order, stored as little-endian float64 bytes), prediction and score. The table is append-only: triggers
+reject UPDATE and DELETE.
+
+Backpressure: when the queue is full the caller waits at most `block_ms` (0 by default)
+for room and the record is otherwise dropped and counted, so a slow disk never turns
+into prediction latency. `stats()` reports enqueued, written, dropped and queue depth.
+
+An index on (disease, ts) lets the query tool scan millions of records by disease and
+time range without touching the rest of the table:
+
+    python -m diagnosis.audit query audit/predictions.db --disease heart_disease --since 2026-10-01
+    python -m diagnosis.audit query audit/predictions.db --since 2026-10-01T08:00 --until 2026-10-02 --count
+    python -m diagnosis.audit stats audit/predictions.db
+"""
+import argparse
+import csv
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from diagnosis.registry import ROOT_DIR
+
+DEFAULT_AUDIT_PATH = os.path.join(ROOT_DIR, 'audit', 'predictions.db')
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 0.25
+FETCH_SIZE = 10000
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS audit ('
+    'id INTEGER PRIMARY KEY, ts REAL NOT NULL, disease TEXT NOT NULL, model_version TEXT NOT NULL, '
+    'source TEXT, prediction INTEGER NOT NULL, score REAL, inputs BLOB NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS audit_disease_ts ON audit (disease, ts)',
+    'CREATE INDEX IF NOT EXISTS audit_ts ON audit (ts)',
+    "CREATE TRIGGER IF NOT EXISTS audit_no_update BEFORE UPDATE ON audit "
+    "BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_no_delete BEFORE DELETE ON audit "
+    "BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END",
+)
+COLUMNS = ('id', 'ts', 'disease', 'model_version', 'source', 'prediction', 'score', 'inputs')
+
+_STOP = object()
+
+_digests = weakref.WeakKeyDictionary()
+_digests_lock = threading.Lock()
+
+
+def artifact_digest(model):
+    """'sha256:<hex>' of the file `model` was loaded from, as hashed by the loader
+
+    A model built in memory has no file; its pickle is hashed instead, once per model.
+    """
+    digest = getattr(model, 'source_digest', None) or _digests.get(model)
+    if digest is None:
+        digest = 'sha256:' + hashlib.sha256(pickle.dumps(model, protocol=4)).hexdigest()
+        with _digests_lock:
+            _digests[model] = digest
+    return digest
+
+
+def connect(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30.0)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+
+
+class AuditLog:
+    """Non-blocking producer side plus the background writer thread"""
+
+    def __init__(self, path=DEFAULT_AUDIT_PATH, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, block_ms=0.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block = block_ms / 1000.0
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.max_depth = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        # Created here so a bad path fails at startup rather than in the writer thread
+        connect(path).close()
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def record(self, disease, model, inputs, prediction, score=None, source=None):
+        """Queue one prediction; returns False when it was dropped"""
+        row = np.array(inputs, dtype='<f8').reshape(1, -1)
+        return self._put((time.time(), disease, artifact_digest(model), source, row, [int(prediction)], [score]))
+
+    def record_batch(self, disease, model, X, predictions, scores=None, source=None):
+        """Queue the predictions of an (N, d) array as a single queue entry"""
+        scores = [None] * len(predictions) if scores is None else [float(score) for score in scores]
+        # Copied, so the caller may reuse its arrays as soon as this returns
+        return self._put((time.time(), disease, artifact_digest(model), source, np.array(X, dtype='<f8'),
+                          [int(p) for p in predictions], scores))
+
+    def _put(self, item):
+        try:
+            if self.block > 0:
+                self._queue.put(item, timeout=self.block)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(item[4])
+            return False
+        with self._lock:
+            self.enqueued += len(item[4])
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def _drain(self, first):
+        items = [first]
+        rows = len(first[4])
+        while rows < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.task_done()
+                self._queue.put(_STOP)
+                break
+            items.append(item)
+            rows += len(item[4])
+        return items
+
+    def _write(self, conn, items):
+        rows = [(ts, disease, version, source, prediction, score, inputs.tobytes())
+                for ts, disease, version, source, X, predictions, scores in items
+                for inputs, prediction, score in zip(X, predictions, scores)]
+        try:
+            with conn:
+                conn.executemany('INSERT INTO audit (ts, disease, model_version, source, prediction, score, inputs) '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        except sqlite3.Error:
+            with self._lock:
+                self.write_errors += 1
+                self.dropped += len(rows)
+            return
+        with self._lock:
+            self.written += len(rows)
+            self.batches += 1
+
+    def _run(self):
+        conn = connect(self.path)
+        try:
+            while True:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                if first is _STOP:
+                    self._queue.task_done()
+                    return
+                items = self._drain(first)
+                self._write(conn, items)
+                for _ in items:
+                    self._queue.task_done()
+        finally:
+            conn.close()
+
+    def flush(self, timeout=10.0):
+        """Wait until everything queued so far has been written (or dropped)"""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Write whatever is queued and stop the writer thread"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {'path': self.path, 'enqueued': self.enqueued, 'written': self.written, 'dropped': self.dropped,
+                    'batches': self.batches, 'write_errors': self.write_errors,
+                    'queue_depth': self._queue.qsize(), 'max_queue_depth': self.max_depth}
+
+
+def build_audit(spec=None):
+    """AuditLog from a path, or None for '' / 'none'"""
+    if not spec or spec == 'none':
+        return None
+    return AuditLog(spec)
+
+
+def parse_time(value):
+    """Epoch seconds from an ISO date/datetime (UTC unless it has an offset) or a number"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+def _where(disease=None, since=None, until=None):
+    clauses, params = [], []
+    if disease is not None:
+        clauses.append('disease = ?')
+        params.append(disease)
+    if since is not None:
+        clauses.append('ts >= ?')
+        params.append(since)
+    if until is not None:
+        clauses.append('ts < ?')
+        params.append(until)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+def query(path, disease=None, since=None, until=None, limit=None):
+    """Yield matching records as dicts in time order, streaming from an indexed range scan"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        where, params = _where(disease, since, until)
+        sql = f'SELECT {", ".join(COLUMNS)} FROM audit{where} ORDER BY ts'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                record = dict(zip(COLUMNS, row))
+                record['inputs'] = np.frombuffer(record['inputs'], dtype='<f8').tolist()
+                yield record
+    finally:
+        conn.close()
+
+
+def count(path, disease=None, since=None, until=None):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        where, params = _where(disease, since, until)
+        return conn.execute(f'SELECT COUNT(*) FROM audit{where}', params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def summary(path):
+    """Record counts and time span per disease"""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = conn.execute('SELECT disease, COUNT(*), MIN(ts), MAX(ts), SUM(prediction) FROM audit '
+                            'GROUP BY disease ORDER BY disease').fetchall()
+    finally:
+        conn.close()
+    return {disease: {'records': n, 'positives': positives, 'first': first, 'last': last}
+            for disease, n, first, last, positives in rows}
+
+
+def _isoformat(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).isoformat(timespec='milliseconds')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the prediction audit log')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    query_parser = subparsers.add_parser('query', help='records by disease and time range')
+    query_parser.add_argument('path', nargs='?', default=DEFAULT_AUDIT_PATH)
+    query_parser.add_argument('--disease')
+    query_parser.add_argument('--since', help='ISO date/time (UTC unless an offset is given) or epoch seconds')
+    query_parser.add_argument('--until', help='exclusive upper bound, same formats as --since')
+    query_parser.add_argument('--limit', type=int)
+    query_parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    query_parser.add_argument('--count', action='store_true', help='only print the number of matching records')
+    stats_parser = subparsers.add_parser('stats', help='records and time span per disease')
+    stats_parser.add_argument('path', nargs='?', default=DEFAULT_AUDIT_PATH)
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.path):
+        parser.error(f"{args.path} does not exist")
+
+    if args.command == 'stats':
+        for disease, entry in summary(args.path).items():
+            print(f"{disease}: {entry['records']:,} records ({entry['positives']:,} positive), "
+                  f"{_isoformat(entry['first'])} .. {_isoformat(entry['last'])}")
+        return
+    since, until = parse_time(args.since), parse_time(args.until)
+    if args.count:
+        print(count(args.path, args.disease, since, until))
+        return
+    records = query(args.path, args.disease, since, until, args.limit)
+    if args.format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(COLUMNS)
+        for record in records:
+            writer.writerow([_isoformat(record['ts']) if column == 'ts' else
+                             json.dumps(record[column]) if column == 'inputs' else record[column]
+                             for column in COLUMNS])
+    else:
+        for record in records:
+            record['ts'] = _isoformat(record['ts'])
+            sys.stdout.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Vectorized batch scoring of patient CSV exports"""
+import contextlib
+import io
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from diagnosis.explain import DEFAULT_TOP_K, get_explainer
+from diagnosis.kernel import LinearKernel
+from diagnosis.schema import DATASETS_DIR, get_schema
+
+DEFAULT_CHUNK_SIZE = 8192
+
+# warnings.catch_warnings() swaps process-wide state, so concurrent callers take turns
+_warnings_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def quiet_feature_names(model):
+    """Silence the feature-names warning of an sklearn model fitted on a DataFrame, for this call only
+
+    Such models warn on every ndarray call. The compiled kernels never warn and skip the lock.
+    """
+    if isinstance(model, LinearKernel) or getattr(model, 'feature_names_in_', None) is None:
+        yield
+        return
+    with _warnings_lock, warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        yield
+
+
+def feature_columns(disease, model=None):
+    """Dataset column order the model expects"""
+    schema = get_schema(disease)
+    if model is not None:
+        schema.check_model(model)
+    return list(schema.columns)
+
+
+def read_csv(source, **kwargs):
+    """Read an uploaded export; tolerates the BOM some of the bundled CSVs carry"""
+    import pandas as pd  # deferred like in diagnosis.schema; score_array needs numpy only
+
+    kwargs.setdefault('encoding', 'utf-8-sig')
+    kwargs.setdefault('skipinitialspace', True)
+    return pd.read_csv(source, **kwargs)
+
+
+def load_dataset(disease, datasets_dir=DATASETS_DIR):
+    """The bundled training CSV for `disease` as a DataFrame"""
+    return get_schema(disease).load_dataset(datasets_dir)
+
+
+def dataset_labels(frame, disease):
+    """Binary outcome column of a training dataset as int64"""
+    return get_schema(disease).labels(frame)
+
+
+def prepare_features(frame, disease, model=None):
+    """Validate `frame` and return its features as a float64 array in model column order
+
+    Columns are matched by name regardless of order, case or punctuation and categorical
+    text (e.g. 'M'/'F') is encoded as in training. Raises ValueError naming any missing,
+    non-numeric or unknown columns.
+    """
+    schema = get_schema(disease)
+    if model is not None:
+        schema.check_model(model)
+    return schema.vectorize_frame(frame)
+
+
+def records_to_array(records, disease, model=None):
+    """Convert JSON-style records to an (N, d) float64 array in model column order
+
+    Each record is either a list of values already in feature order or a dict keyed by
+    dataset column or form field name. Raises ValueError on malformed records.
+    """
+    schema = get_schema(disease)
+    if model is not None:
+        schema.check_model(model)
+    if not all(isinstance(record, (dict, list, tuple)) for record in records):
+        raise ValueError("Each record must be an object or an array")
+    return schema.vectorize(records)
+
+
+def _score_chunk(model, X):
+    with quiet_feature_names(model):
+        predictions = model.predict(X)
+        if hasattr(model, 'predict_proba'):
+            scores = model.predict_proba(X)[:, -1]
+        elif hasattr(model, 'decision_function'):
+            scores = model.decision_function(X)
+        else:
+            scores = None
+    return predictions, scores
+
+
+def score_array(model, X, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Score an (N, d) array with one predict call per chunk; returns (predictions, scores)"""
+    predictions = np.empty(len(X), dtype=np.int64)
+    scores = np.empty(len(X), dtype=np.float64)
+    has_scores = True
+    for start in range(0, len(X), chunk_size):
+        stop = start + chunk_size
+        chunk_predictions, chunk_scores = _score_chunk(model, X[start:stop])
+        predictions[start:stop] = chunk_predictions
+        if chunk_scores is None:
+            has_scores = False
+        else:
+            scores[start:stop] = chunk_scores
+    return predictions, scores if has_scores else None
+
+
+class BatchResult:
+    """Scored frame plus the throughput of the run"""
+
+    def __init__(self, frame, rows, seconds, score_column):
+        self.frame = frame
+        self.rows = rows
+        self.seconds = seconds
+        self.score_column = score_column
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float('inf')
+
+    @property
+    def positives(self):
+        return int(self.frame['prediction'].sum())
+
+    def to_csv_bytes(self):
+        buffer = io.StringIO()
+        self.frame.to_csv(buffer, index=False)
+        return buffer.getvalue().encode('utf-8')
+
+
+def explanation_columns(model, disease, X, top_k=DEFAULT_TOP_K):
+    """Calibrated probability and top contributing features of every row, as {column: array}"""
+    explanations = get_explainer(model, get_schema(disease).columns).explain(X, top_k)
+    columns = {}
+    if explanations.probabilities is not None:
+        columns['probability'] = explanations.probabilities
+    columns.update(explanations.top_columns())
+    return columns
+
+
+def score_frame(model, disease, frame, chunk_size=DEFAULT_CHUNK_SIZE, explain=False, top_k=DEFAULT_TOP_K,
+                audit=None, drift=None):
+    """Score every row of `frame` and return the frame with prediction/score columns appended
+
+    With `explain`, the calibrated probability and the `top_k` features that contributed
+    most to each score are appended as well (see `diagnosis.explain`). With an AuditLog
+    (`audit`), every row's prediction is queued to it; DriftMonitors (`drift`) count the inputs.
+    """
+    start = time.perf_counter()
+    X = prepare_features(frame, disease, model)
+    predictions, scores = score_array(model, X, chunk_size)
+    extra = explanation_columns(model, disease, X, top_k) if explain else {}
+    if audit is not None:
+        audit.record_batch(disease, model, X, predictions, scores, source='batch')
+    if drift is not None:
+        drift.observe_batch(disease, X)
+    elapsed = time.perf_counter() - start
+
+    result = frame.copy()
+    result['prediction'] = predictions
+    score_column = None
+    if scores is not None:
+        score_column = 'probability' if hasattr(model, 'predict_proba') else 'decision_score'
+        result[score_column] = scores
+    for column, values in extra.items():
+        result[column] = values
+    return BatchResult(result, len(frame), elapsed, score_column)
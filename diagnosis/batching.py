@@ -0,0 +1,133 @@
+"""Dynamic micro-batching of single-row prediction requests
+
+Calling an sklearn model with one row pays the full input-validation and array
+conversion overhead for a single dot product. A MicroBatcher queues concurrent
+single-row requests for one model and flushes them as one 2-D array as soon as
+`max_batch_size` rows are waiting or the oldest request has waited `max_wait_ms`.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from diagnosis import batch
+from diagnosis.metrics import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+QUEUE_WAIT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Per-model request queue flushed by a single background thread"""
+
+    def __init__(self, model, max_batch_size=64, max_wait_ms=2.0, name=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.model = model
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_waits = Histogram(QUEUE_WAIT_BUCKETS)
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f'microbatch-{name or "model"}', daemon=True)
+        self._closed = False
+        self._thread.start()
+
+    def submit(self, row):
+        """Queue one feature row; the Future resolves to (prediction, score or None)"""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((np.asarray(row, dtype=np.float64), time.perf_counter(), future))
+        return future
+
+    def predict(self, row, timeout=None):
+        return self.submit(row).result(timeout)
+
+    def close(self, timeout=None):
+        """Flush whatever is queued and stop the worker thread"""
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {'batch_size': self.batch_sizes.snapshot(), 'queue_wait_seconds': self.queue_waits.snapshot()}
+
+    def _collect(self, first):
+        items = [first]
+        deadline = first[1] + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            items.append(item)
+        return items
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            items = self._collect(first)
+            self._flush(items)
+
+    def _flush(self, items):
+        flushed_at = time.perf_counter()
+        for _, enqueued_at, _ in items:
+            self.queue_waits.observe(flushed_at - enqueued_at)
+        self.batch_sizes.observe(len(items))
+        try:
+            X = np.vstack([row for row, _, _ in items])
+            predictions, scores = batch.score_array(self.model, X)
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+        for i, (_, _, future) in enumerate(items):
+            future.set_result((int(predictions[i]), None if scores is None else float(scores[i])))
+
+
+class BatchScheduler:
+    """Lazily creates one MicroBatcher per model in a registry"""
+
+    def __init__(self, registry, max_batch_size=64, max_wait_ms=2.0):
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def batcher(self, name):
+        batcher = self._batchers.get(name)
+        if batcher is None:
+            with self._lock:
+                batcher = self._batchers.get(name)
+                if batcher is None:
+                    batcher = MicroBatcher(self.registry[name], self.max_batch_size, self.max_wait_ms, name)
+                    self._batchers[name] = batcher
+        return batcher
+
+    def predict(self, name, row, timeout=None):
+        batcher = self.batcher(name)
+        # The registry's model may have been swapped (see diagnosis.router); the next flush uses the new one
+        model = self.registry[name]
+        if batcher.model is not model:
+            batcher.model = model
+        return batcher.predict(row, timeout)
+
+    def stats(self):
+        return {name: batcher.stats() for name, batcher in sorted(self._batchers.items())}
+
+    def close(self):
+        for batcher in list(self._batchers.values()):
+            batcher.close()
@@ -0,0 +1,260 @@
+"""Inference benchmark over the bundled datasets
+
+Replays the rows of each `Datasets/*.csv` through its model in `Models/` and reports,
+per model, the load time plus p50/p95/p99 latency and throughput for
+
+* ``single``     -- one row per call, in dataset order
+* ``batch_<n>``  -- calls of n rows (1, 32, 256 and 4096 by default; datasets are tiled to fill them)
+* ``concurrent`` -- several client threads each issuing single-row calls
+
+together with the peak RSS of the process. A run can be saved as a JSON baseline and
+later runs compared against it; the comparison fails (exit status 1) when latency,
+throughput, load time or peak RSS is worse than the baseline by more than the threshold.
+Load time is the median of several loads, and a millisecond metric only counts as a
+regression when it also grew by more than `--min-delta-ms`, so timer noise on sub-ms
+latencies cannot fail the gate.
+
+    python -m diagnosis.benchmark --save-baseline          # record benchmarks/baseline.json
+    python -m diagnosis.benchmark --compare --threshold 0.25 --min-delta-ms 1
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import threading
+import time
+
+import numpy as np
+
+from diagnosis import batch
+from diagnosis.metrics import LatencyWindow
+from diagnosis.registry import MODELS_DIR, ROOT_DIR, ModelRegistry, load_pickle
+from diagnosis.schema import get_schema
+
+DEFAULT_BATCH_SIZES = (1, 32, 256, 4096)
+DEFAULT_BASELINE = os.path.join(ROOT_DIR, 'benchmarks', 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+# Millisecond metrics must also be worse by this much in absolute terms to count as a regression
+DEFAULT_MIN_DELTA_MS = 1.0
+# load_ms is the median of this many loads of each model
+LOAD_REPEATS = 5
+# Each mode keeps calling the model until it has run this long and made this many calls
+MIN_SECONDS = 0.25
+MIN_CALLS = 20
+
+# metric -> True when larger is better; only these are compared against a baseline
+COMPARED_METRICS = {'p50_ms': False, 'p95_ms': False, 'p99_ms': False, 'rows_per_second': True}
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None where `resource` is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return int(peak if sys.platform == 'darwin' else peak * 1024)
+
+
+def _summary(window, rows, seconds):
+    result = window.summary()
+    result['rows'] = rows
+    result['rows_per_second'] = round(rows / seconds, 1) if seconds > 0 else None
+    return result
+
+
+def _replay(model, batches, min_seconds=MIN_SECONDS, min_calls=MIN_CALLS):
+    """Score `batches` round-robin until both minimums are met; one latency sample per call"""
+    window = LatencyWindow(size=max(min_calls, 100000))
+    rows, calls = 0, 0
+    start = time.perf_counter()
+    while True:
+        for X in batches:
+            call_start = time.perf_counter()
+            batch.score_array(model, X)
+            window.observe(time.perf_counter() - call_start)
+            rows += len(X)
+            calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds and calls >= min_calls:
+            return _summary(window, rows, elapsed)
+
+
+def bench_single(model, X, min_seconds=MIN_SECONDS):
+    return _replay(model, [X[i:i + 1] for i in range(len(X))], min_seconds)
+
+
+def bench_batch(model, X, size, min_seconds=MIN_SECONDS):
+    # Tile the dataset so every call carries exactly `size` rows
+    tiled = np.resize(X, (max(size, len(X)), X.shape[1]))
+    batches = [np.ascontiguousarray(tiled[i:i + size]) for i in range(0, len(tiled) - size + 1, size)]
+    return _replay(model, batches, min_seconds)
+
+
+def bench_concurrent(model, X, clients=8, min_seconds=MIN_SECONDS):
+    """`clients` threads replay single rows at the same model; latency is per call"""
+    window = LatencyWindow(size=100000)
+    rows = [0] * clients
+    barrier = threading.Barrier(clients + 1)
+    deadline = []
+
+    def client(index):
+        barrier.wait()
+        i = index
+        while time.perf_counter() < deadline[0]:
+            row = X[i % len(X):i % len(X) + 1]
+            call_start = time.perf_counter()
+            batch.score_array(model, row)
+            window.observe(time.perf_counter() - call_start)
+            rows[index] += 1
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    deadline.append(start + min_seconds)
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    result = _summary(window, sum(rows), time.perf_counter() - start)
+    result['clients'] = clients
+    return result
+
+
+def run(models_dir=MODELS_DIR, names=None, batch_sizes=DEFAULT_BATCH_SIZES, clients=8, min_seconds=MIN_SECONDS,
+        loader=None):
+    """Benchmark every model (all by default) and return a JSON-able report"""
+    registry = ModelRegistry(models_dir, loader=loader)
+    report = {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'models': {},
+    }
+    for name in names or registry.names():
+        schema = get_schema(name)
+        model = registry[name]
+        schema.check_model(model)
+        X = schema.vectorize_frame(schema.load_dataset())
+        load = registry.stats()[name]
+        load_ms = median_load_ms(registry.loader, registry.path(name), load['load_ms'])
+        # Warm up once so one-off validation costs are not counted as latency
+        batch.score_array(model, X[:1])
+
+        modes = {'single': bench_single(model, X, min_seconds)}
+        for size in batch_sizes:
+            modes[f'batch_{size}'] = bench_batch(model, X, size, min_seconds)
+        if clients > 0:
+            modes['concurrent'] = bench_concurrent(model, X, clients, min_seconds)
+        report['models'][name] = {
+            'model_type': type(model).__name__,
+            'path': load['path'],
+            'dataset_rows': len(X),
+            'load_ms': load_ms,
+            'modes': modes,
+        }
+    report['peak_rss_bytes'] = peak_rss_bytes()
+    return report
+
+
+def median_load_ms(loader, path, first_ms, repeats=LOAD_REPEATS):
+    """Median load time in ms over `repeats` loads, counting the registry's first load"""
+    timings = [first_ms]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        loader(path)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return round(float(np.median(timings)), 3)
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """Regressions of `report` against `baseline`: a list of human-readable messages"""
+    regressions = []
+
+    def check(label, current, previous, higher_is_better):
+        if current is None or not previous:
+            return
+        change = (current - previous) / previous
+        if label.endswith('_ms') and current - previous <= min_delta_ms:
+            return
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append(f"{label}: {previous:g} -> {current:g} ({change:+.1%})")
+
+    for name, model in report['models'].items():
+        reference = baseline.get('models', {}).get(name)
+        if reference is None:
+            continue
+        check(f"{name} load_ms", model['load_ms'], reference['load_ms'], False)
+        for mode, result in model['modes'].items():
+            previous = reference['modes'].get(mode)
+            if previous is None:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                check(f"{name} {mode} {metric}", result.get(metric), previous.get(metric), higher_is_better)
+    check('peak_rss_bytes', report.get('peak_rss_bytes'), baseline.get('peak_rss_bytes'), False)
+    return regressions
+
+
+def format_report(report):
+    lines = []
+    for name, model in report['models'].items():
+        lines.append(f"{name} ({model['model_type']}, {model['dataset_rows']} rows, load {model['load_ms']:.2f} ms)")
+        for mode, result in model['modes'].items():
+            lines.append(f"  {mode:<12} p50 {result['p50_ms']:9.4f} ms  p95 {result['p95_ms']:9.4f} ms  "
+                         f"p99 {result['p99_ms']:9.4f} ms  {result['rows_per_second']:>14,.0f} rows/s")
+    if report.get('peak_rss_bytes') is not None:
+        lines.append(f"peak RSS {report['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark model inference over the bundled datasets')
+    parser.add_argument('--models', nargs='+', help='models to benchmark (default: all)')
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--pickles', action='store_true', help='benchmark the .sav pickles instead of the artifacts')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument('--clients', type=int, default=8, help='threads in concurrent mode (0 skips it)')
+    parser.add_argument('--min-seconds', type=float, default=MIN_SECONDS, help='minimum duration of each mode')
+    parser.add_argument('--output', help='also write the report to this JSON file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write this run as the baseline')
+    parser.add_argument('--compare', action='store_true', help='fail if this run regresses against the baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative regression, e.g. 0.25 for 25%%')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help='ignore latency and load-time regressions smaller than this many ms')
+    args = parser.parse_args(argv)
+
+    report = run(args.models_dir, args.models, args.batch_sizes, args.clients, args.min_seconds,
+                 load_pickle if args.pickles else None)
+    print(format_report(report))
+    paths = [args.output] if args.output else []
+    if args.save_baseline:
+        paths.append(args.baseline)
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+        print(f"wrote {path}")
+
+    if args.compare:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"no regressions beyond {args.threshold:.0%} (and {args.min_delta_ms:g} ms) of {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Bounded prediction cache keyed on (model version, normalized feature vector)
+
+The sample buttons and repeated form submissions score identical vectors over and
+over. A PredictionCache answers those from a pluggable backend:
+
+* ``MemoryBackend`` -- in-process LRU dict, shared by every session/thread of a process.
+* ``SQLiteBackend`` -- a local SQLite file (WAL mode), shared by every process on the host.
+
+Both evict least-recently-used entries to stay within a byte budget and expire
+entries after an optional TTL.
+"""
+import collections
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import weakref
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+# The SQLite budget is enforced every this many inserts rather than summing sizes on each one
+SQLITE_EVICTION_INTERVAL = 64
+
+
+# Fingerprints by model object; weak, so a hot-swapped model is not kept alive by the caches
+_fingerprints = weakref.WeakKeyDictionary()
+_fingerprints_lock = threading.Lock()
+
+
+def _fingerprint(model):
+    from diagnosis.kernel import LinearKernel
+
+    digest = hashlib.sha256(type(model).__name__.encode('utf-8'))
+    if isinstance(model, LinearKernel):
+        # A kernel is fully described by its weights, link and dtype
+        digest.update(f'{model.link}:{model.dtype.str}'.encode('utf-8'))
+        for value in (model.coef, model.intercept, model.classes_):
+            digest.update(np.ascontiguousarray(value, dtype=np.float64).tobytes())
+    else:
+        # Any other estimator (random forest, kNN, RBF SVM, ...): its whole fitted state
+        digest.update(pickle.dumps(model, protocol=4))
+    return digest.hexdigest()[:16]
+
+
+def model_version(model):
+    """Stable fingerprint of a fitted model's content; computed once per model object"""
+    try:
+        version = _fingerprints.get(model)
+    except TypeError:
+        return _fingerprint(model)
+    if version is None:
+        version = _fingerprint(model)
+        with _fingerprints_lock:
+            _fingerprints[model] = version
+    return version
+
+
+def feature_key(version, row):
+    """Cache key for one feature vector; 1 == 1.0 and -0.0 == 0.0, tiny float noise is ignored"""
+    values = np.round(np.asarray(row, dtype=np.float64).reshape(-1), 9) + 0.0
+    return hashlib.sha256(version.encode('utf-8') + values.tobytes()).hexdigest()
+
+
+class MemoryBackend:
+    """LRU dict with TTL, bounded by the approximate size of its keys and values"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires, size = entry
+            if expires is not None and expires < time.time():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(key) + len(value)
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (value, expires, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self._entries), 'bytes': self._bytes,
+                'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class SQLiteBackend:
+    """Cache table in a local SQLite file that any number of processes can share"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        self._inserts = 0
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS predictions ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                         'expires REAL, accessed REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed)')
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute('SELECT value, expires FROM predictions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        with conn:
+            if expires is not None and expires < now:
+                conn.execute('DELETE FROM predictions WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE predictions SET accessed = ? WHERE key = ?', (now, key))
+        return value
+
+    def set(self, key, value):
+        conn = self._connection()
+        now = time.time()
+        size = len(key) + len(value)
+        expires = now + self.ttl if self.ttl else None
+        self._inserts += 1
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO predictions (key, value, size, expires, accessed) '
+                         'VALUES (?, ?, ?, ?, ?)', (key, value, size, expires, now))
+            if self._inserts % SQLITE_EVICTION_INTERVAL == 0:
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM predictions').fetchone()[0]
+                if total > self.max_bytes:
+                    self._evict(conn, total - self.max_bytes)
+
+    def _evict(self, conn, excess):
+        freed, keys = 0, []
+        for key, size in conn.execute('SELECT key, size FROM predictions ORDER BY accessed'):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany('DELETE FROM predictions WHERE key = ?', keys)
+        self.evictions += len(keys)
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM predictions')
+
+    def stats(self):
+        entries, total = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM predictions').fetchone()
+        return {'backend': 'sqlite', 'path': self.path, 'entries': entries, 'bytes': total,
+                'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class PredictionCache:
+    """Memoizes single-row predictions of any model in front of a backend"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, model, row, compute):
+        """Return the cached (prediction, score) for `row`, calling `compute(row)` on a miss"""
+        key = feature_key(model_version(model), row)
+        cached = self.backend.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            prediction, score = json.loads(cached)
+            return prediction, score
+        with self._lock:
+            self.misses += 1
+        prediction, score = compute(row)
+        self.backend.set(key, json.dumps([prediction, score]))
+        return prediction, score
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {'hits': self.hits, 'misses': self.misses,
+                 'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0}
+        stats.update(self.backend.stats())
+        return stats
+
+
+def build_cache(spec='memory', max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+    """Create a cache from a spec string: 'memory', 'sqlite:<path>' or 'none' (returns None)"""
+    if not spec or spec == 'none':
+        return None
+    if spec == 'memory':
+        return PredictionCache(MemoryBackend(max_bytes, ttl))
+    if spec.startswith('sqlite:'):
+        return PredictionCache(SQLiteBackend(spec[len('sqlite:'):], max_bytes, ttl))
+    raise ValueError(f"Unknown cache backend '{spec}'; use 'memory', 'sqlite:<path>' or 'none'")
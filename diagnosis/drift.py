@@ -0,0 +1,364 @@
+"""Input-drift monitoring against the training distributions
+
+For every feature of every model a reference is precomputed from its `Datasets/` CSV:
+bin edges (training deciles for continuous features, one bin per value for discrete
+ones), the fraction of training rows in each bin and a few quantiles. The references
+are saved to `Models/drift_reference.json`.
+
+A DriftMonitor keeps, per model, a fixed (features x bins) count matrix of the inputs
+it has scored. Observing a row is one vectorized comparison against the padded edge
+matrix (a batch adds one bincount), so the cost per prediction is constant and memory
+never grows; with `window` set, counts cover the last one to two windows of observations.
+On demand each feature gets
+
+* PSI  -- population stability index, sum((live - ref) * ln(live / ref)) over bins
+  (< 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant shift);
+* KS   -- largest gap between the binned reference and live CDFs, with its asymptotic
+  p-value (binning makes it a lower bound on the exact two-sample statistic).
+
+    python -m diagnosis.drift fit                                   # Datasets/ -> Models/drift_reference.json
+    python -m diagnosis.drift report --audit audit/predictions.db --since 2026-10-01
+    python -m diagnosis.drift report --csv new_patients.csv --disease heart_disease
+"""
+import argparse
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from diagnosis.artifact import build_timestamp
+from diagnosis.registry import MODEL_FILES, MODELS_DIR
+from diagnosis.schema import DATASETS_DIR, get_schema
+
+REFERENCE_FILE = 'drift_reference.json'
+FORMAT = 'medai-drift-reference'
+FORMAT_VERSION = 1
+CONTINUOUS_BINS = 10
+# Features with at most this many distinct training values get one bin per value
+MAX_DISCRETE_VALUES = 20
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Floor for empty bins in PSI, so one unseen bin does not make it infinite
+PSI_EPSILON = 1e-4
+OBSERVE_CHUNK = 4096
+
+
+def feature_edges(values, bins=CONTINUOUS_BINS):
+    """Inner bin edges for one feature: midpoints between values if discrete, else quantiles"""
+    values = values[~np.isnan(values)]
+    distinct = np.unique(values)
+    if len(distinct) <= MAX_DISCRETE_VALUES:
+        return (distinct[:-1] + distinct[1:]) / 2.0
+    return np.unique(np.quantile(values, np.linspace(0.0, 1.0, bins + 1)[1:-1]))
+
+
+def _padded(edges_list):
+    """(d, width) edge matrix padded with +inf, so padded edges never count"""
+    width = max(1, max(len(edges) for edges in edges_list))
+    matrix = np.full((len(edges_list), width), np.inf)
+    for j, edges in enumerate(edges_list):
+        matrix[j, :len(edges)] = edges
+    return matrix
+
+
+def bin_counts(X, edge_matrix):
+    """(d, width + 1) counts of the rows of X; a value lands in the number of edges below it"""
+    d, width = edge_matrix.shape
+    counts = np.zeros(d * (width + 1), dtype=np.int64)
+    offsets = np.arange(d) * (width + 1)
+    for start in range(0, len(X), OBSERVE_CHUNK):
+        chunk = X[start:start + OBSERVE_CHUNK]
+        bins = (chunk[:, :, None] > edge_matrix[None, :, :]).sum(axis=2)
+        counts += np.bincount((bins + offsets).ravel(), minlength=len(counts))
+    return counts.reshape(d, width + 1)
+
+
+class Reference:
+    """Training distribution of one model's features"""
+
+    def __init__(self, name, columns, edges, counts, quantiles, rows):
+        self.name = name
+        self.columns = list(columns)
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.edge_matrix = _padded(self.edges)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.quantiles = {column: dict(values) for column, values in quantiles.items()}
+        self.rows = rows
+
+    @classmethod
+    def from_array(cls, name, columns, X):
+        X = np.asarray(X, dtype=np.float64)
+        edges = [feature_edges(X[:, j]) for j in range(X.shape[1])]
+        counts = bin_counts(X, _padded(edges))
+        quantiles = {column: {str(q): float(v) for q, v in zip(QUANTILES, np.nanquantile(X[:, j], QUANTILES))}
+                     for j, column in enumerate(columns)}
+        return cls(name, columns, edges, counts, quantiles, len(X))
+
+    @classmethod
+    def from_dataset(cls, name, datasets_dir=DATASETS_DIR):
+        schema = get_schema(name)
+        return cls.from_array(name, schema.columns, schema.vectorize_frame(schema.load_dataset(datasets_dir)))
+
+    def to_dict(self):
+        return {'columns': self.columns, 'edges': [e.tolist() for e in self.edges],
+                'counts': self.counts.tolist(), 'quantiles': self.quantiles, 'rows': self.rows}
+
+    @classmethod
+    def from_dict(cls, name, data):
+        return cls(name, data['columns'], data['edges'], data['counts'], data['quantiles'], data['rows'])
+
+
+def reference_path(models_dir=MODELS_DIR):
+    return os.path.join(models_dir, REFERENCE_FILE)
+
+
+def fit_references(names=None, datasets_dir=DATASETS_DIR):
+    return {name: Reference.from_dataset(name, datasets_dir) for name in names or MODEL_FILES}
+
+
+def save_references(references, path):
+    data = {'format': FORMAT, 'format_version': FORMAT_VERSION, 'created_at': build_timestamp(),
+            'models': {name: reference.to_dict() for name, reference in references.items()}}
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'w') as fh:
+        json.dump(data, fh, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_references(path):
+    with open(path) as fh:
+        data = json.load(fh)
+    if data.get('format') != FORMAT:
+        raise ValueError(f"{path} is not a drift reference file")
+    if data['format_version'] > FORMAT_VERSION:
+        raise ValueError(f"Drift reference format {data['format_version']} is newer than this build reads")
+    return {name: Reference.from_dict(name, entry) for name, entry in data['models'].items()}
+
+
+def psi(reference, live):
+    """Population stability index between two count vectors over the same bins"""
+    used = (reference > 0) | (live > 0)
+    p = np.maximum(reference[used] / max(reference.sum(), 1), PSI_EPSILON)
+    q = np.maximum(live[used] / max(live.sum(), 1), PSI_EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks_pvalue(statistic, n, m):
+    """Asymptotic two-sample Kolmogorov-Smirnov p-value"""
+    if statistic <= 0 or n == 0 or m == 0:
+        return 1.0
+    effective = math.sqrt(n * m / (n + m))
+    lam = (effective + 0.12 + 0.11 / effective) * statistic
+    total = sum((-1) ** (k - 1) * math.exp(-2.0 * k * k * lam * lam) for k in range(1, 101))
+    return float(min(1.0, max(0.0, 2.0 * total)))
+
+
+def ks(reference, live):
+    """Largest gap between the two binned CDFs"""
+    ref_cdf = np.cumsum(reference) / max(reference.sum(), 1)
+    live_cdf = np.cumsum(live) / max(live.sum(), 1)
+    return float(np.max(np.abs(ref_cdf - live_cdf)))
+
+
+def status(value):
+    if value >= PSI_SIGNIFICANT:
+        return 'significant'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+class DriftMonitor:
+    """Streaming per-feature bin counts of one model's inputs, compared with its Reference"""
+
+    def __init__(self, reference, window=None):
+        self.reference = reference
+        self.window = window
+        self._current = np.zeros_like(reference.counts)
+        self._previous = np.zeros_like(reference.counts)
+        self._current_rows = 0
+        self._previous_rows = 0
+        self.observed = 0
+        self._rows = np.arange(len(reference.columns))
+        self._lock = threading.Lock()
+
+    def observe(self, row):
+        """Count one input row: O(features x bins), independent of how many rows came before"""
+        row = np.asarray(row, dtype=np.float64).reshape(-1)
+        bins = (row[:, None] > self.reference.edge_matrix).sum(axis=1)
+        with self._lock:
+            self._rotate(1)
+            self._current[self._rows, bins] += 1
+            self._current_rows += 1
+            self.observed += 1
+
+    def observe_batch(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return
+        counts = bin_counts(X, self.reference.edge_matrix)
+        with self._lock:
+            self._rotate(len(X))
+            self._current += counts
+            self._current_rows += len(X)
+            self.observed += len(X)
+
+    def _rotate(self, incoming):
+        if self.window is not None and self._current_rows + incoming > self.window and self._current_rows:
+            self._previous, self._current = self._current, self._previous
+            self._current[:] = 0
+            self._previous_rows, self._current_rows = self._current_rows, 0
+
+    def counts(self):
+        with self._lock:
+            return self._current + self._previous, self._current_rows + self._previous_rows
+
+    def report(self):
+        """PSI, KS and status per feature over the observations currently held"""
+        live, rows = self.counts()
+        reference = self.reference
+        features = {}
+        for j, column in enumerate(reference.columns):
+            n_bins = len(reference.edges[j]) + 1
+            ref_counts, live_counts = reference.counts[j, :n_bins], live[j, :n_bins]
+            value = psi(ref_counts, live_counts) if rows else 0.0
+            statistic = ks(ref_counts, live_counts) if rows else 0.0
+            features[column] = {
+                'psi': round(value, 6),
+                'ks': round(statistic, 6),
+                'ks_pvalue': round(ks_pvalue(statistic, reference.rows, rows), 6),
+                'status': status(value),
+                'reference_median': reference.quantiles[column].get('0.5'),
+            }
+        worst = max(features, key=lambda column: features[column]['psi']) if features else None
+        return {
+            'rows': rows,
+            'observed': self.observed,
+            'reference_rows': reference.rows,
+            'max_psi': features[worst]['psi'] if worst else 0.0,
+            'max_psi_feature': worst,
+            'drifted': [column for column, entry in features.items() if entry['status'] != 'stable'],
+            'features': features,
+        }
+
+
+class DriftMonitors:
+    """One DriftMonitor per model, created on first use from the saved references"""
+
+    def __init__(self, references=None, models_dir=MODELS_DIR, window=None):
+        self._references = references
+        self.models_dir = models_dir
+        self.window = window
+        self._monitors = {}
+        self._lock = threading.Lock()
+
+    def _reference(self, name):
+        if self._references is None:
+            path = reference_path(self.models_dir)
+            self._references = load_references(path) if os.path.exists(path) else {}
+        if name not in self._references:
+            # Not precomputed (e.g. a newly added model): derive it from the training CSV once
+            self._references[name] = Reference.from_dataset(name)
+        return self._references[name]
+
+    def monitor(self, name):
+        monitor = self._monitors.get(name)
+        if monitor is None:
+            with self._lock:
+                monitor = self._monitors.get(name)
+                if monitor is None:
+                    monitor = self._monitors[name] = DriftMonitor(self._reference(name), self.window)
+        return monitor
+
+    def observe(self, name, row):
+        self.monitor(name).observe(row)
+
+    def observe_batch(self, name, X):
+        self.monitor(name).observe_batch(X)
+
+    def report(self, names=None):
+        return {name: self._monitors[name].report() for name in names or sorted(self._monitors)
+                if name in self._monitors}
+
+
+_default_monitors = None
+_default_lock = threading.Lock()
+
+
+def get_drift_monitors():
+    """Process-wide DriftMonitors; MEDAI_DRIFT_WINDOW bounds it to the most recent observations"""
+    global _default_monitors
+    if _default_monitors is None:
+        with _default_lock:
+            if _default_monitors is None:
+                window = os.environ.get('MEDAI_DRIFT_WINDOW')
+                _default_monitors = DriftMonitors(window=int(window) if window else None)
+    return _default_monitors
+
+
+def format_report(report):
+    lines = []
+    for name, entry in report.items():
+        lines.append(f"{name}: {entry['rows']:,} rows vs {entry['reference_rows']:,} training rows, "
+                     f"max PSI {entry['max_psi']:.3f} ({entry['max_psi_feature']})")
+        for column, feature in sorted(entry['features'].items(), key=lambda item: -item[1]['psi']):
+            lines.append(f"  {column:<28} PSI {feature['psi']:7.3f}  KS {feature['ks']:.3f} "
+                         f"(p={feature['ks_pvalue']:.3g})  {feature['status']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Input drift against the training distributions')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    fit_parser = subparsers.add_parser('fit', help='precompute the training references into Models/')
+    fit_parser.add_argument('--datasets-dir', default=DATASETS_DIR)
+    fit_parser.add_argument('--models-dir', default=MODELS_DIR)
+    report_parser = subparsers.add_parser('report', help='drift of audited or exported inputs')
+    source = report_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--audit', help='audit log database (see diagnosis.audit)')
+    source.add_argument('--csv', help='CSV export shaped like the training dataset (needs --disease)')
+    report_parser.add_argument('--disease', choices=list(MODEL_FILES))
+    report_parser.add_argument('--since')
+    report_parser.add_argument('--until')
+    report_parser.add_argument('--models-dir', default=MODELS_DIR)
+    report_parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    if args.command == 'fit':
+        references = fit_references(datasets_dir=args.datasets_dir)
+        path = save_references(references, reference_path(args.models_dir))
+        for name, reference in references.items():
+            print(f"{name}: {reference.rows} rows, {sum(len(e) + 1 for e in reference.edges)} bins")
+        print(f"wrote {path}")
+        return
+
+    monitors = DriftMonitors(models_dir=args.models_dir)
+    if args.csv:
+        if not args.disease:
+            parser.error('--csv needs --disease')
+        from diagnosis import batch
+
+        monitors.observe_batch(args.disease, batch.prepare_features(batch.read_csv(args.csv), args.disease))
+    else:
+        from diagnosis.audit import parse_time, query
+
+        rows = {}
+        for record in query(args.audit, args.disease, parse_time(args.since), parse_time(args.until)):
+            pending = rows.setdefault(record['disease'], [])
+            pending.append(record['inputs'])
+            if len(pending) >= OBSERVE_CHUNK:
+                monitors.observe_batch(record['disease'], np.asarray(pending))
+                pending.clear()
+        for name, pending in rows.items():
+            if pending:
+                monitors.observe_batch(name, np.asarray(pending))
+    report = monitors.report()
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Per-prediction explanations: decision score, calibrated probability and top features
+
+Every bundled model scores a row as ``w . x + b``, so the score splits exactly into one
+term per feature. Relative to a reference row ``r`` (the training-set feature means,
+stored in the artifact header under ``explain``)
+
+    score = (w . r + b) + sum_j w_j * (x_j - r_j)
+
+and ``w_j * (x_j - r_j)`` is feature j's contribution: positive values push towards the
+positive class. A whole batch is explained with one broadcast multiply and one argsort,
+with no per-row loop and no perturbation of the inputs. Probabilities come from the
+logistic link, or for the linear SVMs from Platt scaling fitted on the training scores
+and stored in the artifact header under ``calibration``.
+"""
+import threading
+import weakref
+
+import numpy as np
+
+from diagnosis.kernel import LINK_LOGISTIC, LinearKernel, _linear_parts
+
+DEFAULT_TOP_K = 3
+
+
+def sigmoid(z):
+    """Logistic function, without overflow for large negative scores"""
+    return np.exp(-np.logaddexp(0.0, -np.asarray(z, dtype=np.float64)))
+
+
+def fit_platt(scores, y):
+    """Platt scaling: (slope, intercept) such that P(y=1 | score) = sigmoid(slope * score + intercept)"""
+    from sklearn.linear_model import LogisticRegression
+
+    calibrator = LogisticRegression(C=1e6, max_iter=1000)
+    calibrator.fit(np.asarray(scores, dtype=np.float64).reshape(-1, 1), np.asarray(y))
+    return {'method': 'platt', 'slope': float(calibrator.coef_[0, 0]), 'intercept': float(calibrator.intercept_[0])}
+
+
+def explain_metadata(model, X, y):
+    """Artifact header entries the explainer reads: feature means and, for margin models, Platt parameters"""
+    kernel = model if isinstance(model, LinearKernel) else LinearKernel.from_estimator(model)
+    X = np.asarray(X, dtype=np.float64)
+    metadata = {'explain': {'reference': [float(mean) for mean in X.mean(axis=0)]}}
+    if kernel.link != LINK_LOGISTIC:
+        scores = X @ kernel.coef.astype(np.float64) + float(kernel.intercept)
+        metadata['calibration'] = fit_platt(scores, np.asarray(y) == kernel.classes_[1])
+    return metadata
+
+
+class Explanations:
+    """Explanations for a batch of rows; index it for one row as a dict"""
+
+    def __init__(self, feature_names, X, predictions, scores, probabilities, contributions, baseline, top_indices):
+        self.feature_names = np.asarray(feature_names, dtype=object)
+        self.X = X
+        self.predictions = predictions
+        self.scores = scores
+        self.probabilities = probabilities
+        self.contributions = contributions
+        self.baseline = baseline
+        self.top_indices = top_indices
+
+    def __len__(self):
+        return len(self.predictions)
+
+    def __getitem__(self, i):
+        record = {'prediction': int(self.predictions[i])}
+        if self.scores is not None:
+            record['score'] = float(self.scores[i])
+        if self.probabilities is not None:
+            record['probability'] = float(self.probabilities[i])
+        if self.top_indices is not None:
+            record['baseline'] = float(self.baseline)
+            record['top_features'] = [
+                {'feature': str(self.feature_names[j]), 'value': float(self.X[i, j]),
+                 'contribution': float(self.contributions[i, j])}
+                for j in self.top_indices[i]
+            ]
+        return record
+
+    def as_records(self):
+        return [self[i] for i in range(len(self))]
+
+    def top_columns(self):
+        """{column: array} of the top features and their contributions, for appending to a result frame"""
+        if self.top_indices is None:
+            return {}
+        rows = np.arange(len(self))[:, None]
+        names = self.feature_names[self.top_indices]
+        values = self.contributions[rows, self.top_indices]
+        columns = {}
+        for k in range(self.top_indices.shape[1]):
+            columns[f'top_feature_{k + 1}'] = names[:, k]
+            columns[f'contribution_{k + 1}'] = values[:, k]
+        return columns
+
+
+class Explainer:
+    """Explains one model; linear models get exact per-feature contributions
+
+    Other models (e.g. a random forest picked by `diagnosis.search`) only get their
+    prediction and `predict_proba`, since anything more would need per-row perturbation.
+    Only a weak reference to the model is kept, so a cached explainer never outlives it.
+    """
+
+    def __init__(self, model, feature_names=None, reference=None, calibration=None):
+        self._model = weakref.ref(model)
+        metadata = getattr(model, 'metadata', None) or {}
+        if feature_names is None:
+            feature_names = getattr(model, 'feature_names_in_', None)
+        self.feature_names = None if feature_names is None else [str(name) for name in feature_names]
+        self.calibration = calibration if calibration is not None else metadata.get('calibration')
+
+        if isinstance(model, LinearKernel):
+            coef, intercept, link = model.coef, model.intercept, model.link
+        else:
+            try:
+                kernel_cls, coef, intercept, _ = _linear_parts(model)
+                link = kernel_cls.link
+            except (TypeError, AttributeError):
+                coef, intercept, link = None, None, None
+        self.link = link
+        if coef is None:
+            self.coef = self.reference = self.baseline = None
+            return
+        # Copied, so the explainer holds no view onto a memory-mapped artifact
+        self.coef = np.array(coef, dtype=np.float64)
+        if reference is None:
+            reference = metadata.get('explain', {}).get('reference')
+        # Without recorded means (legacy pickles) contributions are plain coefficient x value
+        self.reference = np.zeros_like(self.coef) if reference is None else np.asarray(reference, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.baseline = float(self.reference @ self.coef + self.intercept)
+
+    @property
+    def model(self):
+        model = self._model()
+        if model is None:
+            raise ReferenceError("The explained model has been released")
+        return model
+
+    @property
+    def linear(self):
+        return self.coef is not None
+
+    def probabilities(self, scores, X):
+        if self.link == LINK_LOGISTIC:
+            return sigmoid(scores)
+        if self.calibration is not None:
+            return sigmoid(self.calibration['slope'] * scores + self.calibration['intercept'])
+        if hasattr(self.model, 'predict_proba'):
+            from diagnosis.batch import quiet_feature_names
+
+            with quiet_feature_names(self.model):
+                return self.model.predict_proba(X)[:, -1]
+        return None
+
+    def explain(self, X, top_k=DEFAULT_TOP_K):
+        """Explain an (N, d) array (or a single row) in one vectorized pass"""
+        from diagnosis.batch import quiet_feature_names
+
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        with quiet_feature_names(self.model):
+            predictions = np.asarray(self.model.predict(X))
+            scores = self.model.decision_function(X) \
+                if not self.linear and hasattr(self.model, 'decision_function') else None
+        if not self.linear:
+            probabilities = self.probabilities(scores, X)
+            return Explanations(self.feature_names or [], X, predictions, scores, probabilities, None, None, None)
+
+        contributions = (X - self.reference) * self.coef
+        scores = X @ self.coef + self.intercept
+        top_k = min(top_k, X.shape[1])
+        top_indices = np.argsort(-np.abs(contributions), axis=1, kind='stable')[:, :top_k]
+        feature_names = self.feature_names or [f'x{j}' for j in range(X.shape[1])]
+        return Explanations(feature_names, X, predictions, scores, self.probabilities(scores, X), contributions,
+                            self.baseline, top_indices)
+
+
+_explainers = weakref.WeakKeyDictionary()
+_explainers_lock = threading.Lock()
+
+
+def get_explainer(model, feature_names=None):
+    """Explainer for `model`, built once per model object and reused across requests"""
+    explainer = _explainers.get(model)
+    if explainer is None:
+        with _explainers_lock:
+            explainer = _explainers.get(model)
+            if explainer is None:
+                explainer = _explainers[model] = Explainer(model, feature_names)
+    return explainer
+
+
+def explain(model, X, feature_names=None, top_k=DEFAULT_TOP_K):
+    """Explain the rows of X under `model` (see Explainer.explain)"""
+    return get_explainer(model, feature_names).explain(X, top_k)
@@ -0,0 +1,299 @@
+"""Streaming ingestion and scoring of large raw patient exports
+
+A file is read in fixed-size chunks with explicit, compact dtypes (float32 labs, Int8
+flags and codes, category for text tokens) and only the columns the model needs. Each
+chunk flows through a generator pipeline
+
+    read -> preprocess -> score -> write
+
+and is appended to a CSV or Parquet output before the next chunk is read, so memory
+stays bounded by the chunk size whatever the size of the input. Every stage reports
+its rows/sec and the highest process RSS seen after it ran; `--trace-memory` also
+records the peak bytes each stage allocated (tracemalloc, which slows pandas down a lot).
+
+    python -m diagnosis.ingest thyroid lab_dump.csv scored.parquet --chunksize 200000
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+from diagnosis import batch
+from diagnosis.preprocess import get_preprocessor
+from diagnosis.registry import get_registry
+from diagnosis.schema import get_schema
+
+DEFAULT_CHUNK_SIZE = 100000
+# Values raw exports use for a missing measurement, besides pandas' defaults
+NA_VALUES = ['?']
+
+# Dataset column -> dtype; features not listed are read as float32 and labels as category
+INGEST_DTYPES = {
+    'diabetes': {'Pregnancies': 'Int8'},
+    'heart_disease': {column: 'Int8' for column in ('sex', 'cp', 'fbs', 'restecg', 'exang', 'slope', 'ca', 'thal')},
+    'parkinsons': {},
+    'lung_cancer': dict({'GENDER': 'category'},
+                        **{column: 'Int8' for column in get_schema('lung_cancer').columns if column not in
+                           ('GENDER', 'AGE')}),
+    'thyroid': {'sex': 'category', 'on thyroxine': 'category', 'T3 measured': 'category'},
+}
+
+
+class StageStats:
+    """Rows, time and peak allocation of one pipeline stage, accumulated over all chunks"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self.peak_bytes = None
+        self.peak_rss_bytes = None
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else None
+
+    def as_dict(self):
+        return {'rows': self.rows, 'seconds': round(self.seconds, 4),
+                'rows_per_second': None if self.rows_per_second is None else round(self.rows_per_second, 1),
+                'peak_bytes': self.peak_bytes, 'peak_rss_bytes': self.peak_rss_bytes}
+
+
+def current_rss_bytes():
+    """Resident set size of this process right now (Linux only; None elsewhere)"""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _Timer:
+    def __init__(self, stats, trace_memory):
+        self.stats = stats
+        self.trace_memory = trace_memory
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self._baseline = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.seconds += time.perf_counter() - self._start
+        rss = current_rss_bytes()
+        if rss is not None:
+            self.stats.peak_rss_bytes = max(self.stats.peak_rss_bytes or 0, rss)
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] - self._baseline
+            self.stats.peak_bytes = max(self.stats.peak_bytes or 0, peak)
+        return False
+
+
+class IngestPipeline:
+    """Chunked read -> preprocess -> score -> write for one disease model"""
+
+    def __init__(self, disease, model=None, chunksize=DEFAULT_CHUNK_SIZE, keep=(), trace_memory=False, explain=False):
+        self.disease = disease
+        self.schema = get_schema(disease)
+        self.model = model if model is not None else get_registry()[disease]
+        self.schema.check_model(self.model)
+        self.chunksize = chunksize
+        self.keep = list(keep)
+        self.trace_memory = trace_memory
+        self.explain = explain
+        self.stages = {name: StageStats(name) for name in ('read', 'preprocess', 'score', 'write')}
+        self.preprocessor = None
+
+    def _timer(self, stage):
+        return _Timer(self.stages[stage], self.trace_memory)
+
+    def read_options(self, path):
+        """usecols/dtype for `path`, resolved against its header (any case/spacing of the column names)"""
+        header = batch.read_csv(path, nrows=0)
+        preprocessor = get_preprocessor(self.disease)
+        self.preprocessor = preprocessor if preprocessor is not None and preprocessor.accepts(header) else None
+        dtypes = INGEST_DTYPES.get(self.disease, {})
+        columns = {}
+        for column in header.columns:
+            feature = self.schema.feature(column)
+            if feature is not None and feature.column not in columns.values():
+                columns[column] = feature.column
+        missing = [column for column in self.schema.columns if column not in columns.values()]
+        if missing:
+            raise ValueError(f"Missing columns for {self.disease}: {', '.join(missing)}")
+
+        dtype = {column: dtypes.get(name, 'float32') for column, name in columns.items()}
+        usecols = list(columns)
+        for column in header.columns:
+            if column in self.keep or (column == self.schema.label and column not in usecols):
+                dtype[column] = 'category' if column == self.schema.label else str
+                usecols.append(column)
+        unknown = [column for column in self.keep if column not in header.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns to keep: {', '.join(unknown)}")
+        return {'usecols': usecols, 'dtype': dtype}
+
+    def read(self, path):
+        """Generator of raw chunks"""
+        reader = batch.read_csv(path, chunksize=self.chunksize, na_values=NA_VALUES, **self.read_options(path))
+        while True:
+            with self._timer('read'):
+                chunk = next(reader, None)
+            if chunk is None:
+                return
+            self.stages['read'].rows += len(chunk)
+            yield chunk
+
+    def preprocess(self, chunks):
+        """Generator of (chunk, features) pairs"""
+        for chunk in chunks:
+            with self._timer('preprocess'):
+                features = chunk if self.preprocessor is None else self.preprocessor.transform(chunk)
+                X = self.schema.vectorize_frame(features)
+            self.stages['preprocess'].rows += len(X)
+            yield chunk, X
+
+    def score(self, pairs):
+        """Generator of output frames: kept columns plus prediction and score"""
+        score_column = 'probability' if hasattr(self.model, 'predict_proba') else 'decision_score'
+        for chunk, X in pairs:
+            with self._timer('score'):
+                predictions, scores = batch.score_array(self.model, X)
+                kept = [column for column in chunk.columns if column in self.keep or column == self.schema.label]
+                out = chunk[kept].astype(str) if kept else pd.DataFrame(index=chunk.index)
+                out['prediction'] = predictions.astype('int8')
+                if scores is not None:
+                    out[score_column] = scores.astype('float32')
+                if self.explain:
+                    for column, values in batch.explanation_columns(self.model, self.disease, X).items():
+                        out[column] = values.astype('float32') if values.dtype.kind == 'f' else values
+            self.stages['score'].rows += len(out)
+            yield out
+
+    def run(self, path, output):
+        """Stream `path` into `output` (.parquet or .csv); returns the per-stage report"""
+        started = time.perf_counter()
+        if self.trace_memory:
+            tracemalloc.start()
+        try:
+            frames = self.score(self.preprocess(self.read(path)))
+            writer = ParquetSink(output) if output.endswith('.parquet') else CsvSink(output)
+            with writer:
+                for frame in frames:
+                    with self._timer('write'):
+                        writer.write(frame)
+                    self.stages['write'].rows += len(frame)
+        finally:
+            if self.trace_memory:
+                tracemalloc.stop()
+        seconds = time.perf_counter() - started
+        from diagnosis.benchmark import peak_rss_bytes
+
+        rows = self.stages['write'].rows
+        return {
+            'disease': self.disease,
+            'input': path,
+            'output': output,
+            'preprocessed': self.preprocessor is not None,
+            'rows': rows,
+            'seconds': round(seconds, 4),
+            'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'stages': {name: stats.as_dict() for name, stats in self.stages.items()},
+        }
+
+
+class CsvSink:
+    """Appends frames to a CSV file, writing the header once"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = open(self.path, 'w', newline='')
+        self._header = True
+        return self
+
+    def write(self, frame):
+        frame.to_csv(self._fh, header=self._header, index=False)
+        self._header = False
+
+    def __exit__(self, *exc_info):
+        self._fh.close()
+        return False
+
+
+class ParquetSink:
+    """Appends frames to a Parquet file as one row group each (requires pyarrow)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def __enter__(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Writing Parquet requires pyarrow (pip install pyarrow)") from None
+        return self
+
+    def write(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def __exit__(self, *exc_info):
+        if self._writer is not None:
+            self._writer.close()
+        return False
+
+
+def ingest(disease, path, output, chunksize=DEFAULT_CHUNK_SIZE, keep=(), model=None, trace_memory=False,
+           explain=False):
+    return IngestPipeline(disease, model, chunksize, keep, trace_memory, explain).run(path, output)
+
+
+def format_report(report):
+    lines = [f"{report['disease']}: {report['rows']:,} rows in {report['seconds']:.2f} s "
+             f"({report['rows_per_second']:,.0f} rows/s) -> {report['output']}"]
+    for name, stage in report['stages'].items():
+        peak = '' if stage['peak_rss_bytes'] is None else f", RSS {stage['peak_rss_bytes'] / 2 ** 20:.1f} MiB"
+        if stage['peak_bytes'] is not None:
+            peak += f", allocated {stage['peak_bytes'] / 2 ** 20:.1f} MiB"
+        rate = stage['rows_per_second'] or 0
+        lines.append(f"  {name:<10} {stage['seconds']:8.3f} s  {rate:>14,.0f} rows/s{peak}")
+    if report['peak_rss_bytes'] is not None:
+        lines.append(f"  peak RSS {report['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream a raw patient export through a model in chunks')
+    parser.add_argument('disease', choices=list(INGEST_DTYPES))
+    parser.add_argument('input', help='raw CSV export')
+    parser.add_argument('output', help='.parquet or .csv file to write')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE, help='rows per chunk')
+    parser.add_argument('--keep', nargs='+', default=[], help='input columns to copy to the output (e.g. an ID)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also track peak allocations per stage with tracemalloc (much slower)')
+    parser.add_argument('--explain', action='store_true',
+                        help='add the calibrated probability and top contributing features of each row')
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.input):
+        parser.error(f"{args.input} does not exist")
+    report = ingest(args.disease, args.input, args.output, args.chunksize, args.keep,
+                    trace_memory=args.trace_memory, explain=args.explain)
+    print(format_report(report))
+
+
+if __name__ == '__main__':
+    main()
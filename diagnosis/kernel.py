@@ -0,0 +1,152 @@
+"""Pure-NumPy scoring kernels compiled from the linear sklearn models
+
+Every bundled model is linear (LogisticRegression or SVC(kernel='linear')), so at
+inference it is a weight vector, an intercept and a sigmoid or sign. A LinearKernel
+scores an (N, d) array with a single float32 matmul and never imports scikit-learn;
+kernels are stored as `.mdl` artifacts (see `diagnosis.artifact`).
+
+    python -m diagnosis.kernel verify            # compare against sklearn on Datasets/
+"""
+import argparse
+import time
+
+import numpy as np
+
+from diagnosis.registry import MODELS_DIR, ModelRegistry, load_pickle
+
+LINK_LOGISTIC = 'logistic'
+LINK_MARGIN = 'margin'
+
+
+class LinearKernel:
+    """Binary linear classifier: score = X @ coef + intercept, class = classes[score > 0]
+
+    Mirrors the subset of the sklearn estimator API the app uses (`predict`,
+    `decision_function`, `feature_names_in_`, `classes_`), so it can stand in for the
+    unpickled model anywhere, including `diagnosis.batch`.
+    """
+
+    link = LINK_MARGIN
+
+    def __init__(self, coef, intercept, classes, feature_names=None, name=None, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        self.coef = np.ascontiguousarray(coef, dtype=self.dtype).reshape(-1)
+        self.intercept = self.dtype.type(np.asarray(intercept).reshape(-1)[0])
+        self.classes_ = np.asarray(classes)
+        if len(self.classes_) != 2:
+            raise ValueError("Only binary classifiers can be compiled")
+        self.feature_names_in_ = None if feature_names is None or len(feature_names) == 0 \
+            else np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = len(self.coef)
+        self.name = name
+
+    @classmethod
+    def from_estimator(cls, model, name=None):
+        """Compile a fitted binary LogisticRegression, linear SVC or SGDClassifier
+
+        A Pipeline of StandardScaler followed by one of those is folded into a single
+        weight vector, so scaling costs nothing at inference.
+        """
+        kernel_cls, coef, intercept, classes = _linear_parts(model)
+        return kernel_cls(coef, intercept, classes, getattr(model, 'feature_names_in_', None), name)
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=self.dtype)
+        return X @ self.coef + self.intercept
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(np.intp)]
+
+
+class LogisticKernel(LinearKernel):
+    """LinearKernel with the logistic link, so it also offers calibrated probabilities"""
+
+    link = LINK_LOGISTIC
+
+    def predict_proba(self, X):
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack((1.0 - p, p))
+
+
+def _linear_parts(model):
+    """(kernel class, float64 coef, intercept, classes) of a fitted linear model"""
+    kind = type(model).__name__
+    if kind == 'Pipeline':
+        steps = [step for _, step in model.steps]
+        if len(steps) != 2 or type(steps[0]).__name__ != 'StandardScaler':
+            raise TypeError("Only StandardScaler -> linear model pipelines can be compiled")
+        scaler = steps[0]
+        kernel_cls, coef, intercept, classes = _linear_parts(steps[1])
+        # w . (x - mean) / scale + b  ==  (w / scale) . x + (b - (w / scale) . mean)
+        if scaler.with_std:
+            coef = coef / scaler.scale_
+        if scaler.with_mean:
+            intercept = intercept - coef @ scaler.mean_
+        return kernel_cls, coef, intercept, classes
+    if kind == 'LogisticRegression':
+        kernel_cls = LogisticKernel
+    elif kind in ('SVC', 'LinearSVC') and getattr(model, 'kernel', 'linear') == 'linear':
+        kernel_cls = LinearKernel
+    elif kind == 'SGDClassifier':
+        kernel_cls = LogisticKernel if model.loss in ('log_loss', 'log') else LinearKernel
+    else:
+        raise TypeError(f"Cannot compile {kind} into a linear kernel")
+    return (kernel_cls, np.asarray(model.coef_, dtype=np.float64).reshape(-1),
+            float(np.asarray(model.intercept_).reshape(-1)[0]), model.classes_)
+
+
+def is_compilable(model):
+    try:
+        _linear_parts(model)
+    except (TypeError, AttributeError):
+        return False
+    return True
+
+
+def verify(models_dir=MODELS_DIR, names=None, repeat=20):
+    """Score each bundled dataset with sklearn and with the kernel; report agreement and rows/sec"""
+    from diagnosis import batch
+    from diagnosis.artifact import artifact_registry
+
+    sklearn_models = ModelRegistry(models_dir, loader=load_pickle)
+    kernels = artifact_registry(models_dir)
+    report = {}
+    for name in names or sklearn_models.names():
+        model, kernel = sklearn_models[name], kernels[name]
+        X = batch.prepare_features(batch.load_dataset(name), name, model)
+        expected = model.predict(X)
+        X32 = X.astype(np.float32)
+        actual = kernel.predict(X32)
+
+        timings = {}
+        for label, scorer, data in (('sklearn', model, X), ('kernel', kernel, X32)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                scorer.predict(data)
+            timings[label] = len(X) * repeat / (time.perf_counter() - start)
+        report[name] = {
+            'rows': len(X),
+            'agreement': float(np.mean(expected == actual)),
+            'mismatches': int(np.sum(expected != actual)),
+            'sklearn_rows_per_second': round(timings['sklearn']),
+            'kernel_rows_per_second': round(timings['kernel']),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile linear models into NumPy kernels')
+    parser.add_argument('command', choices=['verify'])
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    args = parser.parse_args(argv)
+    failed = False
+    for name, result in verify(args.models_dir).items():
+        print(f"{name}: agreement {result['agreement']:.4f} ({result['mismatches']} mismatches), "
+              f"sklearn {result['sklearn_rows_per_second']:,} rows/s, "
+              f"kernel {result['kernel_rows_per_second']:,} rows/s")
+        failed = failed or result['mismatches'] > 0
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
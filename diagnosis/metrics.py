@@ -0,0 +1,276 @@
+"""Lightweight latency bookkeeping shared by the app, the API and the benchmarks
+
+`MetricsRegistry` adds labelled counters and per-stage latency histograms on top, with
+Prometheus text exposition (``GET /metrics`` on the API) and periodic JSON snapshots
+(`SnapshotWriter`; set ``MEDAI_METRICS_FILE`` for the Streamlit app).
+"""
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class LatencyWindow:
+    """Thread-safe ring buffer of the most recent latencies (seconds) with percentile summaries"""
+
+    def __init__(self, size=10000):
+        self._samples = np.zeros(size, dtype=np.float64)
+        self._size = size
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples[self._next] = seconds
+            self._next = (self._next + 1) % self._size
+            self._count += 1
+
+    @property
+    def count(self):
+        return self._count
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Count, mean and requested percentiles of the window in milliseconds"""
+        with self._lock:
+            samples = self._samples[:min(self._count, self._size)].copy()
+            count = self._count
+        result = {'count': count}
+        if len(samples) == 0:
+            return result
+        values = np.percentile(samples, percentiles) * 1000.0
+        result['mean_ms'] = round(float(samples.mean() * 1000.0), 4)
+        for p, value in zip(percentiles, values):
+            result[f'p{p}_ms'] = round(float(value), 4)
+        result['max_ms'] = round(float(samples.max() * 1000.0), 4)
+        return result
+
+
+class LatencyTracker:
+    """One LatencyWindow per key (model name, endpoint, ...) created on demand"""
+
+    def __init__(self, size=10000):
+        self._size = size
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def window(self, key):
+        window = self._windows.get(key)
+        if window is None:
+            with self._lock:
+                window = self._windows.setdefault(key, LatencyWindow(self._size))
+        return window
+
+    def observe(self, key, seconds):
+        self.window(key).observe(seconds)
+
+    def summary(self):
+        return {key: window.summary() for key, window in sorted(self._windows.items())}
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus-style upper bounds) safe to update from many threads"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value, count=1):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += count
+            self._sum += value * count
+            self._count += count
+
+    @property
+    def count(self):
+        return self._count
+
+    def snapshot(self):
+        """Cumulative counts per upper bound (last bucket is +Inf), plus count and sum"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            running += bucket_count
+            cumulative['+Inf' if bound == float('inf') else repr(bound)] = running
+        return {'buckets': cumulative, 'count': count, 'sum': total}
+
+
+# Upper bounds (seconds) of the stage latency histograms: 100 us .. 2.5 s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    """Labelled counters and latency histograms, exportable as Prometheus text or a JSON snapshot
+
+    Metric names are given without the prefix (``predictions_total``); labels are keyword
+    arguments (``disease='diabetes'``). Series are created on first use.
+    """
+
+    def __init__(self, prefix='medai', buckets=LATENCY_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.started = time.time()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).observe(seconds)
+
+    @contextlib.contextmanager
+    def time(self, stage, **labels):
+        """Observe the duration of a block under ``stage_seconds{stage=...}``, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    def counter_value(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def snapshot(self):
+        """JSON-able state of every series"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        body = {'timestamp': time.time(), 'uptime_seconds': round(time.time() - self.started, 3),
+                'counters': [], 'histograms': []}
+        for (name, labels), value in counters:
+            body['counters'].append({'name': name, 'labels': dict(labels), 'value': value})
+        for (name, labels), histogram in histograms:
+            data = histogram.snapshot()
+            data['mean'] = data['sum'] / data['count'] if data['count'] else None
+            body['histograms'].append(dict(data, name=name, labels=dict(labels)))
+        return body
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        lines, described = [], set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {self.prefix}_{name} {self._help[name]}')
+                lines.append(f'# TYPE {self.prefix}_{name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{self.prefix}_{name}{_format_labels(labels)} {value}')
+        for (name, labels), histogram in histograms:
+            header(name, 'histogram')
+            data = histogram.snapshot()
+            for bound, count in data['buckets'].items():
+                lines.append(f'{self.prefix}_{name}_bucket{_format_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{self.prefix}_{name}_sum{_format_labels(labels)} {data["sum"]!r}')
+            lines.append(f'{self.prefix}_{name}_count{_format_labels(labels)} {data["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+class SnapshotWriter:
+    """Daemon thread that appends a JSON snapshot to `path` every `interval` seconds
+
+    Each snapshot is one line (JSON Lines). With `prometheus_path` the Prometheus text
+    is also rewritten atomically on every tick, for node_exporter's textfile collector.
+    """
+
+    def __init__(self, metrics, path=None, interval=60.0, prometheus_path=None):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.prometheus_path = prometheus_path
+        self._stop = threading.Event()
+        self._thread = None
+
+    def write_once(self):
+        if self.path:
+            with open(self.path, 'a') as fh:
+                fh.write(json.dumps(self.metrics.snapshot(), sort_keys=True) + '\n')
+        if self.prometheus_path:
+            tmp_path = f'{self.prometheus_path}.tmp{os.getpid()}'
+            with open(tmp_path, 'w') as fh:
+                fh.write(self.metrics.to_prometheus())
+            os.replace(tmp_path, self.prometheus_path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write_once()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.write_once()
+
+
+def describe_prediction_metrics(metrics):
+    """Help text for the series the app and the API record"""
+    metrics.describe('predictions_total', 'Predictions served, by disease and result')
+    metrics.describe('errors_total', 'Failed predictions, by disease and the stage that failed')
+    metrics.describe('sample_buttons_total', 'Positive/negative sample buttons pressed, by disease')
+    metrics.describe('batch_rows_total', 'Rows scored by batch uploads and requests, by disease')
+    metrics.describe('slow_requests_total', 'Requests slower than the profiling threshold, by request')
+    metrics.describe('request_seconds', 'End-to-end latency of API requests, by endpoint')
+    metrics.describe('stage_seconds', 'Latency of each prediction stage (parse, vectorize, model, render, ...)')
+    return metrics
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_metrics():
+    """Process-wide MetricsRegistry, created by the first caller"""
+    global _default_metrics
+    if _default_metrics is None:
+        with _default_lock:
+            if _default_metrics is None:
+                _default_metrics = describe_prediction_metrics(MetricsRegistry())
+    return _default_metrics
@@ -0,0 +1,524 @@
+"""Online updates of the disease models from confirmed outcomes
+
+Each disease gets an OnlineLearner: an SGDClassifier with the loss of the served model
+(log loss for the logistic models, hinge for the linear SVMs). It starts from the served
+model's weights, in units standardized by the training data, and is updated with
+`partial_fit` on mini-batches of newly labelled rows. The cost of an update depends only
+on the new rows, never on the size of the training data.
+
+Each streamed row is assigned to training or to a rolling holdout by a hash of its values,
+so a repeated patient always lands on the same side. The holdout starts as the training
+split's test rows, and newer outcomes replace the oldest ones. Every `checkpoint_rows`
+trained rows the learner state is written to ``Models/online/<disease>.ckpt``, together with
+the rows still waiting for a full mini-batch, and the update is scored on the holdout against
+the current primary. In the service, OnlineLearners takes these checkpoints on a background
+thread, so the request whose rows make one due does not wait for it. Only an update that is
+significantly more accurate there is exported as ``Models/online/<disease>-<rows>.mdl``
+and promoted through `diagnosis.router`. Significance comes from a one-sided exact
+McNemar test on the holdout rows where exactly one of the two models is right. The
+previous primary stays on as a shadow, so it can be promoted back. If the primary is
+replaced by other means (a retrain or a manual promotion), the learner starts over from
+the new primary and keeps its holdout.
+
+    python -m diagnosis.online update diabetes confirmed_outcomes.csv --batch-size 64
+    python -m diagnosis.online checkpoint diabetes          # train what is buffered, gate and promote
+    python -m diagnosis.online status
+"""
+import argparse
+import copy
+import json
+import math
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from diagnosis.artifact import build_timestamp, export_model, read_artifact, write_artifact
+from diagnosis.audit import artifact_digest
+from diagnosis.kernel import LINK_LOGISTIC, LinearKernel
+from diagnosis.schema import DATASETS_DIR, SCHEMAS, get_schema
+
+ONLINE_DIR = 'online'
+CHECKPOINT_SUFFIX = '.ckpt'
+FORMAT = 'medai-online'
+VERSION_PREFIX = 'online-'
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_CHECKPOINT_ROWS = 1000
+DEFAULT_HOLDOUT_SIZE = 500
+# Percent of streamed rows held out to gate promotion instead of being trained on
+HOLDOUT_PERCENT = 20
+MIN_HOLDOUT_ROWS = 50
+DEFAULT_ALPHA = 1e-3
+DEFAULT_ETA0 = 0.01
+# Promotion needs the McNemar p-value below this, and at least this much holdout accuracy gained
+DEFAULT_SIGNIFICANCE = 0.05
+DEFAULT_MIN_GAIN = 0.005
+_STOP = object()
+
+
+def checkpoint_path(name, models_dir):
+    return os.path.join(models_dir, ONLINE_DIR, f'{name}{CHECKPOINT_SUFFIX}')
+
+
+def holdout_mask(X, percent=HOLDOUT_PERCENT):
+    """Rows that go to the holdout: a stable hash of each row's values, so duplicates agree"""
+    bits = (np.ascontiguousarray(X, dtype=np.float64) + 0.0).view(np.uint64)
+    # splitmix64-style mixing of each column into a running hash, vectorized over the rows
+    h = np.full(len(bits), 0x9E3779B97F4A7C15, dtype=np.uint64)
+    for j in range(bits.shape[1]):
+        h = (h ^ bits[:, j]) * np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(31)
+    return h % np.uint64(100) < np.uint64(percent)
+
+
+def mcnemar_p_value(wins, losses):
+    """One-sided exact McNemar test: P(at least `wins` of the wins + losses discordant pairs | no difference)"""
+    n = wins + losses
+    if n == 0:
+        return 1.0
+    return sum(math.comb(n, k) for k in range(wins, n + 1)) / 2 ** n
+
+
+def _served_parts(model):
+    """(loss, float64 coef, intercept, classes) of a served linear model or fitted estimator"""
+    kernel = model if isinstance(model, LinearKernel) else LinearKernel.from_estimator(model)
+    loss = 'log_loss' if kernel.link == LINK_LOGISTIC else 'hinge'
+    return loss, kernel.coef.astype(np.float64), float(kernel.intercept), np.asarray(kernel.classes_)
+
+
+def _estimator(loss, coef, intercept, classes, alpha, eta0, t=1.0):
+    """SGDClassifier whose next `partial_fit` continues from the given weights"""
+    from sklearn.linear_model import SGDClassifier
+
+    # A constant, small step: the weights start at a fitted optimum, not at zero
+    estimator = SGDClassifier(loss=loss, alpha=alpha, learning_rate='constant', eta0=eta0, random_state=0)
+    estimator.classes_ = np.asarray(classes)
+    estimator.coef_ = np.array(coef, dtype=np.float64).reshape(1, -1)
+    estimator.intercept_ = np.array([intercept], dtype=np.float64)
+    estimator.n_features_in_ = estimator.coef_.shape[1]
+    estimator.t_ = float(t)
+    return estimator
+
+
+class OnlineLearner:
+    """Mini-batch `partial_fit` updates of one disease model, checkpointed and gated on a rolling holdout
+
+    Not tied to a process: state lives in the checkpoint, so a learner can be stopped and
+    resumed (from the CLI or the API) without losing buffered holdout rows or its step count.
+    """
+
+    def __init__(self, name, router, batch_size=DEFAULT_BATCH_SIZE, checkpoint_rows=DEFAULT_CHECKPOINT_ROWS,
+                 holdout_size=DEFAULT_HOLDOUT_SIZE, alpha=DEFAULT_ALPHA, eta0=DEFAULT_ETA0, min_gain=DEFAULT_MIN_GAIN,
+                 significance=DEFAULT_SIGNIFICANCE, promote=True, datasets_dir=DATASETS_DIR):
+        if batch_size < 1 or checkpoint_rows < 1 or holdout_size < MIN_HOLDOUT_ROWS:
+            raise ValueError(f"batch_size and checkpoint_rows must be positive and holdout_size at least "
+                             f"{MIN_HOLDOUT_ROWS}")
+        self.name = name
+        self.schema = get_schema(name)
+        self.router = router
+        self.models_dir = router.models_dir
+        self.path = checkpoint_path(name, self.models_dir)
+        self.batch_size = batch_size
+        self.checkpoint_rows = checkpoint_rows
+        self.holdout_size = holdout_size
+        self.alpha = alpha
+        self.eta0 = eta0
+        self.min_gain = min_gain
+        self.significance = significance
+        self.promote = promote
+        self.datasets_dir = datasets_dir
+        d = self.schema.n_features
+        self._batch_X = np.empty((batch_size, d), dtype=np.float64)
+        self._batch_y = np.empty(batch_size, dtype=np.int64)
+        self._buffered = 0
+        self.rows_trained = 0
+        self.rows_since_checkpoint = 0
+        self.batches = 0
+        # Time spent in partial_fit by this process, and the rows it covered
+        self.update_seconds = 0.0
+        self.timed_rows = 0
+        self.promotions = 0
+        self.promoted_rows = 0
+        self.last_gate = None
+        self._lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        if os.path.exists(self.path):
+            self._resume()
+        else:
+            self._bootstrap()
+
+    # -- state ---------------------------------------------------------------------------
+
+    def _primary(self):
+        return self.router.deployment(self.name).primary.model
+
+    def _primary_version(self):
+        """Router version, file and artifact digest of the primary (the digest catches a retrain in place)"""
+        primary = self.router.deployment(self.name).primary
+        return {'version': primary.version, 'path': primary.path, 'digest': artifact_digest(primary.model)}
+
+    def _bootstrap(self, holdout=None):
+        """Start from the served primary; the scaler and the first holdout come from the training data"""
+        from diagnosis import training
+
+        loss, coef, intercept, classes = _served_parts(self._primary())
+        X, y = training.load_training_data(self.name, self.datasets_dir)
+        self.mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        self.scale = np.where(scale > 0, scale, 1.0)
+        # w . x + b  ==  (w * scale) . (x - mean) / scale + (b + w . mean)
+        self.estimator = _estimator(loss, coef * self.scale, intercept + coef @ self.mean, classes, self.alpha,
+                                    self.eta0)
+        self.base_version = self._primary_version()
+        if holdout is None:
+            _, X_test, _, y_test = training.split(X, y, training.TRAINING_SPECS[self.name])
+            holdout = (X_test[-self.holdout_size:], y_test[-self.holdout_size:])
+        self.holdout_X = np.zeros((self.holdout_size, self.schema.n_features), dtype=np.float64)
+        self.holdout_y = np.zeros(self.holdout_size, dtype=np.int64)
+        self.holdout_rows = self.holdout_next = 0
+        self._hold_out(*holdout)
+
+    def _resume(self):
+        arrays, header = read_artifact(self.path)
+        if header.get('format') != FORMAT or header.get('model') != self.name:
+            raise ValueError(f"{self.path} is not an online checkpoint for {self.name}")
+        self.mean, self.scale = np.array(arrays['mean']), np.array(arrays['scale'])
+        self.estimator = _estimator(header['loss'], arrays['coef'], float(arrays['intercept'][0]), arrays['classes'],
+                                    self.alpha, self.eta0, header['t'])
+        self.base_version = header['base_version']
+        self.holdout_X = np.zeros((self.holdout_size, self.schema.n_features), dtype=np.float64)
+        self.holdout_y = np.zeros(self.holdout_size, dtype=np.int64)
+        self.holdout_rows = self.holdout_next = 0
+        # Saved oldest first, so the ring keeps the most recent rows if the holdout size shrank
+        self._hold_out(np.array(arrays['holdout_X']), np.array(arrays['holdout_y']))
+        for key in ('rows_trained', 'batches', 'promotions', 'promoted_rows'):
+            setattr(self, key, header[key])
+        if self._primary_version() != self.base_version:
+            # The primary changed under us (retrained or promoted by hand): restart from it
+            self._bootstrap(holdout=self._holdout())
+        if 'batch_X' in arrays:
+            # Rows of the unfinished mini-batch; they train with the next rows to arrive
+            self._buffer(np.array(arrays['batch_X']), np.array(arrays['batch_y']))
+
+    def _holdout(self):
+        """Holdout rows, oldest first"""
+        if self.holdout_rows < self.holdout_size:
+            return self.holdout_X[:self.holdout_rows], self.holdout_y[:self.holdout_rows]
+        order = np.roll(np.arange(self.holdout_size), -self.holdout_next)
+        return self.holdout_X[order], self.holdout_y[order]
+
+    def _hold_out(self, X, y):
+        """Append rows to the holdout ring, overwriting the oldest once it is full"""
+        X, y = X[-self.holdout_size:], y[-self.holdout_size:]
+        slots = (self.holdout_next + np.arange(len(X))) % self.holdout_size
+        self.holdout_X[slots] = X
+        self.holdout_y[slots] = y
+        self.holdout_next = int((self.holdout_next + len(X)) % self.holdout_size)
+        self.holdout_rows = min(self.holdout_rows + len(X), self.holdout_size)
+
+    def model(self):
+        """The current update as a StandardScaler -> SGDClassifier pipeline (compiles into a kernel)"""
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = StandardScaler()
+        scaler.mean_, scaler.scale_, scaler.var_ = self.mean, self.scale, self.scale ** 2
+        scaler.n_features_in_ = len(self.mean)
+        return make_pipeline(scaler, self.estimator)
+
+    # -- updates -------------------------------------------------------------------------
+
+    def update(self, X, y, checkpoint=True):
+        """Add labelled rows: some to the holdout, the rest to mini-batches
+
+        A checkpoint that falls due is taken before returning, or with `checkpoint=False` left
+        to the caller, which finds ``due`` set in the result.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y).astype(np.int64, copy=False).reshape(-1)
+        if X.ndim != 2 or X.shape[1] != self.schema.n_features or len(X) != len(y):
+            raise ValueError(f"Expected {self.schema.n_features} features and one outcome per row")
+        unknown = np.setdiff1d(y, self.estimator.classes_)
+        if len(unknown):
+            raise ValueError(f"Unknown outcomes {unknown.tolist()}; expected {self.estimator.classes_.tolist()}")
+        held = holdout_mask(X)
+        with self._lock:
+            self._hold_out(X[held], y[held])
+            self._buffer(X[~held], y[~held])
+            buffered = self._buffered
+            due = self.rows_since_checkpoint >= self.checkpoint_rows
+        gate = self.checkpoint(train_buffered=False) if due and checkpoint else None
+        return {'rows': len(X), 'holdout': int(held.sum()), 'trained': int((~held).sum()), 'buffered': buffered,
+                'due': due, 'checkpoint': gate}
+
+    def _buffer(self, X, y):
+        """Append rows to the mini-batch, training it each time it fills"""
+        position = 0
+        while position < len(X):
+            taken = min(self.batch_size - self._buffered, len(X) - position)
+            self._batch_X[self._buffered:self._buffered + taken] = X[position:position + taken]
+            self._batch_y[self._buffered:self._buffered + taken] = y[position:position + taken]
+            self._buffered += taken
+            position += taken
+            if self._buffered == self.batch_size:
+                self._train_buffered()
+
+    def _train_buffered(self):
+        if not self._buffered:
+            return
+        start = time.perf_counter()
+        X = (self._batch_X[:self._buffered] - self.mean) / self.scale
+        y = self._batch_y[:self._buffered]
+        # partial_fit needs both classes declared, not both present in the batch
+        self.estimator.partial_fit(X, y, classes=self.estimator.classes_)
+        self.update_seconds += time.perf_counter() - start
+        self.timed_rows += self._buffered
+        self.rows_trained += self._buffered
+        self.rows_since_checkpoint += self._buffered
+        self.batches += 1
+        self._buffered = 0
+
+    def evaluate(self):
+        """Holdout accuracy of the update and of the current primary, and whether the update wins
+
+        The two models score the same rows, so the gate compares them pairwise: `wins` are
+        rows only the update gets right, `losses` rows only the primary gets right.
+        """
+        from diagnosis import batch
+
+        X, y = self._holdout()
+        candidate_correct = LinearKernel.from_estimator(self.model()).predict(X) == y
+        primary_predictions, _ = batch.score_array(self._primary(), X)
+        primary_correct = primary_predictions == y
+        wins = int(np.sum(candidate_correct & ~primary_correct))
+        losses = int(np.sum(primary_correct & ~candidate_correct))
+        result = {'holdout_rows': int(len(X)), 'rows_trained': self.rows_trained,
+                  'candidate_accuracy': float(np.mean(candidate_correct)) if len(X) else None,
+                  'primary_accuracy': float(np.mean(primary_correct)) if len(X) else None,
+                  'wins': wins, 'losses': losses, 'p_value': mcnemar_p_value(wins, losses)}
+        result['passed'] = bool(len(X) >= MIN_HOLDOUT_ROWS and self.rows_trained > self.promoted_rows and
+                                result['p_value'] < self.significance and
+                                result['candidate_accuracy'] >= result['primary_accuracy'] + self.min_gain)
+        return result
+
+    def checkpoint(self, train_buffered=True):
+        """Save the state and promote the update if it beats the primary
+
+        `train_buffered` first trains the rows waiting for a full mini-batch; otherwise they are
+        saved with the state. Only copying the state holds up `update`: the holdout scoring,
+        export and writes work on the copy. Checkpoints of one learner run one at a time.
+        """
+        with self._checkpoint_lock:
+            with self._lock:
+                if train_buffered:
+                    self._train_buffered()
+                state = self._copy()
+                self.rows_since_checkpoint = 0
+            gate = state.evaluate()
+            if gate['passed'] and self.promote:
+                gate['promoted'] = state._promote(gate)
+            state._save()
+            with self._lock:
+                self.base_version = state.base_version
+                self.promotions, self.promoted_rows = state.promotions, state.promoted_rows
+                self.last_gate = dict(gate, at=build_timestamp())
+            return gate
+
+    def _copy(self):
+        """Copy of the state that later updates leave alone"""
+        state = copy.copy(self)
+        state.estimator = copy.deepcopy(self.estimator)
+        state.holdout_X, state.holdout_y = self.holdout_X.copy(), self.holdout_y.copy()
+        state._batch_X, state._batch_y = self._batch_X[:self._buffered].copy(), self._batch_y[:self._buffered].copy()
+        return state
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        holdout_X, holdout_y = self._holdout()
+        arrays = {'coef': self.estimator.coef_.reshape(-1), 'intercept': np.asarray(self.estimator.intercept_),
+                  'classes': np.asarray(self.estimator.classes_), 'mean': self.mean, 'scale': self.scale,
+                  'holdout_X': holdout_X, 'holdout_y': holdout_y,
+                  'batch_X': self._batch_X[:self._buffered], 'batch_y': self._batch_y[:self._buffered]}
+        metadata = {'format': FORMAT, 'model': self.name, 'loss': self.estimator.loss, 't': self.estimator.t_,
+                    'base_version': self.base_version, 'holdout_rows': int(len(holdout_y)),
+                    'rows_trained': self.rows_trained, 'batches': self.batches, 'promotions': self.promotions,
+                    'promoted_rows': self.promoted_rows, 'created_at': build_timestamp()}
+        return write_artifact(self.path, arrays, metadata)
+
+    def _promote(self, gate):
+        """Export the update, make it the primary and retire the online versions it supersedes"""
+        from diagnosis.router import MODE_SHADOW
+
+        version = f'{VERSION_PREFIX}{self.rows_trained}'
+        relative = os.path.join(ONLINE_DIR, f'{self.name}-{self.rows_trained}.mdl')
+        X, y = self._holdout()
+        os.makedirs(os.path.join(self.models_dir, ONLINE_DIR), exist_ok=True)
+        export_model(self.name, self.model(), os.path.join(self.models_dir, relative), X=X, y=y,
+                     feature_names=self.schema.columns,
+                     metadata={'metrics': {'holdout_accuracy': gate['candidate_accuracy']},
+                               'online': {'rows_trained': self.rows_trained, 'holdout_rows': gate['holdout_rows'],
+                                          'primary_accuracy': gate['primary_accuracy']}})
+        demoted = self.router.deployment(self.name).primary.version
+        self.router.deploy(self.name, relative, version, MODE_SHADOW)
+        self.router.promote(self.name, version)
+        # The demoted primary stays as a shadow for rollback; older online versions go
+        for candidate in self.router.deployment(self.name).candidates:
+            if candidate.version.startswith(VERSION_PREFIX) and candidate.version != demoted:
+                self.router.retire(self.name, candidate.version)
+                os.remove(os.path.join(self.models_dir, candidate.path))
+        self.base_version = self._primary_version()
+        self.promotions += 1
+        self.promoted_rows = self.rows_trained
+        return version
+
+    def stats(self):
+        with self._lock:
+            return {'rows_trained': self.rows_trained, 'batches': self.batches, 'buffered': self._buffered,
+                    'holdout_rows': self.holdout_rows, 'promotions': self.promotions,
+                    'update_ms_per_row': round(self.update_seconds * 1000.0 / self.timed_rows, 4)
+                    if self.timed_rows else None,
+                    'last_gate': self.last_gate}
+
+
+class OnlineLearners:
+    """One OnlineLearner per disease, created on its first outcome, plus the background checkpoint thread
+
+    A checkpoint that falls due in `update` is queued to the thread, so the request does not
+    wait for the holdout scoring, export and promotion. A failed background checkpoint is
+    reported as the learner's ``last_gate``.
+    """
+
+    def __init__(self, router, **options):
+        self.router = router
+        self.options = options
+        self._learners = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='online-checkpoint', daemon=True)
+        self._thread.start()
+
+    def learner(self, name):
+        learner = self._learners.get(name)
+        if learner is None:
+            with self._lock:
+                learner = self._learners.get(name)
+                if learner is None:
+                    learner = self._learners[name] = OnlineLearner(name, self.router, **self.options)
+        return learner
+
+    def update(self, name, X, y):
+        result = self.learner(name).update(X, y, checkpoint=False)
+        if result['due']:
+            with self._lock:
+                queued = name not in self._pending
+                self._pending.add(name)
+            if queued:
+                self._queue.put(name)
+        return result
+
+    def _run(self):
+        while True:
+            name = self._queue.get()
+            if name is _STOP:
+                self._queue.task_done()
+                return
+            with self._lock:
+                self._pending.discard(name)
+            learner = self._learners[name]
+            try:
+                learner.checkpoint(train_buffered=False)
+            except Exception as e:
+                with learner._lock:
+                    learner.last_gate = {'error': f'{type(e).__name__}: {e}', 'at': build_timestamp()}
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout=10.0):
+        """Wait until the checkpoints queued so far are done"""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Finish the queued checkpoints and stop the thread"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def checkpoint(self, names=None):
+        return {name: self._learners[name].checkpoint() for name in names or list(self._learners)}
+
+    def stats(self):
+        return {name: learner.stats() for name, learner in sorted(self._learners.items())}
+
+
+def read_outcomes(path, name, models_dir, chunksize):
+    """(X, y) chunks of a labelled CSV in dataset layout; raw exports go through the saved preprocessor"""
+    from diagnosis import batch
+    from diagnosis.preprocess import get_preprocessor
+
+    schema = get_schema(name)
+    preprocessor = get_preprocessor(name, models_dir)
+    for frame in batch.read_csv(path, chunksize=chunksize):
+        features = frame if preprocessor is None or not preprocessor.accepts(frame) else preprocessor.transform(frame)
+        yield schema.vectorize_frame(features), schema.labels(frame)
+
+
+def main(argv=None):
+    from diagnosis.registry import MODELS_DIR, ModelRegistry
+    from diagnosis.router import ModelRouter
+
+    parser = argparse.ArgumentParser(description='Incremental updates of the disease models from confirmed outcomes')
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--checkpoint-rows', type=int, default=DEFAULT_CHECKPOINT_ROWS,
+                        help='trained rows between checkpoints (each one may promote the update)')
+    parser.add_argument('--min-gain', type=float, default=DEFAULT_MIN_GAIN,
+                        help='holdout accuracy an update must gain over the primary to be promoted')
+    parser.add_argument('--significance', type=float, default=DEFAULT_SIGNIFICANCE,
+                        help='McNemar p-value below which the gain counts as real')
+    parser.add_argument('--no-promote', action='store_true', help='checkpoint and gate, but never promote')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    update_parser = subparsers.add_parser('update', help='stream a labelled CSV into a model')
+    update_parser.add_argument('model', choices=list(SCHEMAS))
+    update_parser.add_argument('path')
+    update_parser.add_argument('--chunksize', type=int, default=10000)
+    checkpoint_parser = subparsers.add_parser('checkpoint', help='train buffered rows, gate and promote')
+    checkpoint_parser.add_argument('model', choices=list(SCHEMAS))
+    subparsers.add_parser('status', help='print the saved checkpoints')
+    args = parser.parse_args(argv)
+
+    if args.command == 'status':
+        for name in SCHEMAS:
+            path = checkpoint_path(name, args.models_dir)
+            if os.path.exists(path):
+                _, header = read_artifact(path)
+                print(f"{name}: {header['rows_trained']:,} rows in {header['batches']:,} batches, "
+                      f"{header['holdout_rows']} holdout rows, {header['promotions']} promotions, "
+                      f"saved {header['created_at']}")
+        return
+    router = ModelRouter(ModelRegistry(args.models_dir))
+    learner = OnlineLearner(args.model, router, args.batch_size, args.checkpoint_rows, min_gain=args.min_gain,
+                            significance=args.significance, promote=not args.no_promote)
+    if args.command == 'update':
+        start, rows = time.perf_counter(), 0
+        for X, y in read_outcomes(args.path, args.model, args.models_dir, args.chunksize):
+            result = learner.update(X, y)
+            rows += result['rows']
+            if result['checkpoint'] is not None:
+                print(json.dumps(result['checkpoint']))
+        seconds = time.perf_counter() - start
+        print(f"{args.model}: {rows:,} rows in {seconds:.2f} s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+    print(json.dumps(learner.checkpoint()))
+    print(json.dumps(learner.stats()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Screening panel: score one patient against every disease model in a single pass
+
+Intake fields that several models share (age, sex, smoking, blood pressure) are entered
+once and mapped onto each disease's own column; the remaining inputs are given per
+disease. Every model with a complete record is scored concurrently on a thread pool,
+models with missing inputs are skipped, and each outcome carries its own latency.
+
+A patient is a dict of shared fields plus optional per-disease sections::
+
+    {'age': 52, 'sex': 'Male', 'smoking': 'Yes',
+     'heart_disease': {'cp': 'Asymptomatic', 'chol': 250, ...},
+     'lung_cancer': {'COUGHING': 'Yes', ...}}
+"""
+import concurrent.futures
+import threading
+import time
+
+import numpy as np
+
+from diagnosis import batch
+from diagnosis.registry import get_registry
+from diagnosis.schema import FEMALE_MALE, NO_YES, Feature, SCHEMAS, get_schema
+
+STATUS_OK = 'ok'
+STATUS_SKIPPED = 'skipped'
+STATUS_ERROR = 'error'
+
+
+class SharedField:
+    """An intake field entered once and copied to one column of each target disease"""
+
+    def __init__(self, feature, targets):
+        self.feature = feature
+        self.targets = targets
+
+    def label(self, value):
+        """A categorical value (label or panel code) as its label; other values unchanged
+
+        The target schemas use different codes for the same answer (thyroid codes Female=1,
+        the lung survey codes No=1), so only labels can be copied between them.
+        """
+        if not self.feature.categorical or value in (None, ''):
+            return value
+        code = self.feature.encode([value])[0]
+        return next(label for label, option in self.feature.options.items() if option == code)
+
+
+# Codes are on the panel's own scales (FEMALE_MALE, NO_YES); each value reaches the diseases as a label
+SHARED_FIELDS = [
+    SharedField(Feature('age', 'Age', 'Age in years', 'slider', 1.0, 100.0),
+                {'diabetes': 'Age', 'heart_disease': 'age', 'lung_cancer': 'AGE', 'thyroid': 'age'}),
+    SharedField(Feature('sex', 'Sex', 'Sex of the patient', options=FEMALE_MALE),
+                {'heart_disease': 'sex', 'lung_cancer': 'GENDER', 'thyroid': 'sex'}),
+    SharedField(Feature('smoking', 'Smoking', 'Does the patient smoke?', options=NO_YES),
+                {'lung_cancer': 'SMOKING'}),
+    SharedField(Feature('systolic_bp', 'Systolic Blood Pressure', 'Resting systolic blood pressure (mm Hg)',
+                        'slider', 90.0, 200.0),
+                {'heart_disease': 'trestbps'}),
+    SharedField(Feature('diastolic_bp', 'Diastolic Blood Pressure', 'Diastolic blood pressure (mm Hg)',
+                        'slider', 0.0, 122.0),
+                {'diabetes': 'BloodPressure'}),
+]
+SHARED_BY_KEY = {field.feature.key: field for field in SHARED_FIELDS}
+
+
+def shared_columns(disease):
+    """Dataset columns of `disease` that are filled from the shared intake fields"""
+    return {field.targets[disease] for field in SHARED_FIELDS if disease in field.targets}
+
+
+def disease_features(disease):
+    """Features of `disease` that still have to be entered on top of the shared fields"""
+    shared = shared_columns(disease)
+    return [feature for feature in get_schema(disease).features if feature.column not in shared]
+
+
+def build_records(patient, diseases=None):
+    """Split a panel patient into one record per disease, keyed by dataset column"""
+    diseases = list(diseases or SCHEMAS)
+    unknown = [key for key in patient if key not in SHARED_BY_KEY and key not in SCHEMAS]
+    if unknown:
+        raise ValueError(f"Unknown panel fields: {', '.join(map(str, unknown))}")
+    shared = {field.feature.key: field.label(patient.get(field.feature.key)) for field in SHARED_FIELDS}
+    records = {}
+    for disease in diseases:
+        section = patient.get(disease) or {}
+        if not isinstance(section, dict):
+            raise ValueError(f"Inputs for {disease} must be an object")
+        record = get_schema(disease).canonical(section)
+        for field in SHARED_FIELDS:
+            column = field.targets.get(disease)
+            # A value given in the disease's own section wins over the shared one
+            if column is not None and record.get(column) in (None, ''):
+                record[column] = shared[field.feature.key]
+        records[disease] = record
+    return records
+
+
+class PanelResult:
+    """Consolidated outcome of one screening run"""
+
+    def __init__(self, outcomes, seconds):
+        self.outcomes = outcomes
+        self.seconds = seconds
+
+    @property
+    def scored(self):
+        return [outcome for outcome in self.outcomes if outcome['status'] == STATUS_OK]
+
+    @property
+    def skipped(self):
+        return [outcome for outcome in self.outcomes if outcome['status'] == STATUS_SKIPPED]
+
+    def as_dict(self):
+        return {'wall_ms': round(self.seconds * 1000.0, 4), 'results': self.outcomes}
+
+
+_default_executor = None
+_default_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide thread pool with one worker per model"""
+    global _default_executor
+    if _default_executor is None:
+        with _default_lock:
+            if _default_executor is None:
+                _default_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=len(SCHEMAS), thread_name_prefix='panel')
+    return _default_executor
+
+
+def _score(registry, disease, record, cache, audit=None, drift=None, router=None):
+    start = time.perf_counter()
+    schema = get_schema(disease)
+    model = registry[disease]
+    schema.check_model(model)
+    X = schema.vectorize_one(record).reshape(1, -1)
+
+    def compute(model, X):
+        def score_row(row):
+            predictions, scores = batch.score_array(model, row.reshape(1, -1))
+            return int(predictions[0]), None if scores is None else float(scores[0])
+
+        prediction, score = cache.get_or_compute(model, X[0], score_row) if cache is not None else score_row(X[0])
+        return [prediction], None if score is None else [score]
+
+    outcome = {}
+    if router is not None:
+        version, predictions, scores = router.score(disease, X, compute)
+        model = version.model
+        outcome['model_version'] = version.version
+    else:
+        predictions, scores = compute(model, X)
+    prediction, score = predictions[0], None if scores is None else scores[0]
+    if audit is not None:
+        audit.record(disease, model, X[0], prediction, score, source='panel')
+    if drift is not None:
+        drift.observe(disease, X[0])
+    outcome['prediction'] = prediction
+    if score is not None:
+        outcome['probability' if hasattr(model, 'predict_proba') else 'decision_score'] = score
+    outcome['latency_ms'] = round((time.perf_counter() - start) * 1000.0, 4)
+    return outcome
+
+
+def screen(patient, registry=None, diseases=None, executor=None, cache=None, audit=None, drift=None, router=None):
+    """Score `patient` against every disease whose inputs are complete; returns a PanelResult
+
+    Models are dispatched concurrently on `executor` (the shared panel pool by default)
+    and results come back in disease order, each with status 'ok', 'skipped' (plus the
+    `missing` columns) or 'error' (plus the message). Scored inputs are recorded in the
+    AuditLog `audit` and counted by the DriftMonitors `drift`, when given. With a ModelRouter
+    `router`, each disease is scored by the version it routes the patient to, and the
+    outcome names it.
+    """
+    start = time.perf_counter()
+    registry = registry or get_registry()
+    executor = executor or get_executor()
+    records = build_records(patient, diseases)
+
+    outcomes, futures = [], {}
+    for disease, record in records.items():
+        outcome = {'model': disease, 'title': get_schema(disease).title}
+        outcomes.append(outcome)
+        missing = get_schema(disease).missing(record)
+        if missing:
+            outcome.update(status=STATUS_SKIPPED, missing=missing)
+        else:
+            futures[disease] = (outcome, executor.submit(_score, registry, disease, record, cache, audit, drift,
+                                                               router))
+
+    for disease, (outcome, future) in futures.items():
+        try:
+            outcome.update(future.result(), status=STATUS_OK)
+        except Exception as e:
+            # One failing model must not take the other diseases' results down with it
+            outcome.update(status=STATUS_ERROR, error=str(e) if isinstance(e, (ValueError, KeyError))
+                           else f'{type(e).__name__}: {e}')
+    return PanelResult(outcomes, time.perf_counter() - start)
@@ -0,0 +1,573 @@
+"""Pre-forked multi-process serving of the REST API
+
+One Python process scores on one core at a time. The supervisor loads and warms every
+model once, then forks N workers that accept from the same listening socket, so the
+kernel spreads connections across them. The `.mdl` artifacts are read-only memory maps,
+so all workers share one physical copy of the weights. Everything else the supervisor
+loaded (imports, pickled fallbacks) is shared copy-on-write; `gc.freeze()` before the
+fork stops the collector from writing to those pages.
+
+* Reload -- when a `.mdl`/`.sav` file in `Models/` changes (or on SIGHUP) the supervisor
+  loads the new models, forks a new generation of workers and, once each is ready, stops
+  an old one. Old workers stop accepting and finish their in-flight requests, so no
+  request is dropped. If the new models fail to load, the old workers keep serving.
+* Utilization -- each worker records requests, in-flight count and busy time (wall time
+  with at least one request in flight) in a table of shared memory. Any worker serves
+  the whole table at ``GET /workers``; the supervisor logs it every ``--stats-interval``.
+* Crashed workers are replaced, and SIGTERM/SIGINT drains every worker before exiting.
+
+Limitation: each worker runs Werkzeug's threaded server on the inherited socket -- one
+thread per connection, no request timeouts and no protection against slow clients.
+Waitress and gunicorn are not dependencies, and neither can take over a listening socket
+and drain on a signal through its public API. Behind an untrusted network, put a reverse
+proxy (nginx) in front of the workers, or serve with ``gunicorn --preload -w 4
+'diagnosis.service:create_app()'``. Gunicorn shares the preloaded models the same way, but
+it has no model-change rollover and no ``/workers`` table.
+
+Serve with ``python -m diagnosis.service --workers 4``. This module's CLI measures how
+throughput scales with the number of workers, replaying the `Datasets/` rows as
+single-record requests from as many client processes as there are cores:
+
+    python -m diagnosis.prefork --workers 1 2 4 --seconds 5
+"""
+import argparse
+import gc
+import json
+import mmap
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+import numpy as np
+
+from diagnosis.registry import MODELS_DIR, ModelRegistry
+from diagnosis.router import DEPLOYMENTS_FILE
+
+DEFAULT_RELOAD_INTERVAL = 2.0
+DEFAULT_STATS_INTERVAL = 60.0
+DEFAULT_GRACE_SECONDS = 30.0
+READY_TIMEOUT = 60.0
+MODEL_SUFFIXES = ('.mdl', '.sav')
+
+FREE, STARTING, READY, DRAINING = 0, 1, 2, 3
+STATES = {FREE: 'free', STARTING: 'starting', READY: 'ready', DRAINING: 'draining'}
+SLOT_DTYPE = np.dtype([
+    ('pid', '<i8'), ('generation', '<i8'), ('state', '<i8'), ('started', '<f8'), ('requests', '<i8'),
+    ('errors', '<i8'), ('inflight', '<i8'), ('busy_since', '<f8'), ('busy_seconds', '<f8'),
+])
+
+
+class WorkerTable:
+    """Per-worker counters in anonymous shared memory, inherited by every forked worker
+
+    Each worker only writes its own slot; the supervisor and the ``/workers`` endpoint
+    read all of them.
+    """
+
+    def __init__(self, slots):
+        self._buffer = mmap.mmap(-1, slots * SLOT_DTYPE.itemsize)
+        self.slots = np.frombuffer(self._buffer, dtype=SLOT_DTYPE)
+
+    def claim(self, generation):
+        """Index of a free slot, reset for a new worker"""
+        for index in range(len(self.slots)):
+            if self.slots[index]['state'] == FREE:
+                self.slots[index] = (0, generation, STARTING, time.time(), 0, 0, 0, 0.0, 0.0)
+                return index
+        raise RuntimeError('No free worker slot')
+
+    def release(self, index):
+        self.slots[index]['state'] = FREE
+        self.slots[index]['pid'] = 0
+
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        workers = []
+        for index, slot in enumerate(self.slots.copy()):
+            if slot['state'] == FREE:
+                continue
+            busy = slot['busy_seconds'] + (now - slot['busy_since'] if slot['inflight'] > 0 else 0.0)
+            uptime = max(now - slot['started'], 1e-9)
+            workers.append({
+                'slot': index, 'pid': int(slot['pid']), 'generation': int(slot['generation']),
+                'state': STATES[int(slot['state'])], 'uptime_seconds': round(uptime, 3),
+                'requests': int(slot['requests']), 'errors': int(slot['errors']), 'inflight': int(slot['inflight']),
+                'busy_seconds': round(busy, 6), 'utilization': round(min(busy / uptime, 1.0), 4),
+            })
+        return workers
+
+
+class WorkerMiddleware:
+    """Counts the wrapped app's requests and busy time into the worker's slot; serves /workers"""
+
+    def __init__(self, app, table, index):
+        self.app = app
+        self.table = table
+        self.slot = table.slots[index:index + 1]
+        self.index = index
+        self._lock = threading.Lock()
+
+    def _begin(self):
+        with self._lock:
+            if self.slot['inflight'][0] == 0:
+                self.slot['busy_since'] = time.time()
+            self.slot['inflight'] += 1
+
+    def _end(self, failed):
+        with self._lock:
+            self.slot['inflight'] -= 1
+            self.slot['requests'] += 1
+            if failed:
+                self.slot['errors'] += 1
+            if self.slot['inflight'][0] == 0:
+                self.slot['busy_seconds'] += time.time() - self.slot['busy_since'][0]
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO') == '/workers':
+            body = json.dumps({'served_by': self.index, 'workers': self.table.snapshot()}).encode()
+            start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+            return [body]
+        status = []
+
+        def recording_start_response(code, headers, exc_info=None):
+            status.append(code)
+            return start_response(code, headers, exc_info)
+
+        self._begin()
+        try:
+            iterable = self.app(environ, recording_start_response)
+        except BaseException:
+            self._end(True)
+            raise
+        # The server calls close() once the body has been written: only then is the request done,
+        # so a draining worker never exits halfway through a response
+        return _ClosingBody(iterable, lambda: self._end(not status or status[0].startswith('5')))
+
+
+class _ClosingBody:
+    def __init__(self, iterable, on_close):
+        self.iterable = iterable
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        try:
+            if hasattr(self.iterable, 'close'):
+                self.iterable.close()
+        finally:
+            self.on_close()
+
+
+def models_signature(models_dir=MODELS_DIR):
+    """(name, size, mtime) of every model file in `models_dir`; changes when a model is replaced or promoted"""
+    entries = []
+    with os.scandir(models_dir) as scan:
+        for entry in scan:
+            # A changed deployments manifest (see diagnosis.router) rolls the workers too
+            if entry.is_file() and (entry.name.endswith(MODEL_SUFFIXES) or entry.name == DEPLOYMENTS_FILE):
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(entries))
+
+
+def load_registry(registry_factory=None, models_dir=MODELS_DIR):
+    """A registry with every model loaded and scored once, ready to be shared by forked workers"""
+    from diagnosis import batch
+    from diagnosis.schema import get_schema
+
+    registry = (registry_factory or ModelRegistry)(models_dir)
+    registry.preload()
+    for name in registry.names():
+        model = registry[name]
+        batch.score_array(model, batch.records_to_array([get_schema(name).negative_sample], name, model))
+    return registry
+
+
+def _quiet_handler():
+    from werkzeug.serving import WSGIRequestHandler
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, code='-', size='-'):
+            pass
+
+    return QuietRequestHandler
+
+
+def _worker_main(supervisor, index, registry, generation):
+    """Body of a forked worker; never returns"""
+    from werkzeug.serving import make_server
+
+    status = 0
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        slot = supervisor.table.slots[index:index + 1]
+        app = WorkerMiddleware(supervisor.app_factory(registry), supervisor.table, index)
+        server = make_server(supervisor.host, supervisor.port, app, threaded=True,
+                             request_handler=_quiet_handler(), fd=supervisor.socket.fileno())
+
+        def drain(signum, frame):
+            # shutdown() waits for serve_forever() to return, so it cannot run on this (the serving) thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        signal.signal(signal.SIGTERM, drain)
+        slot['state'] = READY
+        server.serve_forever(poll_interval=0.2)
+        slot['state'] = DRAINING
+        deadline = time.monotonic() + supervisor.grace
+        while slot['inflight'][0] > 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+
+class Supervisor:
+    """Preloads the models, forks and supervises the workers, reloads on model changes
+
+    `app_factory(registry)` builds the WSGI app inside each worker, after the fork, so
+    threads and connections it opens (micro-batcher, audit writer, metrics snapshots)
+    belong to that worker.
+    """
+
+    def __init__(self, app_factory, host='127.0.0.1', port=8000, workers=2, models_dir=MODELS_DIR,
+                 registry_factory=None, reload_interval=DEFAULT_RELOAD_INTERVAL,
+                 stats_interval=DEFAULT_STATS_INTERVAL, grace=DEFAULT_GRACE_SECONDS, stream=None):
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.models_dir = models_dir
+        self.registry_factory = registry_factory
+        self.reload_interval = reload_interval
+        self.stats_interval = stats_interval
+        self.grace = grace
+        self.stream = stream
+        # Room for a full second generation while the old one drains
+        self.table = WorkerTable(2 * workers + 1)
+        self.generation = 0
+        self.registry = None
+        self.socket = None
+        self._children = {}
+        self._draining = set()
+        self._signature = None
+        self._pending_signature = None
+        self._reload_requested = False
+        self._stopping = False
+        self._wake = threading.Event()
+        self._last_stats = (time.time(), {})
+
+    def log(self, event, **fields):
+        print(json.dumps(dict(fields, event=event, supervisor=os.getpid())), file=self.stream or sys.stdout,
+              flush=True)
+
+    def bind(self):
+        self.socket = socket.create_server((self.host, self.port), backlog=1024)
+        self.socket.set_inheritable(True)
+        self.port = self.socket.getsockname()[1]
+        return self.port
+
+    def _load(self):
+        start = time.perf_counter()
+        signature = models_signature(self.models_dir)
+        registry = load_registry(self.registry_factory, self.models_dir)
+        # Move everything loaded so far out of the collector's reach, so it never dirties the shared pages;
+        # unfrozen first so a replaced generation of models can still be collected
+        gc.unfreeze()
+        self.registry, self._signature = registry, signature
+        gc.collect()
+        gc.freeze()
+        self.generation += 1
+        self.log('models_loaded', generation=self.generation, load_ms=round((time.perf_counter() - start) * 1000, 3),
+                 models=sorted(registry.names()))
+
+    def _spawn(self):
+        index = self.table.claim(self.generation)
+        pid = os.fork()
+        if pid == 0:
+            _worker_main(self, index, self.registry, self.generation)
+        self.table.slots[index]['pid'] = pid
+        self._children[pid] = index
+        return pid
+
+    def _wait_ready(self, pid, timeout=READY_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            index = self._children.get(pid)
+            if index is None:
+                return False
+            if self.table.slots[index]['state'] == READY:
+                return True
+            self._reap()
+            time.sleep(0.01)
+        return False
+
+    def _stop_worker(self, pid):
+        self._draining.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self._children.pop(pid, None)
+            if index is None:
+                continue
+            generation = int(self.table.slots[index]['generation'])
+            started = float(self.table.slots[index]['started'])
+            self.table.release(index)
+            if pid in self._draining:
+                self._draining.discard(pid)
+                self.log('worker_stopped', pid=pid, generation=generation)
+            elif not self._stopping:
+                self.log('worker_died', pid=pid, generation=generation, status=os.waitstatus_to_exitcode(status))
+                if generation == self.generation:
+                    if time.time() - started < 1.0:
+                        # Crashing on startup: do not fork in a tight loop
+                        time.sleep(1.0)
+                    self._spawn()
+
+    def reload(self):
+        """Load the current models and roll every worker over to them"""
+        try:
+            self._load()
+        except Exception as e:
+            self._signature = models_signature(self.models_dir)
+            self.log('reload_failed', error=f'{type(e).__name__}: {e}', generation=self.generation)
+            return False
+        old = [pid for pid, index in self._children.items()
+               if self.table.slots[index]['generation'] < self.generation and pid not in self._draining]
+        for pid in old:
+            new_pid = self._spawn()
+            if not self._wait_ready(new_pid):
+                self.log('worker_not_ready', pid=new_pid, generation=self.generation)
+            self._stop_worker(pid)
+        # Top up if the worker count was short (e.g. a worker died during the reload)
+        while len(self._children) - len(self._draining) < self.workers:
+            self._spawn()
+        self.log('reloaded', generation=self.generation, workers=self.workers)
+        return True
+
+    def _check_models(self):
+        signature = models_signature(self.models_dir)
+        if signature == self._signature:
+            self._pending_signature = None
+        elif signature != self._pending_signature:
+            # Wait one more interval for the file to stop changing (a copy in progress)
+            self._pending_signature = signature
+        else:
+            self._pending_signature = None
+            self.reload()
+
+    def utilization(self):
+        """Worker table plus utilization since the previous call"""
+        now = time.time()
+        previous_time, previous_busy = self._last_stats
+        workers = self.table.snapshot(now)
+        for worker in workers:
+            busy = previous_busy.get(worker['pid'])
+            if busy is not None and now > previous_time:
+                worker['recent_utilization'] = round(min((worker['busy_seconds'] - busy) / (now - previous_time), 1.0), 4)
+        self._last_stats = (now, {worker['pid']: worker['busy_seconds'] for worker in workers})
+        return workers
+
+    def _on_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self._reload_requested = True
+        else:
+            self._stopping = True
+        self._wake.set()
+
+    def start(self):
+        if self.socket is None:
+            self.bind()
+        self._load()
+        for _ in range(self.workers):
+            self._spawn()
+        for pid in list(self._children):
+            self._wait_ready(pid)
+        self.log('serving', host=self.host, port=self.port, workers=self.workers,
+                 pids=sorted(self._children))
+
+    def run(self):
+        """Start the workers and supervise them until SIGTERM/SIGINT"""
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._on_signal)
+        self.start()
+        next_check = time.monotonic() + self.reload_interval
+        next_stats = time.monotonic() + self.stats_interval
+        self.utilization()
+        while not self._stopping:
+            self._wake.wait(0.5)
+            self._wake.clear()
+            self._reap()
+            if self._reload_requested:
+                self._reload_requested = False
+                self.reload()
+            if self.reload_interval and time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.reload_interval
+                self._check_models()
+            if self.stats_interval and time.monotonic() >= next_stats:
+                next_stats = time.monotonic() + self.stats_interval
+                self.log('utilization', workers=self.utilization())
+        self.stop()
+
+    def stop(self):
+        """Drain every worker, waiting up to the grace period plus a margin"""
+        self._stopping = True
+        for pid in list(self._children):
+            self._stop_worker(pid)
+        deadline = time.monotonic() + self.grace + 5.0
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in list(self._children):
+            os.kill(pid, signal.SIGKILL)
+        self._reap()
+        if self.socket is not None:
+            self.socket.close()
+        self.log('stopped', generation=self.generation)
+
+
+def serve_prefork(app_factory, host='127.0.0.1', port=8000, workers=2, **kwargs):
+    """Serve `app_factory(registry)` from `workers` forked processes until SIGTERM/SIGINT"""
+    if not hasattr(os, 'fork'):
+        raise RuntimeError('Pre-forked serving needs os.fork (Linux/macOS); use --workers 1')
+    Supervisor(app_factory, host, port, workers, **kwargs).run()
+
+
+def _client(url, bodies, seconds, start_at, results):
+    import http.client
+    import urllib.parse
+
+    parsed = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    requests = errors = 0
+    time.sleep(max(start_at - time.time(), 0.0))
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            path, body = bodies[requests % len(bodies)]
+            connection.request('POST', path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            requests += 1
+            errors += response.status != 200
+    except OSError:
+        errors += 1
+    finally:
+        connection.close()
+        results.put((requests, errors))
+
+
+def _request_bodies(names=None):
+    from diagnosis.registry import MODEL_FILES
+    from diagnosis.schema import get_schema
+
+    bodies = []
+    for name in names or MODEL_FILES:
+        schema = get_schema(name)
+        X = schema.vectorize_frame(schema.load_dataset())
+        bodies.extend((f'/predict/{name}', json.dumps(row.tolist())) for row in X)
+    return bodies
+
+
+def scaling_benchmark(worker_counts, seconds=5.0, clients=None, names=None, registry_factory=None, stream=None):
+    """Requests/second through a fresh supervisor per worker count; efficiency is relative to one worker"""
+    import multiprocessing
+
+    from diagnosis.service import create_app
+
+    bodies = _request_bodies(names)
+    clients = clients or os.cpu_count() or 1
+    context = multiprocessing.get_context('fork')
+    report = {'cpus': os.cpu_count(), 'clients': clients, 'seconds': seconds, 'runs': []}
+    baseline = None
+    for count in worker_counts:
+        supervisor = Supervisor(lambda registry: create_app(registry), '127.0.0.1', 0, count,
+                                registry_factory=registry_factory, reload_interval=0, stats_interval=0,
+                                stream=stream or open(os.devnull, 'w'))
+        supervisor.bind()
+        runner = context.Process(target=supervisor.run)
+        runner.start()
+        try:
+            url = f'http://127.0.0.1:{supervisor.port}'
+            results = context.Queue()
+            start_at = time.time() + 1.0
+            processes = [context.Process(target=_client, args=(url, bodies[i::clients], seconds, start_at, results))
+                         for i in range(clients)]
+            for process in processes:
+                process.start()
+            totals = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            workers = _fetch_json(url + '/workers')['workers']
+        finally:
+            os.kill(runner.pid, signal.SIGTERM)
+            runner.join()
+            supervisor.socket.close()
+        requests = sum(total[0] for total in totals)
+        rate = requests / seconds
+        baseline = baseline or rate / count
+        report['runs'].append({
+            'workers': count, 'requests': requests, 'errors': sum(total[1] for total in totals),
+            'requests_per_second': round(rate, 1), 'efficiency': round(rate / (count * baseline), 3),
+            'utilization': [worker['utilization'] for worker in workers if worker['state'] == 'ready'],
+        })
+    return report
+
+
+def _fetch_json(url, timeout=10.0):
+    import urllib.request
+
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def format_benchmark(report):
+    lines = [f"{report['cpus']} CPUs, {report['clients']} client processes, {report['seconds']:g} s per run"]
+    for run in report['runs']:
+        utilization = ' '.join(f'{value:.0%}' for value in run['utilization'])
+        lines.append(f"  {run['workers']:>3} workers  {run['requests_per_second']:>10,.1f} req/s  "
+                     f"efficiency {run['efficiency']:.0%}  errors {run['errors']}  utilization {utilization}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Throughput of the pre-forked API by number of workers')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seconds', type=float, default=5.0, help='load duration per worker count')
+    parser.add_argument('--clients', type=int, help='client processes (default: one per CPU)')
+    parser.add_argument('--models', nargs='+', help='models to send requests to (default: all)')
+    parser.add_argument('--kernels', action='store_true', help='serve only the .mdl artifacts')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+    registry_factory = None
+    if args.kernels:
+        from diagnosis.artifact import artifact_registry
+
+        registry_factory = artifact_registry
+    report = scaling_benchmark(args.workers, args.seconds, args.clients, args.models, registry_factory)
+    print(json.dumps(report, indent=2) if args.json else format_benchmark(report))
+
+
+if __name__ == '__main__':
+    main()
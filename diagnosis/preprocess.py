@@ -0,0 +1,223 @@
+"""Fitted, serializable preprocessing for raw lab exports
+
+Thyroid.ipynb turned `hypothyroid.csv` (30 raw columns: ``t``/``f`` flags, ``F``/``M``,
+``?`` for missing values) into `prepocessed_hypothyroid.csv` with a chain of replaces,
+numeric coercion, per-column mean imputation and column drops. A Preprocessor does the
+same parsing, encoding and imputation in one vectorized pass per column, keeps only the
+model's columns, and is fitted once (streaming, chunk by chunk) and saved as JSON next to
+the models, so training, batch scoring and the API apply exactly the same transform.
+
+    python -m diagnosis.preprocess fit thyroid                  # Datasets/hypothyroid.csv -> Models/
+    python -m diagnosis.preprocess transform thyroid raw.csv clean.csv --chunksize 50000
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from diagnosis.artifact import build_timestamp, file_sha256
+from diagnosis.registry import MODELS_DIR
+from diagnosis.schema import DATASETS_DIR, get_schema
+
+FORMAT = 'medai-preprocessor'
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 50000
+
+
+class Preprocessor:
+    """Raw export -> model columns: map category tokens, coerce to numbers, mean-impute
+
+    `mappings` gives column -> {raw token: code}; any other value is parsed as a number
+    and anything unparseable (``?``, blanks) is missing. `raw_markers` are columns that
+    only appear in raw exports and identify a frame as needing this transform.
+    """
+
+    def __init__(self, name, columns, mappings=None, raw_markers=(), source=None, means=None, fitted_rows=0,
+                 source_sha256=None):
+        self.name = name
+        self.columns = list(columns)
+        self.mappings = {column: dict(mapping) for column, mapping in (mappings or {}).items()}
+        self.raw_markers = list(raw_markers)
+        self.source = source
+        self.means = dict(means or {})
+        self.fitted_rows = fitted_rows
+        self.source_sha256 = source_sha256
+
+    @property
+    def fitted(self):
+        return len(self.means) == len(self.columns)
+
+    def accepts(self, frame):
+        """Whether `frame` is a raw export this preprocessor should be applied to"""
+        present = set(frame.columns)
+        return all(column in present for column in self.columns) and any(m in present for m in self.raw_markers)
+
+    def parse(self, frame):
+        """Encode and coerce the model columns of a raw frame; missing values stay NaN"""
+        parsed = {}
+        for column in self.columns:
+            values = frame[column]
+            mapping = self.mappings.get(column)
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Decode each distinct token once, then gather by category code (-1, missing, -> NaN)
+                lookup = np.append(self._decode(pd.Series(values.cat.categories), mapping).to_numpy(), np.nan)
+                parsed[column] = pd.Series(lookup[values.cat.codes.to_numpy()], index=frame.index)
+            elif values.dtype == object or mapping:
+                parsed[column] = self._decode(values, mapping)
+            else:
+                parsed[column] = values.astype(np.float64)
+        return pd.DataFrame(parsed, index=frame.index)
+
+    @staticmethod
+    def _decode(values, mapping):
+        text = values.astype(str).str.strip()
+        numbers = pd.to_numeric(text, errors='coerce')
+        if mapping:
+            numbers = text.map(mapping).astype(np.float64).fillna(numbers)
+        return numbers.astype(np.float64)
+
+    def fit(self, chunks):
+        """Fit the imputation means from a frame or an iterable of frames, one chunk at a time"""
+        if isinstance(chunks, pd.DataFrame):
+            chunks = [chunks]
+        sums = dict.fromkeys(self.columns, 0.0)
+        counts = dict.fromkeys(self.columns, 0)
+        rows = 0
+        for chunk in chunks:
+            parsed = self.parse(chunk)
+            rows += len(parsed)
+            for column in self.columns:
+                sums[column] += float(parsed[column].sum())
+                counts[column] += int(parsed[column].count())
+        empty = [column for column in self.columns if counts[column] == 0]
+        if empty:
+            raise ValueError(f"No values to fit {', '.join(empty)}")
+        self.means = {column: sums[column] / counts[column] for column in self.columns}
+        self.fitted_rows = rows
+        return self
+
+    def transform(self, frame):
+        """Raw frame -> DataFrame of the model columns with missing values imputed"""
+        if not self.fitted:
+            raise ValueError(f"{self.name} preprocessor has not been fitted")
+        return self.parse(frame).fillna(self.means)
+
+    def transform_chunks(self, chunks):
+        for chunk in chunks:
+            yield self.transform(chunk)
+
+    def fit_csv(self, path, chunksize=DEFAULT_CHUNK_SIZE):
+        self.fit(read_raw_csv(path, chunksize))
+        self.source = os.path.basename(path)
+        self.source_sha256 = file_sha256(path)
+        return self
+
+    def to_dict(self):
+        return {
+            'format': FORMAT,
+            'format_version': FORMAT_VERSION,
+            'name': self.name,
+            'columns': self.columns,
+            'mappings': self.mappings,
+            'raw_markers': self.raw_markers,
+            'means': self.means,
+            'fitted_rows': self.fitted_rows,
+            'source': self.source,
+            'source_sha256': self.source_sha256,
+            'created_at': build_timestamp(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('format') != FORMAT:
+            raise ValueError("Not a preprocessor file")
+        if data['format_version'] > FORMAT_VERSION:
+            raise ValueError(f"Preprocessor format {data['format_version']} is newer than this build reads")
+        return cls(data['name'], data['columns'], data['mappings'], data['raw_markers'], data.get('source'),
+                   data['means'], data.get('fitted_rows', 0), data.get('source_sha256'))
+
+    def save(self, path):
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'w') as fh:
+            json.dump(self.to_dict(), fh, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fh:
+            return cls.from_dict(json.load(fh))
+
+
+def read_raw_csv(path, chunksize=DEFAULT_CHUNK_SIZE):
+    """Iterate over a raw export in chunks, every column as text (exactly as exported)"""
+    return pd.read_csv(path, dtype=str, keep_default_na=False, skipinitialspace=True, encoding='utf-8-sig',
+                       chunksize=chunksize)
+
+
+_FLAG = {'t': 1, 'f': 0}
+
+# Thyroid.ipynb: t/f -> 1/0, F/M -> 1/0, '?' -> NaN, mean-impute, keep the model's seven columns
+THYROID = dict(
+    name='thyroid',
+    columns=get_schema('thyroid').columns,
+    mappings={'sex': {'F': 1, 'M': 0}, 'on thyroxine': _FLAG, 'T3 measured': _FLAG},
+    raw_markers=['referral source', 'TSH measured', 'TT4 measured', 'query on thyroxine'],
+    source='hypothyroid.csv',
+)
+PREPROCESSORS = {'thyroid': THYROID}
+
+
+def preprocessor_path(name, models_dir=MODELS_DIR):
+    return os.path.join(models_dir, f'{name}_preprocessor.json')
+
+
+_loaded = {}
+
+
+def get_preprocessor(name, models_dir=MODELS_DIR):
+    """The fitted preprocessor saved for disease `name`, or None if it has none"""
+    path = preprocessor_path(name, models_dir)
+    if path not in _loaded:
+        _loaded[path] = Preprocessor.load(path) if name in PREPROCESSORS and os.path.exists(path) else None
+    return _loaded[path]
+
+
+def fit(name, datasets_dir=DATASETS_DIR, chunksize=DEFAULT_CHUNK_SIZE):
+    spec = PREPROCESSORS[name]
+    return Preprocessor(**spec).fit_csv(os.path.join(datasets_dir, spec['source']), chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit and apply raw-export preprocessors')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    fit_parser = subparsers.add_parser('fit', help='fit on the raw dataset and save next to the models')
+    fit_parser.add_argument('name', choices=list(PREPROCESSORS))
+    fit_parser.add_argument('--datasets-dir', default=DATASETS_DIR)
+    fit_parser.add_argument('--models-dir', default=MODELS_DIR)
+    transform_parser = subparsers.add_parser('transform', help='clean a raw export, streaming in chunks')
+    transform_parser.add_argument('name', choices=list(PREPROCESSORS))
+    transform_parser.add_argument('input')
+    transform_parser.add_argument('output')
+    transform_parser.add_argument('--models-dir', default=MODELS_DIR)
+    for subparser in (fit_parser, transform_parser):
+        subparser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == 'fit':
+        preprocessor = fit(args.name, args.datasets_dir, args.chunksize)
+        path = preprocessor.save(preprocessor_path(args.name, args.models_dir))
+        print(f"{args.name}: fitted on {preprocessor.fitted_rows} rows -> {path}")
+        return
+    preprocessor = Preprocessor.load(preprocessor_path(args.name, args.models_dir))
+    rows = 0
+    for i, clean in enumerate(preprocessor.transform_chunks(read_raw_csv(args.input, args.chunksize))):
+        clean.to_csv(args.output, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(clean)
+    print(f"{args.name}: wrote {rows} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
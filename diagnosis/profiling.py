@@ -0,0 +1,158 @@
+"""Profiles of slow requests, to find hot spots under load
+
+Off by default. With a mode set, every instrumented request (a prediction in the app, a
+``POST /predict`` in the API) runs under a profiler, and the profile is kept only when
+the request took longer than the threshold:
+
+* ``cprofile`` -- deterministic cProfile; writes ``<request>-<ns>.prof`` (read it
+  with ``python -m pstats`` or snakeviz). Exact call counts, noticeable overhead.
+  Only one cProfile can be active per process (Python 3.12+ refuses a second), so a
+  request that overlaps one already being profiled is sampled instead.
+* ``sample`` -- a sampling thread records the request thread's stack every millisecond
+  and writes ``<request>-<ns>.folded`` collapsed stacks (flamegraph.pl, speedscope).
+  Much cheaper, so it can stay on under production load.
+
+The app reads ``MEDAI_PROFILE`` (cprofile|sample), ``MEDAI_PROFILE_SLOW_MS`` (default 100)
+and ``MEDAI_PROFILE_DIR`` (default ``profiles/``); the API takes ``--profile``,
+``--profile-slow-ms`` and ``--profile-dir``.
+"""
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+MODES = ('cprofile', 'sample')
+DEFAULT_SLOW_MS = 100.0
+DEFAULT_PROFILE_DIR = 'profiles'
+SAMPLE_INTERVAL = 0.001
+
+# Python 3.12+ allows only one active cProfile per process
+_cprofile_lock = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class SlowRequestProfiler:
+    """Profiles requests and keeps the profiles of those slower than `slow_ms`"""
+
+    def __init__(self, mode=None, slow_ms=DEFAULT_SLOW_MS, directory=DEFAULT_PROFILE_DIR, metrics=None,
+                 keep=50):
+        if mode not in (None,) + MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}'; expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self.metrics = metrics
+        self.captures = collections.deque(maxlen=keep)
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        """Profile the block; nested blocks in the same thread are covered by the outer one"""
+        if not self.enabled or getattr(self._local, 'active', False):
+            yield
+            return
+        self._local.active = True
+        start = time.perf_counter()
+        try:
+            # One cProfile per process: a request overlapping a profiled one is sampled instead
+            if self.mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+                try:
+                    with self._cprofile(name, start):
+                        yield
+                finally:
+                    _cprofile_lock.release()
+            else:
+                with self._sample(name, start):
+                    yield
+        finally:
+            self._local.active = False
+
+    @contextlib.contextmanager
+    def _cprofile(self, name, start):
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Some other tool (a debugger, coverage) already has a profiler enabled
+            with self._sample(name, start):
+                yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._finish(name, start, profiler)
+
+    @contextlib.contextmanager
+    def _sample(self, name, start):
+        sampler = StackSampler(threading.get_ident()).start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            self._finish(name, start, sampler)
+
+    def _finish(self, name, start, profiler):
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        if elapsed_ms < self.slow_ms:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(self.directory, f'{name}-{time.time_ns()}')
+        if not isinstance(profiler, StackSampler):
+            path = stem + '.prof'
+            profiler.dump_stats(path)
+        else:
+            path = stem + '.folded'
+            with open(path, 'w') as fh:
+                fh.write(profiler.folded())
+        self.captures.append({'name': name, 'elapsed_ms': round(elapsed_ms, 3), 'path': path})
+        if self.metrics is not None:
+            self.metrics.inc('slow_requests_total', request=name)
+
+
+def profiler_from_env(metrics=None, environ=None):
+    """SlowRequestProfiler configured by MEDAI_PROFILE, MEDAI_PROFILE_SLOW_MS and MEDAI_PROFILE_DIR"""
+    environ = os.environ if environ is None else environ
+    mode = environ.get('MEDAI_PROFILE', '').strip().lower() or None
+    return SlowRequestProfiler(mode, float(environ.get('MEDAI_PROFILE_SLOW_MS', DEFAULT_SLOW_MS)),
+                               environ.get('MEDAI_PROFILE_DIR', DEFAULT_PROFILE_DIR), metrics)
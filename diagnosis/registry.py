@@ -0,0 +1,170 @@
+"""Lazily-loaded, process-wide registry of the trained disease models"""
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(ROOT_DIR, 'Models')
+
+# Model name -> legacy pickle inside Models/ (a .mdl artifact with the same basename takes precedence)
+MODEL_FILES = {
+    'diabetes': 'diabetes_model.sav',
+    'heart_disease': 'heart_disease_model.sav',
+    'parkinsons': 'parkinsons_model.sav',
+    'lung_cancer': 'lungs_disease_model.sav',
+    'thyroid': 'Thyroid_model.sav',
+}
+
+
+class ModelStats:
+    """Load cost of a single model"""
+
+    def __init__(self, name, path, load_seconds, memory_bytes, file_bytes):
+        self.name = name
+        self.path = path
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.file_bytes = file_bytes
+        self.loaded_at = time.time()
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'path': self.path,
+            'load_ms': round(self.load_seconds * 1000.0, 3),
+            'memory_bytes': self.memory_bytes,
+            'file_bytes': self.file_bytes,
+            'loaded_at': self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """Loads each model once, on first use, and keeps it for the life of the process.
+
+    The registry is safe to share between threads (Streamlit sessions, API
+    workers); concurrent first requests for the same model load it only once.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, files=None, loader=None):
+        self.models_dir = models_dir
+        self.files = dict(MODEL_FILES if files is None else files)
+        self.loader = loader or load_model
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.created_at = time.perf_counter()
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def names(self):
+        return list(self.files)
+
+    def path(self, name):
+        if name not in self.files:
+            raise KeyError(f"Unknown model '{name}'. Available: {', '.join(self.files)}")
+        return os.path.join(self.models_dir, self.files[name])
+
+    def get(self, name):
+        """Return the model called `name`, loading it on first access"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(name)
+            if model is None:
+                model = self._load(name)
+        return model
+
+    def preload(self, names=None):
+        """Load the given models (all by default) and return their stats"""
+        for name in names or self.names():
+            self.get(name)
+        return self.stats()
+
+    def replace(self, name, model, path=None):
+        """Swap in another model for `name` without a restart; callers holding the old one keep it"""
+        if name not in self.files:
+            raise KeyError(f"Unknown model '{name}'. Available: {', '.join(self.files)}")
+        path = path or getattr(model, 'source_path', None)
+        file_bytes = os.path.getsize(path) if path and os.path.exists(path) else 0
+        with self._lock:
+            self._stats[name] = ModelStats(name, path, 0.0, model_nbytes(model), file_bytes)
+            self._models[name] = model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def stats(self):
+        """Per-model load time and memory footprint for every model loaded so far"""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def _load(self, name):
+        path = self.path(name)
+        start = time.perf_counter()
+        model = self.loader(path)
+        elapsed = time.perf_counter() - start
+        # The loader may have picked a different file (e.g. the .mdl artifact superseding a .sav)
+        path = getattr(model, 'source_path', path)
+        self._stats[name] = ModelStats(name, path, elapsed, model_nbytes(model), os.path.getsize(path))
+        self._models[name] = model
+        return model
+
+
+def load_pickle(path):
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    model = pickle.loads(data)
+    # Recorded like an artifact's, so audit records and the router can name the file and its contents
+    model.source_path = path
+    model.source_digest = 'sha256:' + hashlib.sha256(data).hexdigest()
+    return model
+
+
+def load_model(path):
+    """Load the versioned artifact that supersedes the pickle at `path`, else the pickle itself"""
+    from diagnosis.artifact import artifact_path, load_kernel
+
+    candidate = artifact_path(path)
+    if os.path.exists(candidate):
+        return load_kernel(candidate)
+    return load_pickle(path)
+
+
+def model_nbytes(obj, _seen=None):
+    """Approximate resident size of a fitted model: its arrays plus Python attribute overhead"""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(getattr(obj, 'nbytes', None), int):
+        # numpy arrays report their own buffer in getsizeof; views share their base's buffer
+        return sys.getsizeof(obj) if getattr(obj, 'base', None) is None else 0
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, dict):
+        size += sum(model_nbytes(k, seen) + model_nbytes(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(model_nbytes(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += model_nbytes(vars(obj), seen)
+    return size
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide registry shared by every caller in this interpreter"""
+    global _default_registry
+    if _default_registry is None:
+        with _default_lock:
+            if _default_registry is None:
+                _default_registry = ModelRegistry()
+    return _default_registry
@@ -0,0 +1,491 @@
+"""Model versions per disease: a primary plus shadow and traffic-split candidates
+
+Candidates are declared in ``Models/deployments.json`` (paths relative to ``Models/``)::
+
+    {"diabetes": {"primary": {"version": "2024-05", "path": "diabetes_model.mdl"},
+                  "candidates": [{"version": "retrain-10", "path": "candidates/diabetes.mdl", "mode": "shadow"},
+                                 {"version": "rbf", "path": "candidates/diabetes_rbf.sav",
+                                  "mode": "split", "weight": 0.1}]}}
+
+A disease without an entry is served by the registry's model alone, at the cost of one
+dict lookup per request.
+
+* shadow -- scores a copy of every request on a background thread, after the response
+  has been computed, so it never adds latency; when the queue is full the copy is dropped
+  and counted.
+* split  -- serves ``weight`` of the requests. The inputs are hashed, so the same patient
+  always gets the same version. The primary scores those requests in the background, so
+  agreement is still measured.
+
+Every version records requests, rows, latency percentiles, positive rate and mean score,
+once for the requests it served and once for those it scored in the background. Background
+runs go through the same scorer as the served request (prediction cache included), so the
+latencies of the two can be compared. Candidates also record their agreement with the
+primary on the same rows. `promote`
+swaps a candidate in as the primary without a restart. It replaces the model in the
+registry, so everything that reads the registry (cache, explanations, batch scoring,
+micro-batching) switches over at once. The old primary stays on as a shadow for
+comparison or rollback. Changes are written back to the manifest, so they survive
+restarts; with ``--workers`` a changed manifest rolls every worker process over to it.
+
+    python -m diagnosis.router status
+    python -m diagnosis.router deploy diabetes candidates/diabetes.mdl --version retrain-10 --mode shadow
+    python -m diagnosis.router compare diabetes retrain-10     # offline, on the training data
+    python -m diagnosis.router promote diabetes retrain-10
+    python -m diagnosis.router retire diabetes 2024-05
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from diagnosis import batch
+from diagnosis.metrics import LatencyWindow
+from diagnosis.registry import MODELS_DIR, ModelRegistry, get_registry
+
+DEPLOYMENTS_FILE = 'deployments.json'
+MODE_PRIMARY = 'primary'
+MODE_SHADOW = 'shadow'
+MODE_SPLIT = 'split'
+CANDIDATE_MODES = (MODE_SHADOW, MODE_SPLIT)
+DEFAULT_QUEUE_SIZE = 1000
+
+_STOP = object()
+
+
+def deployments_path(models_dir=MODELS_DIR):
+    return os.path.join(models_dir, DEPLOYMENTS_FILE)
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_manifest(manifest, path):
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'w') as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+class TrafficStats:
+    """Requests, rows, latency, positive rate and mean score of one kind of traffic"""
+
+    def __init__(self):
+        self.latency = LatencyWindow(size=2000)
+        self.requests = 0
+        self.rows = 0
+        self.positives = 0
+        self.score_sum = 0.0
+        self.scored_rows = 0
+        self._lock = threading.Lock()
+
+    def observe(self, predictions, scores, seconds):
+        predictions = np.asarray(predictions)
+        self.latency.observe(seconds)
+        with self._lock:
+            self.requests += 1
+            self.rows += len(predictions)
+            self.positives += int(np.count_nonzero(predictions == 1))
+            if scores is not None:
+                self.score_sum += float(np.sum(scores))
+                self.scored_rows += len(predictions)
+
+    def as_dict(self):
+        with self._lock:
+            body = {
+                'requests': self.requests,
+                'rows': self.rows,
+                'positive_rate': round(self.positives / self.rows, 6) if self.rows else None,
+                'mean_score': round(self.score_sum / self.scored_rows, 6) if self.scored_rows else None,
+            }
+        body['latency'] = self.latency.summary()
+        return body
+
+
+class VersionStats:
+    """Traffic of one model version: requests it served, and requests it scored in the background"""
+
+    def __init__(self):
+        self.served = TrafficStats()
+        self.background = TrafficStats()
+        self.compared = 0
+        self.agreed = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, predictions, scores, seconds, background=False):
+        (self.background if background else self.served).observe(predictions, scores, seconds)
+
+    def compare(self, predictions, primary_predictions):
+        agreed = int(np.count_nonzero(np.asarray(predictions) == np.asarray(primary_predictions)))
+        with self._lock:
+            self.compared += len(predictions)
+            self.agreed += agreed
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def as_dict(self):
+        body = dict(self.served.as_dict(), background=self.background.as_dict())
+        with self._lock:
+            body.update(compared_rows=self.compared, errors=self.errors,
+                        agreement=round(self.agreed / self.compared, 6) if self.compared else None)
+        return body
+
+
+class Version:
+    """One deployed model of a disease; `stats` follow the version across promotions"""
+
+    def __init__(self, version, model, path, mode=MODE_PRIMARY, weight=0.0, stats=None):
+        if mode not in (MODE_PRIMARY,) + CANDIDATE_MODES:
+            raise ValueError(f"Unknown mode '{mode}'; expected one of {', '.join(CANDIDATE_MODES)}")
+        if mode == MODE_SPLIT and not 0.0 < weight < 1.0:
+            raise ValueError("A split candidate needs a weight between 0 and 1")
+        self.version = version
+        self.model = model
+        self.path = path
+        self.mode = mode
+        self.weight = weight if mode == MODE_SPLIT else 0.0
+        self.stats = stats or VersionStats()
+
+    @property
+    def primary(self):
+        return self.mode == MODE_PRIMARY
+
+    def as_mode(self, mode, weight=0.0):
+        return Version(self.version, self.model, self.path, mode, weight, self.stats)
+
+    def as_dict(self):
+        return dict(self.stats.as_dict(), mode=self.mode, weight=self.weight, path=self.path)
+
+
+class Deployment:
+    """Primary and candidates of one disease; replaced as a whole, never modified in place"""
+
+    def __init__(self, primary, candidates=()):
+        self.primary = primary
+        self.candidates = list(candidates)
+        names = [primary.version] + [candidate.version for candidate in self.candidates]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate version names: {names}")
+        splits = [candidate for candidate in self.candidates if candidate.mode == MODE_SPLIT]
+        if sum(candidate.weight for candidate in splits) >= 1.0:
+            raise ValueError("Split weights must leave some traffic on the primary")
+        # Cumulative upper bounds of each split candidate's slice of the hash space
+        self._splits = list(zip(np.cumsum([candidate.weight for candidate in splits]), splits))
+
+    @property
+    def versions(self):
+        return [self.primary] + self.candidates
+
+    def version(self, name):
+        for version in self.versions:
+            if version.version == name:
+                return version
+        raise KeyError(f"Unknown version '{name}'; deployed: {', '.join(v.version for v in self.versions)}")
+
+    def choose(self, X):
+        if not self._splits:
+            return self.primary
+        bucket = zlib.crc32(np.ascontiguousarray(X, dtype=np.float64).tobytes()) / 2 ** 32
+        for bound, candidate in self._splits:
+            if bucket < bound:
+                return candidate
+        return self.primary
+
+    def to_manifest(self):
+        return {'primary': {'version': self.primary.version, 'path': self.primary.path},
+                'candidates': [{'version': c.version, 'path': c.path, 'mode': c.mode, 'weight': c.weight}
+                               for c in self.candidates]}
+
+
+class ModelRouter:
+    """Chooses the version that serves each request and scores the others in the background"""
+
+    def __init__(self, registry=None, manifest_path=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.registry = registry or get_registry()
+        self.models_dir = self.registry.models_dir
+        self.manifest_path = manifest_path or deployments_path(self.models_dir)
+        # Candidates load like the registry's own models (kernels only, for an artifact registry)
+        self.loader = self.registry.loader
+        self.shadow_enqueued = 0
+        self.shadow_dropped = 0
+        self._deployments = {}
+        # Re-entrant: deploy, promote and retire look up the deployment while holding it
+        self._lock = threading.RLock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        for name, entry in load_manifest(self.manifest_path).items():
+            self._deployments[name] = self._from_manifest(name, entry)
+
+    # -- configuration -----------------------------------------------------------------
+
+    def _resolve(self, path):
+        """Absolute path of a model file, which must lie inside the models directory"""
+        full = os.path.realpath(os.path.join(self.models_dir, path))
+        if os.path.commonpath([full, os.path.realpath(self.models_dir)]) != os.path.realpath(self.models_dir):
+            raise ValueError(f"Model path {path!r} is outside {self.models_dir}")
+        if not os.path.exists(full):
+            raise ValueError(f"Model file {path!r} does not exist")
+        return full
+
+    def _load(self, name, path):
+        from diagnosis.schema import get_schema
+
+        model = self.loader(self._resolve(path))
+        get_schema(name).check_model(model)
+        return model
+
+    def _default_version(self, name):
+        path = os.path.relpath(getattr(self.registry[name], 'source_path', self.registry.path(name)), self.models_dir)
+        return os.path.splitext(os.path.basename(path))[0], path
+
+    def _from_manifest(self, name, entry):
+        primary = entry.get('primary') or {}
+        default_version, default_path = self._default_version(name)
+        path = primary.get('path', default_path)
+        if os.path.realpath(self._resolve(path)) == os.path.realpath(os.path.join(self.models_dir, default_path)):
+            model = self.registry[name]
+        else:
+            model = self._load(name, path)
+            self.registry.replace(name, model, self._resolve(path))
+        deployment = Deployment(Version(primary.get('version', default_version), model, path),
+                                [Version(c['version'], self._load(name, c['path']), c['path'], c.get('mode', MODE_SHADOW),
+                                         c.get('weight', 0.0)) for c in entry.get('candidates', [])])
+        if deployment.candidates:
+            self._start()
+        return deployment
+
+    def deployment(self, name):
+        deployment = self._deployments.get(name)
+        if deployment is None:
+            with self._lock:
+                deployment = self._deployments.get(name)
+                if deployment is None:
+                    version, path = self._default_version(name)
+                    deployment = self._deployments[name] = Deployment(Version(version, self.registry[name], path))
+        return deployment
+
+    def _replace(self, name, deployment):
+        """Publish a new deployment, swap the registry's model if the primary changed and save the manifest"""
+        if deployment.primary.model is not self.registry[name]:
+            self.registry.replace(name, deployment.primary.model, self._resolve(deployment.primary.path))
+        self._deployments[name] = deployment
+        if deployment.candidates:
+            self._start()
+        manifest = load_manifest(self.manifest_path)
+        manifest[name] = deployment.to_manifest()
+        save_manifest(manifest, self.manifest_path)
+
+    def deploy(self, name, path, version, mode=MODE_SHADOW, weight=0.0):
+        """Add a candidate model file (relative to the models directory) as a shadow or split version"""
+        if mode not in CANDIDATE_MODES:
+            raise ValueError(f"Candidates are deployed as {' or '.join(CANDIDATE_MODES)}")
+        candidate = Version(version, self._load(name, path), path, mode, weight)
+        with self._lock:
+            current = self.deployment(name)
+            self._replace(name, Deployment(current.primary, current.candidates + [candidate]))
+        return candidate
+
+    def promote(self, name, version):
+        """Make a candidate the primary, without a restart; the old primary stays on as a shadow"""
+        with self._lock:
+            current = self.deployment(name)
+            chosen = current.version(version)
+            if chosen.primary:
+                return chosen
+            candidates = [c for c in current.candidates if c is not chosen] + [current.primary.as_mode(MODE_SHADOW)]
+            self._replace(name, Deployment(chosen.as_mode(MODE_PRIMARY), candidates))
+        return self._deployments[name].primary
+
+    def retire(self, name, version):
+        """Remove a candidate"""
+        with self._lock:
+            current = self.deployment(name)
+            chosen = current.version(version)
+            if chosen.primary:
+                raise ValueError("The primary cannot be retired; promote another version first")
+            self._replace(name, Deployment(current.primary, [c for c in current.candidates if c is not chosen]))
+
+    # -- request path ------------------------------------------------------------------
+
+    def select(self, name, X):
+        """The version that serves the inputs X"""
+        return self.deployment(name).choose(X)
+
+    def score(self, name, X, scorer=None, key=None):
+        """Score X with the version chosen for it; returns (version, predictions, scores)
+
+        `scorer(model, X)` defaults to `batch.score_array`; the other versions of the disease
+        are queued to score X with it in the background. The version is chosen by hashing
+        `key` (X by default), so a sweep around one patient goes to that patient's version.
+        """
+        deployment = self.deployment(name)
+        version = deployment.choose(X if key is None else key)
+        scorer = scorer or batch.score_array
+        start = time.perf_counter()
+        predictions, scores = scorer(version.model, X)
+        version.stats.observe(predictions, scores, time.perf_counter() - start)
+        if deployment.candidates:
+            self._enqueue(deployment, version, X, predictions, scorer)
+        return version, predictions, scores
+
+    def _enqueue(self, deployment, served, X, predictions, scorer):
+        try:
+            # Copied, so the caller may reuse its arrays as soon as this returns
+            self._queue.put_nowait((deployment, served, np.array(X, dtype=np.float64), np.array(predictions),
+                                    scorer))
+        except queue.Full:
+            with self._lock:
+                self.shadow_dropped += 1
+            return
+        with self._lock:
+            self.shadow_enqueued += 1
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='model-shadow', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._shadow(*item)
+            finally:
+                self._queue.task_done()
+
+    def _shadow(self, deployment, served, X, served_predictions, scorer):
+        primary_predictions = served_predictions if served.primary else None
+        # The primary goes first, so split-served requests can be compared against it
+        for version in deployment.versions:
+            if version is served:
+                continue
+            start = time.perf_counter()
+            try:
+                predictions, scores = scorer(version.model, X)
+            except Exception:
+                version.stats.error()
+                continue
+            version.stats.observe(predictions, scores, time.perf_counter() - start, background=True)
+            if version.primary:
+                primary_predictions = predictions
+                served.stats.compare(served_predictions, primary_predictions)
+            elif primary_predictions is not None:
+                version.stats.compare(predictions, primary_predictions)
+
+    def flush(self, timeout=10.0):
+        """Wait until every queued shadow request has been scored"""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self, names=None):
+        """Per disease: the primary's name and the traffic, latency and agreement of every version"""
+        body = {}
+        for name in names or sorted(self._deployments):
+            deployment = self._deployments.get(name)
+            if deployment is None:
+                continue
+            body[name] = {'primary': deployment.primary.version,
+                          'versions': {v.version: v.as_dict() for v in deployment.versions}}
+        with self._lock:
+            shadow = {'enqueued': self.shadow_enqueued, 'dropped': self.shadow_dropped,
+                      'queue_depth': self._queue.qsize()}
+        return {'deployments': body, 'shadow': shadow}
+
+
+_default_router = None
+_default_lock = threading.Lock()
+
+
+def get_model_router():
+    """Process-wide router over the process-wide registry"""
+    global _default_router
+    if _default_router is None:
+        with _default_lock:
+            if _default_router is None:
+                _default_router = ModelRouter()
+    return _default_router
+
+
+def compare(name, primary, candidate, datasets_dir=None):
+    """Offline trial: agreement, accuracy and scoring time of two models on the training data"""
+    from diagnosis.schema import DATASETS_DIR, get_schema
+
+    schema = get_schema(name)
+    frame = schema.load_dataset(datasets_dir or DATASETS_DIR)
+    X, y = schema.vectorize_frame(frame), schema.labels(frame)
+    result = {'rows': len(X)}
+    predictions = {}
+    for label, model in (('primary', primary), ('candidate', candidate)):
+        start = time.perf_counter()
+        predictions[label], _ = batch.score_array(model, X)
+        result[label] = {'accuracy': round(float(np.mean(predictions[label] == y)), 6),
+                         'positive_rate': round(float(np.mean(predictions[label] == 1)), 6),
+                         'seconds': round(time.perf_counter() - start, 6)}
+    result['agreement'] = round(float(np.mean(predictions['primary'] == predictions['candidate'])), 6)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Primary, shadow and split model versions per disease')
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='print the deployments manifest')
+    deploy_parser = subparsers.add_parser('deploy', help='add a candidate model')
+    deploy_parser.add_argument('model')
+    deploy_parser.add_argument('path', help='model file, relative to the models directory')
+    deploy_parser.add_argument('--version', required=True)
+    deploy_parser.add_argument('--mode', choices=CANDIDATE_MODES, default=MODE_SHADOW)
+    deploy_parser.add_argument('--weight', type=float, default=0.0, help='share of traffic for a split candidate')
+    for command, help_text in (('promote', 'make a candidate the primary'), ('retire', 'remove a candidate'),
+                               ('compare', 'agreement and accuracy against the primary on the training data')):
+        command_parser = subparsers.add_parser(command, help=help_text)
+        command_parser.add_argument('model')
+        command_parser.add_argument('version')
+    args = parser.parse_args(argv)
+
+    router = ModelRouter(ModelRegistry(args.models_dir))
+    try:
+        if args.command == 'deploy':
+            router.deploy(args.model, args.path, args.version, args.mode, args.weight)
+        elif args.command == 'promote':
+            router.promote(args.model, args.version)
+        elif args.command == 'retire':
+            router.retire(args.model, args.version)
+        elif args.command == 'compare':
+            deployment = router.deployment(args.model)
+            print(json.dumps(compare(args.model, deployment.primary.model, deployment.version(args.version).model),
+                             indent=2))
+            return
+    except (KeyError, ValueError) as e:
+        parser.error(str(e).strip('"\''))
+    print(json.dumps(load_manifest(router.manifest_path), indent=2, sort_keys=True) or '{}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,488 @@
+"""Declarative per-disease feature schemas
+
+A DiseaseSchema lists every model input once: dataset column, form label and help,
+widget and range, categorical encoding and column position (list order). The app
+forms, the sample buttons, batch CSV scoring and the API are all generated from it,
+and `vectorize` turns records into the contiguous float array the model expects.
+"""
+import os
+
+import numpy as np
+
+from diagnosis.registry import ROOT_DIR
+
+# pandas is imported only by the DataFrame methods: encoding single records (the app's
+# forms, the API) needs numpy alone, and pandas is most of a cold start's import time
+
+DATASETS_DIR = os.path.join(ROOT_DIR, 'Datasets')
+
+NO_YES = {'No': 0, 'Yes': 1}
+FEMALE_MALE = {'Female': 0, 'Male': 1}
+
+
+def _normalize(name):
+    return ''.join(ch for ch in str(name).lower() if ch.isalnum())
+
+
+class Feature:
+    """One model input; `options` (label -> code) makes it categorical"""
+
+    def __init__(self, column, label, help, widget='number', min_value=None, max_value=None,
+                 options=None, aliases=None, key=None):
+        self.column = column
+        self.label = label
+        self.help = help
+        self.widget = 'select' if options else widget
+        self.min_value = min_value
+        self.max_value = max_value
+        self.options = dict(options or {})
+        self.key = key or column
+        # Every spelling a raw export or API client may use for a category, mapped to its code
+        self.codes = {}
+        for text, code in list(self.options.items()) + list((aliases or {}).items()):
+            for variant in (text, str(text).upper()):
+                self.codes[variant] = code
+        for code in self.options.values():
+            self.codes.update({code: code, float(code): code, str(code): code})
+
+    @property
+    def categorical(self):
+        return bool(self.options)
+
+    @property
+    def option_labels(self):
+        return list(self.options)
+
+    def encode(self, values):
+        """Encode a sequence of raw values (labels, codes or numbers) to float64"""
+        if not self.categorical:
+            try:
+                encoded = np.asarray(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                raise ValueError(f"Non-numeric value for {self.column}") from None
+            if np.isnan(encoded).any():
+                raise ValueError(f"Missing value for {self.column}")
+            if not np.isfinite(encoded).all():
+                raise ValueError(f"Non-finite value for {self.column}")
+            return encoded
+        codes = self.codes
+
+        # Labels match case-insensitively, as encode_series matches CSV text
+        def lookup(value):
+            return codes[_label_key(value)]
+        try:
+            return np.fromiter(map(lookup, values), dtype=np.float64, count=len(values))
+        except (KeyError, TypeError, ValueError):
+            if any(_is_missing(value) for value in values):
+                raise ValueError(f"Missing value for {self.column}") from None
+            bad = next((value for value in values if not _hashable_in(_label_key(value), codes)), None)
+            raise ValueError(f"Invalid value {bad!r} for {self.column}; expected one of "
+                             f"{', '.join(map(str, self.options))}") from None
+
+    def encode_series(self, series, imputed=None):
+        """Vectorized encoding of a DataFrame column; unknown values become NaN
+
+        `imputed` is the value a fitted preprocessor fills the gaps of this column with
+        (a mean of the codes); a categorical column accepts it besides its own codes.
+        """
+        import pandas as pd
+
+        if not self.categorical:
+            return pd.to_numeric(series, errors='coerce')
+        if series.dtype != object:
+            encoded = series.map(self.codes).astype(np.float64)
+        else:
+            encoded = series.astype(str).str.strip().str.upper().map(self.codes).astype(np.float64)
+        if imputed is not None:
+            filled = encoded.isna() & np.isclose(pd.to_numeric(series, errors='coerce'), imputed)
+            encoded[filled] = imputed
+        return encoded
+
+
+def _label_key(value):
+    return value.strip().upper() if isinstance(value, str) else value
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, (float, np.floating)) and np.isnan(value))
+
+
+def _hashable_in(value, mapping):
+    try:
+        return value in mapping
+    except TypeError:
+        return False
+
+
+class DiseaseSchema:
+    """Feature list plus everything the app needs to render and explain one disease"""
+
+    def __init__(self, name, title, features, sections, dataset, label, positive_sample, negative_sample,
+                 positive_message, negative_message, description, symptoms, risk_factors,
+                 form_title='Enter Patient Details', form_note=None, label_codes=None):
+        self.name = name
+        self.title = title
+        self.features = list(features)
+        self.sections = sections
+        self.dataset = dataset
+        self.label = label
+        self.label_codes = label_codes
+        self.positive_sample = positive_sample
+        self.negative_sample = negative_sample
+        self.positive_message = positive_message
+        self.negative_message = negative_message
+        self.description = description
+        self.symptoms = symptoms
+        self.risk_factors = risk_factors
+        self.form_title = form_title
+        self.form_note = form_note
+
+        self.columns = [feature.column for feature in self.features]
+        self.by_key = {feature.key: feature for feature in self.features}
+        self._lookup = {}
+        for feature in self.features:
+            for name in (feature.column, feature.key):
+                self._lookup.setdefault(_normalize(name), feature)
+        # Compiled once: (exact column name, form key, encoder) per position
+        self._encoders = [(feature.column, feature.key, feature.encode) for feature in self.features]
+
+    @property
+    def n_features(self):
+        return len(self.features)
+
+    def feature(self, name):
+        """Feature by dataset column or form key, matched case/space/punctuation-insensitively"""
+        return self._lookup.get(_normalize(name))
+
+    def check_model(self, model):
+        """Raise ValueError if a fitted model's feature order differs from the schema"""
+        names = getattr(model, 'feature_names_in_', None)
+        if names is not None and [_normalize(n) for n in names] != [_normalize(c) for c in self.columns]:
+            raise ValueError(f"{self.name} model expects columns {list(names)}, schema lists {self.columns}")
+        n_features = getattr(model, 'n_features_in_', self.n_features)
+        if n_features != self.n_features:
+            raise ValueError(f"{self.name} model expects {n_features} features, schema lists {self.n_features}")
+
+    def canonical(self, record):
+        """Re-key a record by dataset column, accepting form keys and loosely-spelled names"""
+        result = {}
+        for name, value in record.items():
+            feature = self.feature(name)
+            if feature is not None:
+                result[feature.column] = value
+        return result
+
+    def missing(self, record):
+        """Dataset columns a record leaves out or sets to None/empty"""
+        record = self.canonical(record)
+        return [column for column in self.columns if record.get(column) in (None, '')]
+
+    def vectorize(self, records):
+        """Records -> C-contiguous (N, d) float64 array in model column order
+
+        A record is a dict (keyed by dataset column or form key) or a sequence of
+        values already in column order.
+        """
+        if not records:
+            return np.empty((0, self.n_features), dtype=np.float64)
+        if not isinstance(records[0], dict):
+            rows = [list(record) for record in records]
+            if any(len(row) != self.n_features for row in rows):
+                raise ValueError(f"{self.name} records must have {self.n_features} values")
+            columns = list(zip(*rows))
+        else:
+            columns = self._columns_from_dicts(records)
+        X = np.empty((len(records), self.n_features), dtype=np.float64)
+        for j, ((_, _, encode), values) in enumerate(zip(self._encoders, columns)):
+            X[:, j] = encode(values)
+        return X
+
+    def vectorize_one(self, record):
+        return self.vectorize([record])[0]
+
+    def _columns_from_dicts(self, records):
+        try:
+            return [[record[column] for record in records] for column, _, _ in self._encoders]
+        except KeyError:
+            pass
+        try:
+            return [[record[key] for record in records] for _, key, _ in self._encoders]
+        except KeyError:
+            pass
+        canonical = [self.canonical(record) for record in records]
+        missing = sorted({column for record in canonical for column in self.columns if column not in record})
+        if missing:
+            raise ValueError(f"Missing fields for {self.name}: {', '.join(missing)}")
+        return [[record[column] for record in canonical] for column in self.columns]
+
+    def vectorize_frame(self, frame, preprocessor=None):
+        """DataFrame (any column order/spelling, extra columns allowed) -> (N, d) float64 array
+
+        Raw exports that the disease's fitted preprocessor (the saved one by default)
+        recognises, e.g. the 30-column hypothyroid.csv format, are cleaned and imputed by
+        it first. Values it imputed are accepted in categorical columns; any other number
+        there must be one of the codes.
+        """
+        from diagnosis.preprocess import get_preprocessor
+
+        preprocessor = preprocessor or get_preprocessor(self.name)
+        imputed = {} if preprocessor is None else preprocessor.means
+        if preprocessor is not None and preprocessor.accepts(frame):
+            frame = preprocessor.transform(frame)
+        available = {}
+        for column in frame.columns:
+            feature = self.feature(column)
+            if feature is not None:
+                available.setdefault(feature.column, column)
+        missing = [column for column in self.columns if column not in available]
+        if missing:
+            raise ValueError(f"Missing columns for {self.name}: {', '.join(missing)}")
+        X = np.empty((len(frame), self.n_features), dtype=np.float64)
+        invalid = []
+        for j, feature in enumerate(self.features):
+            values = feature.encode_series(frame[available[feature.column]], imputed.get(feature.column))
+            if values.isna().any():
+                invalid.append(feature.column)
+            X[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        if invalid:
+            raise ValueError(f"Non-numeric, unknown or empty values in columns: {', '.join(invalid)}")
+        return X
+
+    def dataset_path(self, datasets_dir=DATASETS_DIR):
+        return os.path.join(datasets_dir, self.dataset)
+
+    def load_dataset(self, datasets_dir=DATASETS_DIR):
+        import pandas as pd
+        return pd.read_csv(self.dataset_path(datasets_dir), encoding='utf-8-sig', skipinitialspace=True)
+
+    def labels(self, frame):
+        """Outcome column of a training frame as int64"""
+        values = frame[self.label]
+        if self.label_codes:
+            values = values.astype(str).str.strip().str.upper().map(self.label_codes)
+        return values.to_numpy(dtype=np.int64)
+
+
+SCHEMAS = {}
+
+
+def register(schema):
+    SCHEMAS[schema.name] = schema
+    return schema
+
+
+def get_schema(name):
+    if name not in SCHEMAS:
+        raise KeyError(f"Unknown disease '{name}'. Available: {', '.join(SCHEMAS)}")
+    return SCHEMAS[name]
+
+
+register(DiseaseSchema(
+    name='diabetes',
+    title='Diabetes Prediction',
+    features=[
+        Feature('Pregnancies', 'Number of Pregnancies', 'Number of times pregnant', 'number', 0, 20),
+        Feature('Glucose', 'Glucose Level', 'Plasma glucose concentration (mg/dL)', 'slider', 0.0, 200.0),
+        Feature('BloodPressure', 'Blood Pressure', 'Diastolic blood pressure (mm Hg)', 'slider', 0.0, 122.0),
+        Feature('SkinThickness', 'Skin Thickness', 'Triceps skin fold thickness (mm)', 'slider', 0.0, 100.0),
+        Feature('Insulin', 'Insulin Level', '2-Hour serum insulin (mu U/ml)', 'number', 0, 846),
+        Feature('BMI', 'BMI value', 'Body Mass Index (weight in kg/(height in m)²)', 'slider', 0.0, 67.1),
+        Feature('DiabetesPedigreeFunction', 'Diabetes Pedigree Function',
+                'Diabetes pedigree function (genetic influence)', 'slider', 0.078, 2.42),
+        Feature('Age', 'Age', 'Age in years', 'slider', 21.0, 81.0),
+    ],
+    sections=[(None, [['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness'],
+                      ['Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age']])],
+    dataset='diabetes_data.csv',
+    label='Outcome',
+    positive_sample={'Pregnancies': 6, 'Glucose': 148, 'BloodPressure': 72, 'SkinThickness': 35,
+                     'Insulin': 155, 'BMI': 33.6, 'DiabetesPedigreeFunction': 0.627, 'Age': 50},
+    negative_sample={'Pregnancies': 1, 'Glucose': 85, 'BloodPressure': 66, 'SkinThickness': 29,
+                     'Insulin': 85, 'BMI': 26.6, 'DiabetesPedigreeFunction': 0.351, 'Age': 31},
+    positive_message="POSITIVE: The analysis indicates diabetes. Please consult with a healthcare provider.",
+    negative_message="NEGATIVE: The analysis does not indicate diabetes. Maintain a healthy lifestyle.",
+    description="Diabetes is a chronic disease that occurs when the pancreas is no longer able to make insulin, or when the body cannot make good use of the insulin it produces.",
+    symptoms="Frequent urination, increased thirst, extreme hunger, unexplained weight loss, fatigue, irritability, blurred vision, slow-healing sores.",
+    risk_factors="Family history, age, excess weight, physical inactivity, race, high blood pressure, abnormal cholesterol levels.",
+))
+
+register(DiseaseSchema(
+    name='heart_disease',
+    title='Heart Disease Prediction',
+    features=[
+        Feature('age', 'Age', 'Age in years', 'slider', 20.0, 100.0),
+        Feature('sex', 'Sex', 'Gender of the person', options=FEMALE_MALE, aliases={'F': 0, 'M': 1}),
+        Feature('cp', 'Chest Pain Type', 'Type of chest pain experienced',
+                options={'Typical Angina': 0, 'Atypical Angina': 1, 'Non-anginal Pain': 2, 'Asymptomatic': 3}),
+        Feature('trestbps', 'Resting Blood Pressure', 'Resting blood pressure (mm Hg)', 'slider', 90.0, 200.0),
+        Feature('chol', 'Serum Cholesterol', 'Serum cholesterol (mg/dl)', 'slider', 100.0, 600.0),
+        Feature('fbs', 'Fasting Blood Sugar', 'Fasting blood sugar > 120 mg/dl', options=NO_YES),
+        Feature('restecg', 'Resting ECG', 'Resting electrocardiographic results',
+                options={'Normal': 0, 'ST-T Wave Abnormality': 1, 'Left Ventricular Hypertrophy': 2}),
+        Feature('thalach', 'Max Heart Rate', 'Maximum heart rate achieved', 'slider', 70.0, 220.0),
+        Feature('exang', 'Exercise Induced Angina', 'Exercise induced angina', options=NO_YES),
+        Feature('oldpeak', 'ST Depression', 'ST depression induced by exercise relative to rest', 'slider', 0.0, 6.2),
+        Feature('slope', 'Slope of ST Segment', 'Slope of the peak exercise ST segment',
+                options={'Upsloping': 0, 'Flat': 1, 'Downsloping': 2}),
+        Feature('ca', 'Number of Major Vessels', 'Number of major vessels colored by fluoroscopy', 'slider', 0.0, 3.0),
+        Feature('thal', 'Thalassemia', 'Type of thalassemia',
+                options={'Normal': 0, 'Fixed Defect': 1, 'Reversible Defect': 2}, aliases={3: 3}),
+    ],
+    sections=[(None, [['age', 'sex', 'cp', 'trestbps'],
+                      ['chol', 'fbs', 'restecg', 'thalach'],
+                      ['exang', 'oldpeak', 'slope', 'ca', 'thal']])],
+    dataset='heart_disease_data.csv',
+    label='target',
+    positive_sample={'age': 65, 'sex': 'Male', 'cp': 'Asymptomatic', 'trestbps': 160, 'chol': 280, 'fbs': 'No',
+                     'restecg': 'Left Ventricular Hypertrophy', 'thalach': 130, 'exang': 'Yes', 'oldpeak': 3.1,
+                     'slope': 'Downsloping', 'ca': 2, 'thal': 'Reversible Defect'},
+    negative_sample={'age': 40, 'sex': 'Female', 'cp': 'Atypical Angina', 'trestbps': 120, 'chol': 180, 'fbs': 'No',
+                     'restecg': 'Normal', 'thalach': 178, 'exang': 'No', 'oldpeak': 0.8, 'slope': 'Upsloping',
+                     'ca': 0, 'thal': 'Normal'},
+    positive_message="POSITIVE: The analysis indicates heart disease. Please consult with a cardiologist.",
+    negative_message="NEGATIVE: The analysis does not indicate heart disease. Maintain a healthy lifestyle.",
+    description="Heart disease refers to a range of conditions that affect your heart, including coronary artery disease, heart rhythm problems (arrhythmias), and congenital heart defects.",
+    symptoms="Chest pain, shortness of breath, pain in the neck, jaw, throat, upper abdomen or back, numbness, weakness, coldness in legs or arms.",
+    risk_factors="Age, sex, family history, smoking, poor diet, high blood pressure, high blood cholesterol, diabetes, obesity, physical inactivity, stress.",
+))
+
+register(DiseaseSchema(
+    name='parkinsons',
+    title="Parkinson's Disease Prediction",
+    features=[
+        Feature('MDVP:Fo(Hz)', 'MDVP:Fo(Hz)', 'Average vocal fundamental frequency', 'number', 80, 260, key='fo'),
+        Feature('MDVP:Fhi(Hz)', 'MDVP:Fhi(Hz)', 'Maximum vocal fundamental frequency', 'number', 100, 600, key='fhi'),
+        Feature('MDVP:Flo(Hz)', 'MDVP:Flo(Hz)', 'Minimum vocal fundamental frequency', 'number', 60, 240, key='flo'),
+        Feature('MDVP:Jitter(%)', 'MDVP:Jitter(%)', 'Frequency variation measure (percentage)', 'number', 0.0, 1.0,
+                key='Jitter_percent'),
+        Feature('MDVP:Jitter(Abs)', 'MDVP:Jitter(Abs)', 'Absolute jitter in microseconds', 'number', 0.0, 0.01,
+                key='Jitter_Abs'),
+        Feature('MDVP:RAP', 'MDVP:RAP', 'Relative amplitude perturbation', 'number', 0.0, 0.05, key='RAP'),
+        Feature('MDVP:PPQ', 'MDVP:PPQ', 'Five-point period perturbation quotient', 'number', 0.0, 0.05, key='PPQ'),
+        Feature('Jitter:DDP', 'Jitter:DDP', 'Average absolute difference of differences of consecutive periods',
+                'number', 0.0, 0.1, key='DDP'),
+        Feature('MDVP:Shimmer', 'MDVP:Shimmer', 'Amplitude variation measure', 'number', 0.0, 0.2, key='Shimmer'),
+        Feature('MDVP:Shimmer(dB)', 'MDVP:Shimmer(dB)', 'Shimmer in decibels', 'number', 0.0, 2.0, key='Shimmer_dB'),
+        Feature('Shimmer:APQ3', 'Shimmer:APQ3', 'Three-point amplitude perturbation quotient', 'number', 0.0, 0.05,
+                key='APQ3'),
+        Feature('Shimmer:APQ5', 'Shimmer:APQ5', 'Five-point amplitude perturbation quotient', 'number', 0.0, 0.1,
+                key='APQ5'),
+        Feature('MDVP:APQ', 'MDVP:APQ', 'Amplitude perturbation quotient', 'number', 0.0, 0.15, key='APQ'),
+        Feature('Shimmer:DDA', 'Shimmer:DDA', 'Average absolute differences of consecutive differences', 'number',
+                0.0, 0.15, key='DDA'),
+        Feature('NHR', 'NHR', 'Noise-to-harmonics ratio', 'number', 0.0, 0.5),
+        Feature('HNR', 'HNR', 'Harmonics-to-noise ratio', 'number', 0.0, 35.0),
+        Feature('RPDE', 'RPDE', 'Recurrence period density entropy', 'number', 0.0, 1.0),
+        Feature('DFA', 'DFA', 'Detrended fluctuation analysis', 'number', 0.0, 1.0),
+        Feature('spread1', 'Spread1', 'Nonlinear measure of fundamental frequency variation', 'number', -10.0, 10.0),
+        Feature('spread2', 'Spread2', 'Nonlinear measure of fundamental frequency variation', 'number', 0.0, 1.0),
+        Feature('D2', 'D2', 'Correlation dimension', 'number', 0.0, 5.0),
+        Feature('PPE', 'PPE', 'Pitch period entropy', 'number', 0.0, 1.0),
+    ],
+    sections=[
+        ('Frequency Measures', [['fo', 'fhi'], ['flo']]),
+        ('Jitter & Shimmer', [['Jitter_percent', 'Jitter_Abs', 'RAP', 'PPQ', 'DDP'],
+                              ['Shimmer', 'Shimmer_dB', 'APQ3', 'APQ5', 'APQ', 'DDA']]),
+        ('Other Measures', [['NHR', 'HNR'], ['RPDE', 'DFA', 'spread1', 'spread2', 'D2', 'PPE']]),
+    ],
+    dataset='parkinson_data.csv',
+    label='status',
+    positive_sample={'fo': 119.992, 'fhi': 157.302, 'flo': 74.997, 'Jitter_percent': 0.00662, 'Jitter_Abs': 0.00004,
+                     'RAP': 0.00401, 'PPQ': 0.00317, 'DDP': 0.01204, 'Shimmer': 0.04374, 'Shimmer_dB': 0.42600,
+                     'APQ3': 0.02182, 'APQ5': 0.03130, 'APQ': 0.02971, 'DDA': 0.06545, 'NHR': 0.02211,
+                     'HNR': 21.033, 'RPDE': 0.525867, 'DFA': 0.741751, 'spread1': -6.759571,
+                     'spread2': 0.162699, 'D2': 2.103956, 'PPE': 0.210859},
+    negative_sample={'fo': 169.571, 'fhi': 193.516, 'flo': 140.394, 'Jitter_percent': 0.00370, 'Jitter_Abs': 0.00002,
+                     'RAP': 0.00168, 'PPQ': 0.00215, 'DDP': 0.00503, 'Shimmer': 0.01227, 'Shimmer_dB': 0.10628,
+                     'APQ3': 0.00558, 'APQ5': 0.00695, 'APQ': 0.00781, 'DDA': 0.01675, 'NHR': 0.00458,
+                     'HNR': 26.775, 'RPDE': 0.425493, 'DFA': 0.580295, 'spread1': -5.288332,
+                     'spread2': 0.122535, 'D2': 1.657522, 'PPE': 0.125272},
+    positive_message="POSITIVE: The analysis indicates Parkinson's disease. Please consult with a neurologist.",
+    negative_message="NEGATIVE: The analysis does not indicate Parkinson's disease.",
+    description="Parkinson's disease is a progressive nervous system disorder that affects movement. Symptoms start gradually, sometimes with a barely noticeable tremor in just one hand.",
+    symptoms="Tremor, slowed movement, rigid muscles, impaired posture and balance, loss of automatic movements, speech changes, writing changes.",
+    risk_factors="Age, heredity, sex (men are more likely to develop Parkinson's disease than women), exposure to toxins, serious head injury.",
+    form_title='Enter Voice Recording Measurements',
+    form_note="*Note: These are technical voice parameters measured from recordings. For actual diagnosis, a professional analysis is required.*",
+))
+
+# The lung cancer survey codes every symptom as 1 = No, 2 = Yes, and GENDER was label-encoded F=0, M=1
+SURVEY_NO_YES = {'No': 1, 'Yes': 2}
+
+
+def _survey_feature(column, label, help):
+    return Feature(column, label, help, options=SURVEY_NO_YES, key=column.replace(' ', '_'))
+
+
+register(DiseaseSchema(
+    name='lung_cancer',
+    title='Lung Cancer Prediction',
+    features=[
+        Feature('GENDER', 'Gender', 'Gender of the person', options=FEMALE_MALE, aliases={'F': 0, 'M': 1}),
+        Feature('AGE', 'Age', 'Age in years', 'slider', 1.0, 100.0),
+        _survey_feature('SMOKING', 'Smoking', 'Does the person smoke?'),
+        _survey_feature('YELLOW_FINGERS', 'Yellow Fingers', 'Does the person have yellow fingers?'),
+        _survey_feature('ANXIETY', 'Anxiety', 'Does the person have anxiety?'),
+        _survey_feature('PEER_PRESSURE', 'Peer Pressure', 'Is the person under peer pressure?'),
+        _survey_feature('CHRONIC DISEASE', 'Chronic Disease', 'Does the person have a chronic disease?'),
+        _survey_feature('FATIGUE', 'Fatigue', 'Does the person experience fatigue?'),
+        _survey_feature('ALLERGY', 'Allergy', 'Does the person have allergies?'),
+        _survey_feature('WHEEZING', 'Wheezing', 'Does the person experience wheezing?'),
+        _survey_feature('ALCOHOL CONSUMING', 'Alcohol Consuming', 'Does the person consume alcohol?'),
+        _survey_feature('COUGHING', 'Coughing', 'Does the person experience coughing?'),
+        _survey_feature('SHORTNESS OF BREATH', 'Shortness Of Breath', 'Does the person experience shortness of breath?'),
+        _survey_feature('SWALLOWING DIFFICULTY', 'Swallowing Difficulty', 'Does the person have difficulty swallowing?'),
+        _survey_feature('CHEST PAIN', 'Chest Pain', 'Does the person experience chest pain?'),
+    ],
+    sections=[(None, [['GENDER', 'AGE', 'SMOKING', 'YELLOW_FINGERS', 'ANXIETY'],
+                      ['PEER_PRESSURE', 'CHRONIC_DISEASE', 'FATIGUE', 'ALLERGY', 'WHEEZING'],
+                      ['ALCOHOL_CONSUMING', 'COUGHING', 'SHORTNESS_OF_BREATH', 'SWALLOWING_DIFFICULTY',
+                       'CHEST_PAIN']])],
+    dataset='survey lung cancer.csv',
+    label='LUNG_CANCER',
+    label_codes={'YES': 1, 'NO': 0},
+    positive_sample={'GENDER': 'Male', 'AGE': 65, 'SMOKING': 'Yes', 'YELLOW_FINGERS': 'Yes', 'ANXIETY': 'Yes',
+                     'PEER_PRESSURE': 'No', 'CHRONIC_DISEASE': 'Yes', 'FATIGUE': 'Yes', 'ALLERGY': 'No',
+                     'WHEEZING': 'Yes', 'ALCOHOL_CONSUMING': 'Yes', 'COUGHING': 'Yes', 'SHORTNESS_OF_BREATH': 'Yes',
+                     'SWALLOWING_DIFFICULTY': 'Yes', 'CHEST_PAIN': 'Yes'},
+    negative_sample={'GENDER': 'Female', 'AGE': 35, 'SMOKING': 'No', 'YELLOW_FINGERS': 'No', 'ANXIETY': 'No',
+                     'PEER_PRESSURE': 'No', 'CHRONIC_DISEASE': 'No', 'FATIGUE': 'No', 'ALLERGY': 'No',
+                     'WHEEZING': 'No', 'ALCOHOL_CONSUMING': 'No', 'COUGHING': 'No', 'SHORTNESS_OF_BREATH': 'No',
+                     'SWALLOWING_DIFFICULTY': 'No', 'CHEST_PAIN': 'No'},
+    positive_message="POSITIVE: The analysis indicates a risk of lung cancer. Please consult with an oncologist immediately.",
+    negative_message="NEGATIVE: The analysis does not indicate lung cancer. Maintain a healthy lifestyle.",
+    description="Lung cancer is a type of cancer that begins in the lungs. It is the leading cause of cancer deaths worldwide.",
+    symptoms="Persistent cough, coughing up blood, chest pain, hoarseness, weight loss, shortness of breath, wheezing, weakness and fatigue.",
+    risk_factors="Smoking, exposure to secondhand smoke, exposure to radon gas, exposure to asbestos, family history of lung cancer.",
+))
+
+# Thyroid.ipynb encoded sex as F=1, M=0 and the t/f flags as 1/0; the raw hypothyroid.csv export is
+# cleaned by the fitted preprocessor in Models/thyroid_preprocessor.json (see diagnosis.preprocess)
+register(DiseaseSchema(
+    name='thyroid',
+    title='Hypo-Thyroid Prediction',
+    features=[
+        Feature('age', 'Age', 'Age in years', 'slider', 1.0, 100.0),
+        Feature('sex', 'Gender', 'Gender of the person', options={'Female': 1, 'Male': 0}, aliases={'F': 1, 'M': 0}),
+        Feature('on thyroxine', 'On Thyroxine', 'Is the person on thyroxine medication?', options=NO_YES,
+                aliases={'f': 0, 't': 1}, key='on_thyroxine'),
+        Feature('TSH', 'TSH Level', 'Thyroid Stimulating Hormone level', 'number', 0.005, 500.0, key='tsh'),
+        Feature('T3 measured', 'T3 Measured', 'Was T3 hormone measured?', options=NO_YES,
+                aliases={'f': 0, 't': 1}, key='t3_measured'),
+        Feature('T3', 'T3 Level', 'Triiodothyronine hormone level', 'number', 0.0, 10.0, key='t3'),
+        Feature('TT4', 'TT4 Level', 'Total Thyroxine level', 'number', 0.0, 500.0, key='tt4'),
+    ],
+    sections=[(None, [['age', 'sex', 'on_thyroxine'], ['tsh', 't3_measured', 't3', 'tt4']])],
+    dataset='hypothyroid.csv',
+    label='binaryClass',
+    label_codes={'P': 0, 'N': 1},
+    positive_sample={'age': 44, 'sex': 'Male', 'on_thyroxine': 'No', 'tsh': 45.0, 't3_measured': 'Yes',
+                     't3': 1.4, 'tt4': 39.0},
+    negative_sample={'age': 41, 'sex': 'Female', 'on_thyroxine': 'No', 'tsh': 1.3, 't3_measured': 'Yes',
+                     't3': 2.5, 'tt4': 125.0},
+    positive_message="POSITIVE: The analysis indicates Hypo-Thyroid disease. Please consult with an endocrinologist.",
+    negative_message="NEGATIVE: The analysis does not indicate Hypo-Thyroid disease.",
+    description="Hypothyroidism is a condition in which the thyroid gland doesn't produce enough thyroid hormone. It can cause various health problems if left untreated.",
+    symptoms="Fatigue, increased sensitivity to cold, constipation, dry skin, weight gain, puffy face, hoarseness, muscle weakness, elevated blood cholesterol level, muscle aches, pain, stiffness or weakness, heavier or irregular menstrual periods, thinning hair, slowed heart rate, depression, impaired memory.",
+    risk_factors="Autoimmune disease, thyroid surgery, radiation therapy, certain medications, pregnancy, congenital disease, pituitary disorder, iodine deficiency, age, sex (women are more likely to develop hypothyroidism).",
+))
@@ -0,0 +1,202 @@
+"""Cross-validated model-family and hyperparameter search, ranked on accuracy and latency
+
+For every disease, each candidate in SEARCH_SPACE is scored with stratified k-fold CV
+on the training split (the same split `diagnosis.training` uses), fanned out over all
+cores with joblib. The feature arrays are memory-mapped into the workers once instead
+of being pickled per task. Every candidate is then refitted on the whole training split
+and its single-row latency measured as it would be served: compiled to a NumPy kernel
+when it is linear, through scikit-learn otherwise.
+
+Winners maximise
+
+    objective = cv_accuracy - latency_weight * log2(latency / fastest latency)
+
+so by default each doubling of per-prediction latency has to buy one point of CV
+accuracy. The winner is checked on the held-out split and exported into `Models/`.
+
+    python -m diagnosis.search                        # search all diseases, export winners
+    python -m diagnosis.search --models heart_disease --dry-run
+"""
+import argparse
+import json
+import math
+import os
+import pickle
+import time
+import warnings
+
+import numpy as np
+
+from diagnosis.artifact import artifact_path, build_timestamp, export_model
+from diagnosis.kernel import LinearKernel, is_compilable
+from diagnosis.registry import MODEL_FILES, MODELS_DIR
+from diagnosis.schema import DATASETS_DIR, get_schema
+from diagnosis.training import TRAINING_SPECS, load_training_data, make_estimator, split
+
+REPORT_FILE = 'search_report.json'
+DEFAULT_FOLDS = 5
+DEFAULT_LATENCY_WEIGHT = 0.01
+LATENCY_CALLS = 200
+
+
+def _grid(**axes):
+    """Cartesian product of keyword axes as a list of parameter dicts"""
+    grid = [{}]
+    for key, values in axes.items():
+        grid = [dict(params, **{key: value}) for params in grid for value in values]
+    return grid
+
+
+# Estimator family -> parameter grid (see diagnosis.training.make_estimator)
+SEARCH_SPACE = {
+    'logistic': _grid(scale=[False, True], C=[0.01, 0.1, 1.0, 10.0], max_iter=[1000]),
+    'linear_svc': _grid(scale=[True], C=[0.1, 1.0, 10.0]),
+    'sgd': _grid(scale=[True], loss=['log_loss', 'hinge'], alpha=[1e-4, 1e-3, 1e-2]),
+    'rbf_svc': _grid(scale=[True], C=[1.0, 10.0]),
+    'knn': _grid(scale=[True], n_neighbors=[5, 15]),
+    'random_forest': _grid(n_estimators=[100], max_depth=[None, 6]),
+}
+
+
+def candidates(families=None):
+    return [(family, params) for family in families or SEARCH_SPACE for params in SEARCH_SPACE[family]]
+
+
+def _evaluate(name, family, params, X_train, y_train, folds, seed):
+    """Worker task: CV accuracy of one candidate, plus the candidate refitted on all of X_train"""
+    from sklearn.model_selection import StratifiedKFold, cross_val_score
+    from threadpoolctl import threadpool_limits
+
+    with threadpool_limits(limits=1), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+        start = time.perf_counter()
+        scores = cross_val_score(make_estimator(family, params, seed), X_train, y_train, cv=cv, n_jobs=1)
+        cv_seconds = time.perf_counter() - start
+        model = make_estimator(family, params, seed).fit(np.asarray(X_train), np.asarray(y_train))
+    return name, family, params, scores, cv_seconds, model
+
+
+def serving_model(model, name=None):
+    """What would actually serve `model`: its compiled kernel when it is linear"""
+    return LinearKernel.from_estimator(model, name) if is_compilable(model) else model
+
+
+def single_row_latency(model, X, calls=LATENCY_CALLS):
+    """Median seconds for one single-row predict, cycling through the rows of X"""
+    rows = [np.ascontiguousarray(X[i % len(X):i % len(X) + 1]) for i in range(calls)]
+    model.predict(rows[0])
+    timings = np.empty(calls)
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        model.predict(row)
+        timings[i] = time.perf_counter() - start
+    return float(np.median(timings))
+
+
+def objective(accuracy, latency, fastest, latency_weight=DEFAULT_LATENCY_WEIGHT):
+    return accuracy - latency_weight * math.log2(latency / fastest)
+
+
+def search(names=None, families=None, folds=DEFAULT_FOLDS, n_jobs=-1, latency_weight=DEFAULT_LATENCY_WEIGHT,
+           datasets_dir=DATASETS_DIR, seed=0):
+    """Run the search; returns {disease: {'candidates': [...], 'winner': index, 'model': fitted winner}}"""
+    from joblib import Parallel, delayed
+
+    names = list(names or TRAINING_SPECS)
+    data = {}
+    for name in names:
+        X, y = load_training_data(name, datasets_dir)
+        X_train, X_test, y_train, y_test = split(X, y, TRAINING_SPECS[name])
+        data[name] = (np.ascontiguousarray(X_train), y_train, X_test, y_test)
+
+    # max_nbytes=0: every array argument is dumped once and memory-mapped read-only by the workers
+    tasks = [delayed(_evaluate)(name, family, params, data[name][0], data[name][1], folds, seed)
+             for name in names for family, params in candidates(families)]
+    outcomes = Parallel(n_jobs=n_jobs, max_nbytes=0, mmap_mode='r')(tasks)
+
+    results = {name: {'candidates': [], 'models': []} for name in names}
+    for name, family, params, scores, cv_seconds, model in outcomes:
+        X_test = data[name][2]
+        results[name]['candidates'].append({
+            'family': family,
+            'params': params,
+            'cv_accuracy': float(np.mean(scores)),
+            'cv_std': float(np.std(scores)),
+            'cv_seconds': round(cv_seconds, 4),
+            'compiled': is_compilable(model),
+            # Timed here, one candidate at a time, so the workers do not skew each other's latency
+            'latency_us': round(single_row_latency(serving_model(model), X_test) * 1e6, 3),
+        })
+        results[name]['models'].append(model)
+
+    for name, result in results.items():
+        fastest = min(candidate['latency_us'] for candidate in result['candidates'])
+        for candidate in result['candidates']:
+            candidate['objective'] = round(objective(candidate['cv_accuracy'], candidate['latency_us'], fastest,
+                                                     latency_weight), 6)
+        winner = max(range(len(result['candidates'])), key=lambda i: result['candidates'][i]['objective'])
+        model = result.pop('models')[winner]
+        X_test, y_test = data[name][2], data[name][3]
+        result['winner'] = winner
+        result['model'] = model
+        result['test_accuracy'] = float(np.mean(model.predict(X_test) == y_test))
+    return results
+
+
+def export_winner(name, result, output_dir=MODELS_DIR, datasets_dir=DATASETS_DIR):
+    """Write the winning model into `output_dir` as the model the app and API will load"""
+    model, candidate = result['model'], result['candidates'][result['winner']]
+    pickle_path = os.path.join(output_dir, MODEL_FILES[name])
+    if not candidate['compiled']:
+        # Served from the pickle; a stale artifact would otherwise take precedence
+        with open(pickle_path, 'wb') as fh:
+            pickle.dump(model, fh)
+        if os.path.exists(artifact_path(pickle_path)):
+            os.remove(artifact_path(pickle_path))
+        return pickle_path
+    schema = get_schema(name)
+    X, y = load_training_data(name, datasets_dir)
+    metadata = {
+        'metrics': {'cv_accuracy': candidate['cv_accuracy'], 'test_accuracy': result['test_accuracy']},
+        'training': {'estimator': candidate['family'], 'params': candidate['params'], 'selected_by': 'search'},
+    }
+    return export_model(name, model, artifact_path(pickle_path), schema.dataset_path(datasets_dir), X, y,
+                        schema.columns, metadata=metadata)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cross-validated model search with a latency-aware objective')
+    parser.add_argument('--models', nargs='+', choices=list(TRAINING_SPECS), help='diseases to search (default: all)')
+    parser.add_argument('--families', nargs='+', choices=list(SEARCH_SPACE), help='estimator families to try')
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--jobs', type=int, default=-1, help='worker processes (-1: all cores)')
+    parser.add_argument('--latency-weight', type=float, default=DEFAULT_LATENCY_WEIGHT,
+                        help='accuracy traded per doubling of single-row latency')
+    parser.add_argument('--output-dir', default=MODELS_DIR)
+    parser.add_argument('--datasets-dir', default=DATASETS_DIR)
+    parser.add_argument('--dry-run', action='store_true', help='report the winners without exporting them')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = search(args.models, args.families, args.folds, args.jobs, args.latency_weight, args.datasets_dir)
+    report = {'created_at': build_timestamp(), 'folds': args.folds, 'latency_weight': args.latency_weight,
+              'wall_seconds': round(time.perf_counter() - start, 3), 'models': {}}
+    for name, result in results.items():
+        winner = result['candidates'][result['winner']]
+        entry = {key: value for key, value in result.items() if key != 'model'}
+        if not args.dry_run:
+            entry['exported'] = os.path.relpath(export_winner(name, result, args.output_dir, args.datasets_dir),
+                                                args.output_dir)
+        report['models'][name] = entry
+        print(f"{name}: {winner['family']} {winner['params']} cv {winner['cv_accuracy']:.4f} "
+              f"test {result['test_accuracy']:.4f} latency {winner['latency_us']:.1f} us"
+              + ('' if args.dry_run else f" -> {entry['exported']}"))
+    if not args.dry_run:
+        with open(os.path.join(args.output_dir, REPORT_FILE), 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+    print(f"searched {len(results)} diseases in {report['wall_seconds']:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
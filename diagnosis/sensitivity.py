@@ -0,0 +1,292 @@
+"""What-if sweeps: the risk of one patient as one or two of their inputs vary
+
+The base patient is vectorized once, copied into an (N, d) grid in which only the swept
+columns change, and the whole grid is scored in one batched call: a 200 x 200 surface is
+40,000 rows and takes a few milliseconds on any bundled model. Numeric features are swept
+over their form range (or a range given by the caller), categorical ones over their codes.
+
+Decision-boundary crossings are located between neighbouring grid points whose predicted
+class differs, by linear interpolation of the margin (the decision score, or the log-odds
+for the logistic models). The bundled models are linear, so the interpolated point is
+exact. Along a categorical axis the crossing is reported halfway between the two codes.
+
+    python -m diagnosis.sensitivity heart_disease thalach
+    python -m diagnosis.sensitivity diabetes Glucose BMI --points 200 --base positive
+    python -m diagnosis.sensitivity --benchmark
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from diagnosis import batch
+from diagnosis.explain import get_explainer
+from diagnosis.schema import SCHEMAS, get_schema
+
+DEFAULT_POINTS = 200
+# Upper bound on the rows one sweep may score (1000 x 1000), so the REST API cannot be asked for more
+MAX_GRID_ROWS = 1_000_000
+RISK_PROBABILITY = 'probability'
+RISK_SCORE = 'decision_score'
+# Fallback range for a numeric feature without form bounds: this fraction either side of the base value
+FALLBACK_SPAN = 0.5
+
+
+class Sweep:
+    """Risk curve (one feature) or surface (two features) around a base patient
+
+    `risk` and `predictions` have shape (n,) for one feature and (n2, n1) for two: rows
+    follow the second feature, columns the first.
+    """
+
+    def __init__(self, model_name, features, values, risk, predictions, risk_kind, base_values, base_risk,
+                 base_prediction, crossings, rows, seconds, model_version=None):
+        self.model_name = model_name
+        self.model_version = model_version
+        self.features = features
+        self.values = values
+        self.risk = risk
+        self.predictions = predictions
+        self.risk_kind = risk_kind
+        self.base_values = base_values
+        self.base_risk = base_risk
+        self.base_prediction = base_prediction
+        self.crossings = crossings
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def columns(self):
+        return [feature.column for feature in self.features]
+
+    def as_dict(self):
+        body = {
+            'model': self.model_name,
+            'features': self.columns,
+            'values': [axis.tolist() for axis in self.values],
+            'risk': self.risk.tolist(),
+            'predictions': self.predictions.tolist(),
+            'risk_kind': self.risk_kind,
+            'base': {'values': dict(zip(self.columns, self.base_values)), 'risk': self.base_risk,
+                     'prediction': self.base_prediction},
+            'crossings': self.crossings,
+            'rows': self.rows,
+            'seconds': self.seconds,
+        }
+        if self.model_version is not None:
+            body['model_version'] = self.model_version
+        return body
+
+
+def feature_grid(feature, base_value, points=DEFAULT_POINTS, value_range=None):
+    """Values to sweep one feature over: its codes if categorical, else `points` evenly spaced values"""
+    if feature.categorical and value_range is None:
+        return np.unique(np.asarray(list(feature.options.values()), dtype=np.float64))
+    if value_range is None:
+        low, high = feature.min_value, feature.max_value
+        if low is None or high is None:
+            span = max(abs(base_value), 1.0) * FALLBACK_SPAN
+            low, high = base_value - span, base_value + span
+    else:
+        low, high = value_range
+    low, high = float(low), float(high)
+    if not np.isfinite([low, high]).all() or high <= low:
+        raise ValueError(f"Invalid range [{low}, {high}] for {feature.column}")
+    if points < 2:
+        raise ValueError("A sweep needs at least 2 points per feature")
+    return np.linspace(low, high, int(points))
+
+
+def _margin(scores, risk_kind):
+    """Quantity that is linear in the inputs and changes sign at the decision boundary"""
+    if risk_kind == RISK_SCORE:
+        return scores
+    p = np.clip(scores, 1e-12, 1.0 - 1e-12)
+    return np.log(p) - np.log1p(-p)
+
+
+def _interpolate(axis, index, m0, m1, categorical):
+    """Position of the zero of the margin between axis[index] and axis[index + 1]"""
+    if categorical:
+        t = np.full(len(index), 0.5)
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(m0 != m1, m0 / (m0 - m1), 0.5)
+        t = np.clip(t, 0.0, 1.0)
+    return axis[index] + t * (axis[index + 1] - axis[index])
+
+
+def crossings_1d(feature, axis, predictions, margin):
+    """Points along `axis` where the predicted class changes"""
+    flips = np.flatnonzero(predictions[1:] != predictions[:-1])
+    values = _interpolate(axis, flips, margin[flips], margin[flips + 1], feature.categorical)
+    return [{feature.column: float(value), 'prediction': int(predictions[k + 1])} for value, k in zip(values, flips)]
+
+
+def crossings_2d(features, axes, predictions, margin):
+    """Boundary points of a 2-D surface, found along both axes in two vectorized passes"""
+    first, second = features
+    rows, cols = np.nonzero(predictions[:, 1:] != predictions[:, :-1])
+    x = _interpolate(axes[0], cols, margin[rows, cols], margin[rows, cols + 1], first.categorical)
+    y = axes[1][rows]
+    rows2, cols2 = np.nonzero(predictions[1:, :] != predictions[:-1, :])
+    x2 = axes[0][cols2]
+    y2 = _interpolate(axes[1], rows2, margin[rows2, cols2], margin[rows2 + 1, cols2], second.categorical)
+    points = np.column_stack([np.concatenate([x, x2]), np.concatenate([y, y2])])
+    points = np.unique(points, axis=0) if len(points) else points
+    return [{first.column: float(a), second.column: float(b)} for a, b in points]
+
+
+def _risk(model, schema, X, scores):
+    """Probability of a positive result per row where the model has one, else its decision score"""
+    if hasattr(model, 'predict_proba'):
+        return scores, RISK_PROBABILITY
+    probabilities = get_explainer(model, schema.columns).probabilities(scores, X)
+    if probabilities is None:
+        return scores, RISK_SCORE
+    return probabilities, RISK_PROBABILITY
+
+
+def sweep(model, disease, base, features, points=DEFAULT_POINTS, ranges=None, router=None):
+    """Score `base` with one or two of its features varied over a grid, in one batched call
+
+    `base` is a record keyed by dataset column or form key; `features` names the swept
+    inputs; `ranges` optionally maps a feature name to a (low, high) range. With a
+    ModelRouter `router`, the grid is scored by the version that serves the base patient
+    instead of `model`. Raises ValueError on unknown or missing inputs and on grids above
+    MAX_GRID_ROWS.
+    """
+    schema = get_schema(disease)
+    if isinstance(features, str):
+        features = [features]
+    if not 1 <= len(features) <= 2:
+        raise ValueError("Sweep one or two features")
+    swept = []
+    for name in features:
+        feature = schema.feature(name)
+        if feature is None:
+            raise ValueError(f"Unknown {disease} feature: {name}")
+        if feature in swept:
+            raise ValueError(f"Feature {feature.column} listed twice")
+        swept.append(feature)
+    ranges = {schema.feature(name).column if schema.feature(name) else name: value
+              for name, value in (ranges or {}).items()}
+    unknown = [name for name in ranges if name not in [feature.column for feature in swept]]
+    if unknown:
+        raise ValueError(f"Ranges given for features that are not swept: {', '.join(unknown)}")
+
+    record = schema.canonical(base)
+    # The swept inputs need no base value; any other missing input is an error
+    for feature in swept:
+        if record.get(feature.column) in (None, ''):
+            low = feature.min_value if feature.min_value is not None else 0.0
+            record[feature.column] = low if not feature.categorical else next(iter(feature.options.values()))
+    missing = schema.missing(record)
+    if missing:
+        raise ValueError(f"Missing base values: {', '.join(missing)}")
+    x0 = schema.vectorize_one(record)
+    indices = [schema.columns.index(feature.column) for feature in swept]
+    axes = [feature_grid(feature, float(x0[j]), points, ranges.get(feature.column))
+            for feature, j in zip(swept, indices)]
+    shape = tuple(len(axis) for axis in reversed(axes))
+    rows = int(np.prod(shape))
+    if rows > MAX_GRID_ROWS:
+        raise ValueError(f"Grid of {rows:,} rows exceeds the limit of {MAX_GRID_ROWS:,}")
+
+    start = time.perf_counter()
+    # One extra row at the end scores the unchanged base patient in the same call
+    X = np.empty((rows + 1, len(x0)), dtype=np.float64)
+    X[:] = x0
+    if len(axes) == 1:
+        X[:rows, indices[0]] = axes[0]
+    else:
+        X[:rows, indices[0]] = np.tile(axes[0], len(axes[1]))
+        X[:rows, indices[1]] = np.repeat(axes[1], len(axes[0]))
+    def score(model, X):
+        return batch.score_array(model, X, chunk_size=len(X))
+
+    version = None
+    if router is None:
+        predictions, scores = score(model, X)
+    else:
+        version, predictions, scores = router.score(disease, X, score, key=X[-1:])
+        model = version.model
+    if scores is None:
+        raise ValueError(f"{disease} model has neither predict_proba nor decision_function")
+    risk, risk_kind = _risk(model, schema, X, scores)
+    margin = _margin(scores, RISK_SCORE if not hasattr(model, 'predict_proba') else RISK_PROBABILITY)
+    base_risk, base_prediction = float(risk[-1]), int(predictions[-1])
+    risk, predictions, margin = (a[:rows].reshape(shape) for a in (risk, predictions, margin))
+    if len(axes) == 1:
+        crossings = crossings_1d(swept[0], axes[0], predictions, margin)
+    else:
+        crossings = crossings_2d(swept, axes, predictions, margin)
+    seconds = time.perf_counter() - start
+    return Sweep(disease, swept, axes, risk, predictions, risk_kind, [float(x0[j]) for j in indices], base_risk,
+                 base_prediction, crossings, rows, seconds, None if version is None else version.version)
+
+
+def benchmark(registry, points=DEFAULT_POINTS, repeat=5):
+    """Best-of-`repeat` time of a points x points sweep of the first two numeric features of each model"""
+    results = {}
+    for disease in SCHEMAS:
+        schema = get_schema(disease)
+        numeric = [feature.column for feature in schema.features if not feature.categorical]
+        features = (numeric + [feature.column for feature in schema.features if feature.categorical])[:2]
+        model = registry[disease]
+        runs = [sweep(model, disease, schema.negative_sample, features, points) for _ in range(repeat)]
+        results[disease] = {'features': features, 'rows': runs[0].rows, 'seconds': min(run.seconds for run in runs)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('model', nargs='?', choices=list(SCHEMAS), help="Disease model to sweep")
+    parser.add_argument('features', nargs='*', help="One or two features (dataset column or form key)")
+    parser.add_argument('--points', type=int, default=DEFAULT_POINTS, help="Grid points per numeric feature")
+    parser.add_argument('--base', default='negative',
+                        help="Base patient: 'positive' or 'negative' sample, or a JSON object")
+    parser.add_argument('--benchmark', action='store_true', help="Time a points x points sweep on every model")
+    parser.add_argument('--json', action='store_true', help="Print the full result as JSON")
+    args = parser.parse_args(argv)
+
+    from diagnosis.registry import get_registry
+
+    registry = get_registry()
+    if args.benchmark:
+        for disease, result in benchmark(registry, args.points).items():
+            print(f"{disease:14s} {' x '.join(result['features']):32s} {result['rows']:>8,} rows "
+                  f"{result['seconds'] * 1000.0:8.2f} ms")
+        return 0
+    if args.model is None or not args.features:
+        parser.error("a model and one or two features are required unless --benchmark is given")
+
+    schema = get_schema(args.model)
+    if args.base in ('positive', 'negative'):
+        base = getattr(schema, f'{args.base}_sample')
+    else:
+        base = json.loads(args.base)
+    try:
+        result = sweep(registry[args.model], args.model, base, args.features, args.points)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.json:
+        json.dump(result.as_dict(), sys.stdout)
+        print()
+        return 0
+    base_values = ', '.join(f'{column}={value:g}' for column, value in zip(result.columns, result.base_values))
+    print(f"{args.model}: {result.rows:,} rows scored in {result.seconds * 1000.0:.2f} ms")
+    print(f"base {base_values}: {result.risk_kind} {result.base_risk:.4f}, prediction {result.base_prediction}")
+    if not result.crossings:
+        print("no decision boundary crossing inside the grid")
+    for crossing in result.crossings[:20]:
+        print("crossing at " + ', '.join(f'{column}={value:.4g}' for column, value in crossing.items()))
+    if len(result.crossings) > 20:
+        print(f"... {len(result.crossings) - 20} more boundary points")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
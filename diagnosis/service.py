@@ -0,0 +1,452 @@
+"""Headless REST inference service for the five disease models
+
+Run with::
+
+    python -m diagnosis.service --port 8000 --threads 8
+
+or under any WSGI server (``gunicorn 'diagnosis.service:create_app()'``).
+
+Endpoints:
+
+* ``POST /predict/<model>`` -- body is a single record, a list of records, or
+  ``{"records": [...]}``. A record is a dict keyed by the dataset column names (or the
+  app's form field names) or a list of values in feature order; categorical fields accept
+  their form labels (``"Male"``, ``"Yes"``) as well as the encoded values. Add
+  ``?explain=1`` (and optionally ``&top_k=5``) for the decision score, calibrated
+  probability and top contributing features of each record (see `diagnosis.explain`).
+* ``POST /screen`` -- screening panel: one patient with shared intake fields (age, sex,
+  smoking, blood pressure) plus per-disease sections, scored against every model whose
+  inputs are complete (see `diagnosis.panel`).
+* ``POST /sensitivity/<model>`` -- what-if sweep: body ``{"record": {...}, "features":
+  ["Glucose", "BMI"], "points": 200, "ranges": {"BMI": [18, 45]}}``. The record is varied
+  over a 1-D or 2-D grid of the one or two features, scored in one batched call, and the
+  risk curve or surface is returned with the decision-boundary crossings (see
+  `diagnosis.sensitivity`). The grid is scored by the version that serves the base record
+  (see ``/deployments``); sweeps are not audited or counted towards drift.
+* ``POST /similar/<model>`` -- records as for ``/predict``; returns the ``?k=5`` (1 to 100) most
+  similar historical records of each, with their outcomes (see `diagnosis.similar`).
+* ``POST /similar/<model>/cases`` -- ``{"records": [...], "outcomes": [0, 1, ...]}`` adds newly
+  labelled cases to the index; they are found by later queries straight away.
+* ``GET /deployments`` -- primary and candidate versions of each model, with per-version
+  requests, latency percentiles, positive rate, mean score and agreement with the primary
+  (see `diagnosis.router`); predictions report the ``model_version`` that served them.
+* ``POST /deployments/<model>`` -- ``{"path": "candidates/diabetes.mdl", "version": "retrain-10",
+  "mode": "shadow"}`` (or ``"mode": "split", "weight": 0.1``) deploys a candidate from ``Models/``;
+  ``POST /deployments/<model>/promote`` with ``{"version": ...}`` makes it the primary without a
+  restart and ``DELETE /deployments/<model>/<version>`` retires it.
+* ``POST /outcomes/<model>`` -- with ``--online``: ``{"records": [...], "outcomes": [0, 1, ...]}``
+  confirmed outcomes that update the model incrementally, in mini-batches; every
+  ``--checkpoint-rows`` trained rows the update is checkpointed and promoted if it beats the
+  primary on a rolling holdout, on a background thread (see `diagnosis.online`).
+* ``GET /health`` -- liveness plus which models are loaded.
+* ``GET /stats`` -- latency percentiles per model, model load statistics and, when
+  micro-batching is enabled (``--max-batch-size`` > 1), batch-size and queue-wait histograms;
+  with ``--audit``, the audit log's written/dropped counters and queue depth.
+* ``GET /drift`` -- PSI and KS per feature of the inputs scored so far against the
+  training data (``?model=heart_disease`` to select; see `diagnosis.drift`).
+* ``GET /metrics`` -- Prometheus text: prediction/error counters and per-stage (parse,
+  vectorize, model, explain) latency histograms per model. ``--metrics-file`` also appends
+  JSON snapshots every ``--metrics-interval`` seconds; ``--profile`` keeps cProfile or
+  sampled stack profiles of requests slower than ``--profile-slow-ms`` (see `diagnosis.profiling`).
+* ``GET /workers`` -- with ``--workers N``: pid, generation, requests, in-flight count and
+  utilization of every worker process (see `diagnosis.prefork`).
+
+``--workers N`` loads the models once and forks N worker processes sharing them, one core
+each; replacing a model in ``Models/`` rolls the workers over to it without dropping requests.
+"""
+import argparse
+import os
+import time
+
+from flask import Flask, Response, jsonify, request
+
+from diagnosis import batch
+from diagnosis.artifact import artifact_registry
+from diagnosis.audit import build_audit
+from diagnosis.batching import BatchScheduler
+from diagnosis.cache import build_cache
+from diagnosis.drift import get_drift_monitors
+from diagnosis.explain import DEFAULT_TOP_K, get_explainer
+from diagnosis.metrics import LatencyTracker, SnapshotWriter, get_metrics
+from diagnosis.online import DEFAULT_CHECKPOINT_ROWS, OnlineLearners
+from diagnosis.panel import screen
+from diagnosis.prefork import DEFAULT_RELOAD_INTERVAL, DEFAULT_STATS_INTERVAL, serve_prefork
+from diagnosis.profiling import DEFAULT_PROFILE_DIR, DEFAULT_SLOW_MS, MODES, SlowRequestProfiler
+from diagnosis.registry import get_registry
+from diagnosis.router import CANDIDATE_MODES, MODE_SHADOW, ModelRouter
+from diagnosis.schema import get_schema
+from diagnosis.sensitivity import DEFAULT_POINTS, sweep
+from diagnosis.similar import DEFAULT_K, get_neighbor_indexes
+
+
+def _parse_records(payload):
+    if isinstance(payload, dict) and 'records' in payload:
+        payload = payload['records']
+    elif isinstance(payload, dict) and 'record' in payload:
+        payload = payload['record']
+    if isinstance(payload, dict):
+        return [payload], True
+    if isinstance(payload, list) and payload and not isinstance(payload[0], (dict, list)):
+        # A bare list of numbers is one record in feature order
+        return [payload], True
+    if isinstance(payload, list):
+        return payload, False
+    raise ValueError("Body must be a record, a list of records or {\"records\": [...]}")
+
+
+def create_app(registry=None, preload=True, max_batch_size=1, max_wait_ms=2.0, cache=None, metrics=None,
+               profiler=None, audit=None, drift=None, neighbors=None, router=None, online=None):
+    """Build the Flask app; models are loaded and warmed once here, not per request
+
+    With `max_batch_size` > 1, single-record requests are queued per model and scored
+    together in micro-batches of up to that many rows, waiting at most `max_wait_ms`.
+    A PredictionCache (`cache`) answers repeated single records without touching the model.
+    Stage timings and counters go to `metrics` (the process-wide MetricsRegistry by default);
+    a SlowRequestProfiler (`profiler`) profiles every prediction request. Every prediction
+    is queued to the AuditLog `audit`, when given, without waiting for it to be written, and
+    its inputs are counted by `drift` (the process-wide DriftMonitors by default). Similar-patient
+    lookups use `neighbors` (the process-wide NeighborIndexes by default). `router` chooses the
+    version of a model that serves each request and scores the shadow versions (a ModelRouter
+    over `registry` reading ``Models/deployments.json`` by default). Confirmed outcomes are
+    accepted only with `online`, an OnlineLearners over the same router.
+    """
+    registry = registry or get_registry()
+    latency = LatencyTracker()
+    metrics = metrics or get_metrics()
+    profiler = profiler or SlowRequestProfiler()
+    drift = drift or get_drift_monitors()
+    neighbors = neighbors or get_neighbor_indexes()
+    router = router or ModelRouter(registry)
+    scheduler = BatchScheduler(registry, max_batch_size, max_wait_ms) if max_batch_size > 1 else None
+    started = time.time()
+
+    if preload:
+        registry.preload()
+        for name in registry.names():
+            # First predict call pays one-off validation/import costs; keep them off the request path
+            model = registry[name]
+            batch.score_array(model, batch.records_to_array([get_schema(name).negative_sample], name, model))
+
+    app = Flask(__name__)
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        return jsonify({
+            'status': 'ok',
+            'uptime_seconds': round(time.time() - started, 3),
+            'models': {name: registry.is_loaded(name) for name in registry.names()},
+        })
+
+    @app.route('/stats', methods=['GET'])
+    def stats():
+        body = {'latency': latency.summary(), 'models': registry.stats()}
+        if scheduler is not None:
+            body['batching'] = scheduler.stats()
+        if cache is not None:
+            body['cache'] = cache.stats()
+        if audit is not None:
+            body['audit'] = audit.stats()
+        body['neighbors'] = neighbors.stats()
+        body['shadow'] = router.stats()['shadow']
+        if online is not None:
+            body['online'] = online.stats()
+        return jsonify(body)
+
+    @app.route('/deployments', methods=['GET'])
+    def deployments():
+        return jsonify(router.stats(registry.names()))
+
+    @app.route('/deployments/<model_name>', methods=['POST'])
+    def deploy(model_name):
+        if model_name not in registry:
+            return jsonify({'error': f"Unknown model '{model_name}'", 'models': registry.names()}), 404
+        body = request.get_json(force=True)
+        if not isinstance(body, dict) or not body.get('path') or not body.get('version'):
+            return jsonify({'error': 'Body must be {"path": ..., "version": ..., "mode": '
+                                     f'{" or ".join(CANDIDATE_MODES)}, "weight": ...}}'}), 400
+        try:
+            router.deploy(model_name, body['path'], str(body['version']), body.get('mode', MODE_SHADOW),
+                          float(body.get('weight', 0.0)))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(router.stats([model_name]))
+
+    @app.route('/deployments/<model_name>/promote', methods=['POST'])
+    def promote(model_name):
+        if model_name not in registry:
+            return jsonify({'error': f"Unknown model '{model_name}'", 'models': registry.names()}), 404
+        body = request.get_json(force=True)
+        try:
+            router.promote(model_name, str(body['version']))
+        except (TypeError, KeyError, ValueError) as e:
+            return jsonify({'error': str(e).strip('"\'')}), 400
+        return jsonify(router.stats([model_name]))
+
+    @app.route('/deployments/<model_name>/<version>', methods=['DELETE'])
+    def retire(model_name, version):
+        if model_name not in registry:
+            return jsonify({'error': f"Unknown model '{model_name}'", 'models': registry.names()}), 404
+        try:
+            router.retire(model_name, version)
+        except (KeyError, ValueError) as e:
+            return jsonify({'error': str(e).strip('"\'')}), 400
+        return jsonify(router.stats([model_name]))
+
+    @app.route('/drift', methods=['GET'])
+    def drift_report():
+        names = request.args.getlist('model') or None
+        return jsonify(drift.report(names))
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        return Response(metrics.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/predict/<model_name>', methods=['POST'])
+    def predict(model_name):
+        if model_name not in registry:
+            return jsonify({'error': f"Unknown model '{model_name}'", 'models': registry.names()}), 404
+        with profiler.profile(f'predict-{model_name}'):
+            return _predict(model_name)
+
+    def _score(model_name, model, X):
+        # Micro-batches are scored by the registry's model, so a split candidate bypasses them
+        batched = scheduler is not None and model is registry[model_name]
+        if len(X) == 1 and (batched or cache is not None):
+            def compute(row):
+                if batched:
+                    return scheduler.predict(model_name, row)
+                row_predictions, row_scores = batch.score_array(model, row.reshape(1, -1))
+                return int(row_predictions[0]), None if row_scores is None else float(row_scores[0])
+
+            if cache is not None:
+                prediction, score = cache.get_or_compute(model, X[0], compute)
+            else:
+                prediction, score = compute(X[0])
+            return [prediction], None if score is None else [score]
+        return batch.score_array(model, X)
+
+    def _predict(model_name):
+        start = time.perf_counter()
+        stage = 'parse'
+        try:
+            with metrics.time('parse', disease=model_name):
+                records, single = _parse_records(request.get_json(force=True))
+            stage = 'vectorize'
+            with metrics.time('vectorize', disease=model_name):
+                model = registry[model_name]
+                X = batch.records_to_array(records, model_name, model)
+        except ValueError as e:
+            metrics.inc('errors_total', disease=model_name, stage=stage)
+            return jsonify({'error': str(e)}), 400
+        try:
+            with metrics.time('model', disease=model_name):
+                version, predictions, scores = router.score(
+                    model_name, X, lambda version_model, X: _score(model_name, version_model, X))
+                model = version.model
+        except Exception:
+            metrics.inc('errors_total', disease=model_name, stage='model')
+            raise
+
+        results = [{'prediction': int(p)} for p in predictions]
+        if scores is not None:
+            score_key = 'probability' if hasattr(model, 'predict_proba') else 'decision_score'
+            for result, score in zip(results, scores):
+                result[score_key] = float(score)
+        if request.args.get('explain', '').lower() in ('1', 'true', 'yes'):
+            with metrics.time('explain', disease=model_name):
+                top_k = request.args.get('top_k', DEFAULT_TOP_K, type=int)
+                explanations = get_explainer(model, get_schema(model_name).columns).explain(X, top_k)
+                for result, explanation in zip(results, explanations.as_records()):
+                    result['explanation'] = {key: value for key, value in explanation.items()
+                                             if key != 'prediction'}
+        if len(X) == 1:
+            drift.observe(model_name, X[0])
+        else:
+            drift.observe_batch(model_name, X)
+        if audit is not None:
+            if len(X) == 1:
+                audit.record(model_name, model, X[0], predictions[0], None if scores is None else scores[0], 'api')
+            else:
+                audit.record_batch(model_name, model, X, predictions, scores, 'api')
+        positives = int(sum(int(p) == 1 for p in predictions))
+        metrics.inc('predictions_total', positives, disease=model_name, result='positive')
+        metrics.inc('predictions_total', len(predictions) - positives, disease=model_name, result='negative')
+        elapsed = time.perf_counter() - start
+        latency.observe(model_name, elapsed)
+        metrics.observe('request_seconds', elapsed, endpoint='predict', disease=model_name)
+        body = {'model': model_name, 'model_version': version.version, 'latency_ms': round(elapsed * 1000.0, 4)}
+        if single:
+            body.update(results[0])
+        else:
+            body['results'] = results
+        return jsonify(body)
+
+    @app.route('/screen', methods=['POST'])
+    def screen_patient():
+        patient = request.get_json(force=True)
+        if not isinstance(patient, dict):
+            return jsonify({'error': 'Body must be a patient object'}), 400
+        try:
+            result = screen(patient, registry, cache=cache, audit=audit, drift=drift, router=router)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        latency.observe('panel', result.seconds)
+        metrics.observe('request_seconds', result.seconds, endpoint='screen')
+        for outcome in result.outcomes:
+            if outcome['status'] == 'ok':
+                metrics.inc('predictions_total', disease=outcome['model'],
+                            result='positive' if outcome['prediction'] == 1 else 'negative')
+            elif outcome['status'] == 'error':
+                metrics.inc('errors_total', disease=outcome['model'], stage='panel')
+        return jsonify(result.as_dict())
+
+    @app.route('/sensitivity/<model_name>', methods=['POST'])
+    def sensitivity(model_name):
+        if model_name not in registry:
+            return jsonify({'error': f"Unknown model '{model_name}'", 'models': registry.names()}), 404
+        body = request.get_json(force=True)
+        if not isinstance(body, dict) or not isinstance(body.get('record'), dict):
+            return jsonify({'error': 'Body must be an object with a "record" object and "features"'}), 400
+        try:
+            result = sweep(registry[model_name], model_name, body['record'], body.get('features') or [],
+                           int(body.get('points', DEFAULT_POINTS)), body.get('ranges'), router)
+        except (TypeError, ValueError) as e:
+            metrics.inc('errors_total', disease=model_name, stage='sensitivity')
+            return jsonify({'error': str(e)}), 400
+        latency.observe(f'sensitivity-{model_name}', result.seconds)
+        metrics.observe('request_seconds', result.seconds, endpoint='sensitivity', disease=model_name)
+        return jsonify(result.as_dict())
+
+    @app.route('/similar/<model_name>', methods=['POST'])
+    def similar(model_name):
+        if model_name not in registry:
+            return jsonify({'error': f"Unknown model '{model_name}'", 'models': registry.names()}), 404
+        start = time.perf_counter()
+        try:
+            records, single = _parse_records(request.get_json(force=True))
+            X = batch.records_to_array(records, model_name)
+            results = neighbors.neighbors(model_name, X, int(request.args.get('k', DEFAULT_K)))
+        except ValueError as e:
+            metrics.inc('errors_total', disease=model_name, stage='similar')
+            return jsonify({'error': str(e)}), 400
+        elapsed = time.perf_counter() - start
+        metrics.observe('request_seconds', elapsed, endpoint='similar', disease=model_name)
+        body = {'model': model_name, 'latency_ms': round(elapsed * 1000.0, 4)}
+        if single:
+            body.update(results[0])
+        else:
+            body['results'] = results
+        return jsonify(body)
+
+    @app.route('/similar/<model_name>/cases', methods=['POST'])
+    def add_cases(model_name):
+        if model_name not in registry:
+            return jsonify({'error': f"Unknown model '{model_name}'", 'models': registry.names()}), 404
+        payload = request.get_json(force=True)
+        if not isinstance(payload, dict) or not isinstance(payload.get('outcomes'), list):
+            return jsonify({'error': 'Body must be {"records": [...], "outcomes": [...]}'}), 400
+        try:
+            records, _ = _parse_records(payload)
+            ids = neighbors.insert(model_name, batch.records_to_array(records, model_name), payload['outcomes'])
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'model': model_name, 'ids': ids.tolist(), 'rows': neighbors.index(model_name).rows})
+
+    @app.route('/outcomes/<model_name>', methods=['POST'])
+    def add_outcomes(model_name):
+        if online is None:
+            return jsonify({'error': 'Online updates are disabled; start the service with --online'}), 404
+        if model_name not in registry:
+            return jsonify({'error': f"Unknown model '{model_name}'", 'models': registry.names()}), 404
+        payload = request.get_json(force=True)
+        if not isinstance(payload, dict) or not isinstance(payload.get('outcomes'), list):
+            return jsonify({'error': 'Body must be {"records": [...], "outcomes": [...]}'}), 400
+        try:
+            records, _ = _parse_records(payload)
+            X = batch.records_to_array(records, model_name)
+            result = online.update(model_name, X, payload['outcomes'])
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(dict(result, model=model_name))
+
+    app.config['LATENCY'] = latency
+    app.config['SCHEDULER'] = scheduler
+    app.config['ROUTER'] = router
+    return app
+
+
+def serve(app, host, port, threads):
+    """Serve `app` from a fixed pool of worker threads (waitress), else Werkzeug's threaded server"""
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        from werkzeug.serving import run_simple
+        run_simple(host, port, app, threaded=True)
+    else:
+        waitress_serve(app, host=host, port=port, threads=threads)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--threads', type=int, default=8, help='thread pool size of the single-process server')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='serve from this many forked processes sharing the preloaded models (see diagnosis.prefork)')
+    parser.add_argument('--reload-interval', type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help='with --workers: seconds between checks of Models/ for changed models (0 disables)')
+    parser.add_argument('--stats-interval', type=float, default=DEFAULT_STATS_INTERVAL,
+                        help='with --workers: seconds between worker utilization log lines (0 disables)')
+    parser.add_argument('--kernels', action='store_true',
+                        help='serve only the .mdl NumPy kernels (python -m diagnosis.artifact export), '
+                             'never falling back to the sklearn pickles')
+    parser.add_argument('--max-batch-size', type=int, default=1,
+                        help='micro-batch single-record requests up to this many rows (1 disables)')
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help='longest a queued request waits for its micro-batch to fill')
+    parser.add_argument('--cache', default='none',
+                        help="prediction cache backend: 'memory', 'sqlite:<path>' (shared by all "
+                             "processes on the host) or 'none'")
+    parser.add_argument('--cache-max-bytes', type=int, default=16 * 1024 * 1024)
+    parser.add_argument('--cache-ttl', type=float, default=None, help='seconds before a cached entry expires')
+    parser.add_argument('--audit', default='none',
+                        help="SQLite file every prediction is appended to (see diagnosis.audit), or 'none'")
+    parser.add_argument('--online', action='store_true',
+                        help='accept confirmed outcomes on POST /outcomes/<model> and update the models with them')
+    parser.add_argument('--checkpoint-rows', type=int, default=DEFAULT_CHECKPOINT_ROWS,
+                        help='with --online: trained rows between checkpoints, each of which may promote the update')
+    parser.add_argument('--metrics-file', help='append a JSON metrics snapshot to this file periodically '
+                                               '(with --workers, one file per worker: <file>.<pid>)')
+    parser.add_argument('--metrics-interval', type=float, default=60.0, help='seconds between snapshots')
+    parser.add_argument('--profile', choices=MODES, help='profile requests slower than --profile-slow-ms')
+    parser.add_argument('--profile-slow-ms', type=float, default=DEFAULT_SLOW_MS)
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR)
+    args = parser.parse_args(argv)
+    if args.online and args.workers > 1:
+        # Each worker would train its own diverging copy and race the others to the checkpoint
+        parser.error("--online needs a single process; run it without --workers")
+
+    def build(registry):
+        # Called once per process; with --workers, inside each worker after the fork
+        cache = build_cache(args.cache, args.cache_max_bytes, args.cache_ttl)
+        metrics = get_metrics()
+        if args.metrics_file:
+            path = args.metrics_file if args.workers == 1 else f'{args.metrics_file}.{os.getpid()}'
+            SnapshotWriter(metrics, path, args.metrics_interval).start()
+        profiler = SlowRequestProfiler(args.profile, args.profile_slow_ms, args.profile_dir, metrics)
+        router = ModelRouter(registry or get_registry())
+        online = OnlineLearners(router, checkpoint_rows=args.checkpoint_rows) if args.online else None
+        return create_app(registry, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, cache=cache,
+                          metrics=metrics, profiler=profiler, audit=build_audit(args.audit), router=router,
+                          online=online)
+
+    if args.workers > 1:
+        serve_prefork(build, args.host, args.port, args.workers,
+                      registry_factory=artifact_registry if args.kernels else None,
+                      reload_interval=args.reload_interval, stats_interval=args.stats_interval)
+        return
+    serve(build(artifact_registry() if args.kernels else None), args.host, args.port, args.threads)
+
+
+if __name__ == '__main__':
+    main()
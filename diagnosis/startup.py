@@ -0,0 +1,116 @@
+"""Cold-start bookkeeping for the Streamlit app: import/render timings and background warm-up
+
+Only the standard library is imported here, so the app can start timing before any of
+its heavy dependencies load. The report is process-wide: phases and the first render
+are recorded once, by the first script run of a fresh process, which is the number
+container autoscaling cares about.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+
+class StartupReport:
+    """Named phases (seconds) of the first script run, the first render and the warm-up"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.first_render_seconds = None
+        self.warmup = {'status': 'pending'}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a block; only its first execution in the process is recorded"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.setdefault(name, time.perf_counter() - start)
+
+    def mark_first_render(self):
+        """Record time-to-first-render once; returns True the first time"""
+        with self._lock:
+            if self.first_render_seconds is not None:
+                return False
+            self.first_render_seconds = time.perf_counter() - self.started
+        return True
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'phases_ms': {name: round(seconds * 1000.0, 2) for name, seconds in self.phases.items()},
+                'first_render_ms': None if self.first_render_seconds is None
+                else round(self.first_render_seconds * 1000.0, 2),
+                'warmup': dict(self.warmup),
+            }
+
+    def log(self, event, stream=None):
+        """One JSON line on stdout (container logs) describing `event` and the report so far"""
+        print(json.dumps(dict(self.as_dict(), event=event)), file=stream or sys.stdout, flush=True)
+
+
+def warm_up(report, registry, ready_file=None, services=()):
+    """Import the scoring stack, load every model and score one row through each
+
+    Meant to run on a background thread after the first page has been sent. Each of the
+    zero-argument `services` is then called, so singletons the app needs later (metrics,
+    audit log, drift monitors, router) are built here rather than on a request. Touches
+    `ready_file` when done, so a readiness probe can wait for warm models.
+    """
+    start = time.perf_counter()
+    with report._lock:
+        report.warmup = {'status': 'running', 'models_ms': {}}
+    try:
+        import numpy as np
+        from diagnosis import batch
+        from diagnosis.schema import get_schema
+
+        for name in registry.names():
+            model_start = time.perf_counter()
+            model = registry[name]
+            row = get_schema(name).vectorize_one(get_schema(name).negative_sample)
+            batch.score_array(model, np.asarray([row]))
+            with report._lock:
+                report.warmup['models_ms'][name] = round((time.perf_counter() - model_start) * 1000.0, 2)
+        # Batch scoring and the result tables need pandas; import it off the request path as well
+        import pandas  # noqa: F401
+        for service in services:
+            service()
+    except Exception as e:
+        with report._lock:
+            report.warmup.update(status='failed', error=str(e))
+        report.log('warmup_failed')
+        return
+    with report._lock:
+        report.warmup.update(status='done', total_ms=round((time.perf_counter() - start) * 1000.0, 2))
+    if ready_file:
+        with open(ready_file, 'w') as fh:
+            fh.write(str(os.getpid()))
+    report.log('warmup_done')
+
+
+def start_warmup(report, registry, ready_file=None, services=()):
+    thread = threading.Thread(target=warm_up, args=(report, registry, ready_file, services), name='model-warmup',
+                              daemon=True)
+    thread.start()
+    return thread
+
+
+_default_report = None
+_default_lock = threading.Lock()
+
+
+def get_startup_report():
+    """Process-wide StartupReport, created by the first caller"""
+    global _default_report
+    if _default_report is None:
+        with _default_lock:
+            if _default_report is None:
+                _default_report = StartupReport()
+    return _default_report
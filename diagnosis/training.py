@@ -0,0 +1,242 @@
+"""Headless training pipeline that rebuilds every model from `Datasets/`
+
+Replaces the Colab notebooks: each disease is read through its schema, split with the
+notebook's fixed seed, fitted and evaluated in its own worker process, and written to
+`Models/` as a `.mdl` artifact (optionally also the legacy `.sav` pickle), together with
+any fitted raw-export preprocessor (thyroid is trained from the raw hypothyroid.csv). An evaluation
+report with accuracy, fit time and inference time is written next to the models.
+
+    python -m diagnosis.training                      # all five diseases in parallel
+    python -m diagnosis.training --models thyroid --output-dir /tmp/models
+
+Runs are reproducible: splits and estimators use fixed seeds, every worker is pinned to
+one BLAS thread, and artifact timestamps honour SOURCE_DATE_EPOCH.
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import pickle
+import time
+import warnings
+
+import numpy as np
+
+from diagnosis import preprocess
+from diagnosis.artifact import artifact_path, build_timestamp, export_model
+from diagnosis.registry import MODEL_FILES, MODELS_DIR
+from diagnosis.schema import DATASETS_DIR, get_schema
+
+REPORT_FILE = 'training_report.json'
+INFERENCE_REPEAT = 50
+
+
+class TrainingSpec:
+    """How one disease model is fitted: estimator family, its parameters and the split"""
+
+    def __init__(self, estimator, params=None, test_size=0.2, stratify=True, random_state=2):
+        self.estimator = estimator
+        self.params = dict(params or {})
+        self.test_size = test_size
+        self.stratify = stratify
+        self.random_state = random_state
+
+
+# Mirrors the notebooks (there is no diabetes notebook; it shipped as a linear SVC)
+TRAINING_SPECS = {
+    'diabetes': TrainingSpec('linear_svc'),
+    'heart_disease': TrainingSpec('logistic'),
+    'parkinsons': TrainingSpec('linear_svc', stratify=False),
+    'lung_cancer': TrainingSpec('logistic'),
+    'thyroid': TrainingSpec('logistic', stratify=False, random_state=42),
+}
+
+
+def make_estimator(kind, params=None, random_state=None):
+    """Unfitted scikit-learn estimator for an estimator family
+
+    `params` go to the estimator, except ``scale=True`` which puts a StandardScaler in
+    front of it. Only the linear families (logistic, linear_svc, sgd) compile into
+    `.mdl` kernels; the others are served from pickles.
+    """
+    params = dict(params or {})
+    scale = params.pop('scale', False)
+    if kind == 'logistic':
+        from sklearn.linear_model import LogisticRegression
+        estimator = LogisticRegression(random_state=random_state, **params)
+    elif kind == 'linear_svc':
+        from sklearn.svm import SVC
+        estimator = SVC(kernel='linear', random_state=random_state, **params)
+    elif kind == 'sgd':
+        from sklearn.linear_model import SGDClassifier
+        estimator = SGDClassifier(random_state=random_state, **params)
+    elif kind == 'rbf_svc':
+        from sklearn.svm import SVC
+        estimator = SVC(kernel='rbf', random_state=random_state, **params)
+    elif kind == 'knn':
+        from sklearn.neighbors import KNeighborsClassifier
+        estimator = KNeighborsClassifier(**params)
+    elif kind == 'random_forest':
+        from sklearn.ensemble import RandomForestClassifier
+        estimator = RandomForestClassifier(random_state=random_state, n_jobs=1, **params)
+    else:
+        raise ValueError(f"Unknown estimator family '{kind}'")
+    if scale:
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import StandardScaler
+        return make_pipeline(StandardScaler(), estimator)
+    return estimator
+
+
+def fit_preprocessor(name, datasets_dir=DATASETS_DIR):
+    """Freshly fitted raw-export preprocessor for a disease, or None if its dataset needs none"""
+    return preprocess.fit(name, datasets_dir) if name in preprocess.PREPROCESSORS else None
+
+
+def load_training_data(name, datasets_dir=DATASETS_DIR, preprocessor=None):
+    """(X, y) for a disease, encoded exactly like the app and the API encode their inputs
+
+    Raw datasets go through a preprocessor fitted on them (as the notebooks did, on the
+    whole file) rather than the one currently saved in Models/.
+    """
+    schema = get_schema(name)
+    frame = schema.load_dataset(datasets_dir)
+    preprocessor = preprocessor or fit_preprocessor(name, datasets_dir)
+    return schema.vectorize_frame(frame, preprocessor), schema.labels(frame)
+
+
+def split(X, y, spec, seed=None):
+    from sklearn.model_selection import train_test_split
+
+    random_state = spec.random_state if seed is None else seed
+    return train_test_split(X, y, test_size=spec.test_size, random_state=random_state,
+                            stratify=y if spec.stratify else None)
+
+
+def params_sha256(model):
+    """Fingerprint of the fitted parameters, to check two runs produced the same model"""
+    digest = hashlib.sha256()
+    for value in (model.coef_, model.intercept_, model.classes_):
+        digest.update(np.ascontiguousarray(value, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def inference_seconds(model, X, repeat=INFERENCE_REPEAT):
+    """Mean seconds for one compiled-kernel `predict` over all of X"""
+    from diagnosis.kernel import LinearKernel
+
+    kernel = LinearKernel.from_estimator(model)
+    X = np.ascontiguousarray(X, dtype=kernel.dtype)
+    kernel.predict(X)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        kernel.predict(X)
+    return (time.perf_counter() - start) / repeat
+
+
+def train_model(name, datasets_dir=DATASETS_DIR, seed=None, spec=None):
+    """Fit and evaluate one disease model; returns (fitted estimator, report dict)
+
+    Runs in a worker process, so it limits BLAS/OpenMP to one thread to keep results
+    bit-for-bit reproducible and the pool from oversubscribing the cores.
+    """
+    from threadpoolctl import threadpool_limits
+
+    spec = spec or TRAINING_SPECS[name]
+    with threadpool_limits(limits=1), warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=UserWarning)
+        X, y = load_training_data(name, datasets_dir)
+        X_train, X_test, y_train, y_test = split(X, y, spec, seed)
+        model = make_estimator(spec.estimator, spec.params, spec.random_state if seed is None else seed)
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        predict_seconds = inference_seconds(model, X_test)
+
+    report = {
+        'model_type': type(model).__name__,
+        'estimator': spec.estimator,
+        'params': spec.params,
+        'random_state': spec.random_state if seed is None else seed,
+        'rows': int(len(X)),
+        'train_rows': int(len(X_train)),
+        'test_rows': int(len(X_test)),
+        'train_accuracy': float(np.mean(model.predict(X_train) == y_train)),
+        'test_accuracy': float(np.mean(model.predict(X_test) == y_test)),
+        'dataset_accuracy': float(np.mean(model.predict(X) == y)),
+        # lbfgs stops at max_iter=100 on the unscaled heart and thyroid data, as it did in the notebooks
+        'converged': bool(model.max_iter < 0 or np.max(model.n_iter_) < model.max_iter),
+        'fit_ms': round(fit_seconds * 1000.0, 3),
+        'inference_ms': round(predict_seconds * 1000.0, 4),
+        'inference_rows_per_second': round(len(X_test) / predict_seconds) if predict_seconds > 0 else None,
+        'params_sha256': params_sha256(model),
+    }
+    return model, report
+
+
+def save_model(name, model, report, output_dir=MODELS_DIR, datasets_dir=DATASETS_DIR, write_pickle=False):
+    """Write the artifact (and optionally the pickle) for a trained model; returns the artifact path"""
+    schema = get_schema(name)
+    pickle_path = os.path.join(output_dir, MODEL_FILES[name])
+    if write_pickle:
+        with open(pickle_path, 'wb') as fh:
+            pickle.dump(model, fh)
+    preprocessor = fit_preprocessor(name, datasets_dir)
+    if preprocessor is not None:
+        preprocessor.save(preprocess.preprocessor_path(name, output_dir))
+    X, y = load_training_data(name, datasets_dir, preprocessor)
+    metadata = {
+        'metrics': {key: report[key] for key in ('train_accuracy', 'test_accuracy')},
+        'training': {key: report[key] for key in ('estimator', 'params', 'random_state', 'test_rows')},
+    }
+    return export_model(name, model, artifact_path(pickle_path), schema.dataset_path(datasets_dir), X, y,
+                        schema.columns, metadata=metadata)
+
+
+def train_all(names=None, output_dir=MODELS_DIR, datasets_dir=DATASETS_DIR, seed=None, workers=None,
+              write_pickle=False):
+    """Train the given diseases (all by default) in parallel; returns the evaluation report"""
+    names = list(names or TRAINING_SPECS)
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or min(len(names), os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(train_model, name, datasets_dir, seed) for name in names}
+        results = {name: future.result() for name, future in futures.items()}
+
+    models = {}
+    for name, (model, report) in results.items():
+        report['artifact'] = os.path.relpath(save_model(name, model, report, output_dir, datasets_dir, write_pickle),
+                                             output_dir)
+        models[name] = report
+    report = {
+        'created_at': build_timestamp(),
+        'workers': workers,
+        'wall_seconds': round(time.perf_counter() - start, 3),
+        'models': models,
+    }
+    with open(os.path.join(output_dir, REPORT_FILE), 'w') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Retrain the disease models from Datasets/')
+    parser.add_argument('--models', nargs='+', choices=list(TRAINING_SPECS), help='diseases to train (default: all)')
+    parser.add_argument('--output-dir', default=MODELS_DIR)
+    parser.add_argument('--datasets-dir', default=DATASETS_DIR)
+    parser.add_argument('--seed', type=int, help="override every disease's split/estimator seed")
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per disease, up to the CPU count)')
+    parser.add_argument('--pickles', action='store_true', help='also write the legacy .sav pickles')
+    args = parser.parse_args(argv)
+    report = train_all(args.models, args.output_dir, args.datasets_dir, args.seed, args.workers, args.pickles)
+    for name, result in report['models'].items():
+        print(f"{name}: test accuracy {result['test_accuracy']:.4f}, train {result['train_accuracy']:.4f}, "
+              f"fit {result['fit_ms']:.1f} ms, inference {result['inference_rows_per_second']:,} rows/s "
+              f"-> {result['artifact']}")
+    print(f"trained {len(report['models'])} models in {report['wall_seconds']:.2f} s with {report['workers']} workers")
+
+
+if __name__ == '__main__':
+    main()
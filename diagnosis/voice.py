@@ -0,0 +1,654 @@
+"""Parkinson's voice features from sustained-vowel recordings
+
+Computes the 22 acoustic measures of `Datasets/parkinson_data.csv` (the `parkinsons`
+model's inputs) from a PCM WAV file of a sustained vowel ("aaah"), with NumPy only:
+
+* pitch   -- frame-wise (40 ms, 10 ms hop) normalized autocorrelation: F0 contour and voicing
+* periods -- one waveform peak per glottal cycle (running maximum over 0.7 of the median
+  period, located by a least-squares parabola over +-4% of the period, which averages out
+  noise); cycles off the pitch contour are dropped. ``MDVP:Fo/Fhi/Flo`` are the mean,
+  highest and lowest cycle frequency
+* jitter  -- ``MDVP:Jitter(%)``/``(Abs)``, ``RAP``, ``PPQ`` (5-point), ``DDP`` from the
+  cycle periods; shimmer, ``Shimmer(dB)``, ``APQ3``/``APQ5``/``MDVP:APQ`` (11-point) and
+  ``DDA`` from the cycle peak-to-peak amplitudes. As in the dataset, the "%" columns are
+  fractions, not percentages
+* noise   -- ``HNR`` = 10 log10(r / (1 - r)) and ``NHR`` = (1 - r) / r, averaged over voiced
+  frames, r being the normalized correlation of a frame with itself one period later
+* nonlinear -- ``RPDE``, ``DFA`` (sigmoid of the scaling exponent) and ``D2`` (correlation
+  dimension) on up to 2 s of voiced signal at 25 kHz, after Little et al. 2007/2009;
+  ``PPE`` is the normalized entropy of the whitened semitone pitch residual, ``spread1``
+  the log of its spread and ``spread2`` the spread of the pitch contour in semitones.
+  The original definitions of these three are only partly published, so they are
+  approximations of the dataset's measures rather than exact reproductions.
+
+Recordings are streamed in 1 s chunks (two passes: pitch, then cycles), so memory does
+not grow with recording length. A directory is processed across a process pool; each
+file reports its extraction time and peak traced memory. Output is a CSV shaped like the
+dataset, which the ``parkinsons`` model scores directly.
+
+    python -m diagnosis.voice extract recordings/ --output voice_features.csv --predict
+    python -m diagnosis.voice synth /tmp/vowel.wav --f0 150 --jitter 0.01 --shimmer 0.05
+    python -m diagnosis.voice verify      # known jitter/shimmer in, measured jitter/shimmer out
+"""
+import argparse
+import concurrent.futures
+import csv
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+CHUNK_SECONDS = 1.0
+FRAME_SECONDS = 0.04
+HOP_SECONDS = 0.01
+F0_MIN = 60.0
+F0_MAX = 600.0
+VOICING_THRESHOLD = 0.45
+# Frames quieter than this (dB below the loudest frame) are treated as silence
+SILENCE_DB = 30.0
+# A later autocorrelation peak must beat the first one by this factor to be chosen (avoids octave errors)
+OCTAVE_TOLERANCE = 0.9
+PEAK_WINDOW = 0.7
+# Peaks are located by a least-squares parabola over this fraction of the period either side
+PEAK_FIT = 0.04
+# Cycles whose frequency is further than this from the pitch contour are dropped
+CYCLE_TOLERANCE = 0.3
+MIN_CYCLES = 20
+NONLINEAR_RATE = 25000
+NONLINEAR_SECONDS = 2.0
+RPDE_DIM, RPDE_DELAY, RPDE_RADIUS, RPDE_TMAX, RPDE_POINTS = 4, 35, 0.12, 1000, 2000
+DFA_SCALES = tuple(range(50, 201, 10))
+D2_DIM, D2_DELAY, D2_POINTS, D2_THEILER = 6, 35, 1200, 50
+PPE_BINS = np.linspace(-1.5, 1.5, 31)
+WAV_SUFFIXES = ('.wav', '.wave')
+
+
+def running_max(x, width):
+    """max(x[i:i + width]) for every full window, in O(n) (van Herk/Gil-Werman)"""
+    n = len(x)
+    if n < width:
+        return np.empty(0)
+    blocks = -(-n // width)
+    padded = np.full(blocks * width, -np.inf)
+    padded[:n] = x
+    padded = padded.reshape(blocks, width)
+    prefix = np.maximum.accumulate(padded, axis=1).ravel()
+    suffix = np.maximum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    starts = np.arange(n - width + 1)
+    return np.maximum(suffix[starts], prefix[starts + width - 1])
+
+
+class WavReader:
+    """PCM WAV file (path or seekable file object) read as mono float chunks in [-1, 1]"""
+
+    def __init__(self, source):
+        self._wav = wave.open(source, 'rb')
+        self.rate = self._wav.getframerate()
+        self.channels = self._wav.getnchannels()
+        self.width = self._wav.getsampwidth()
+        self.frames = self._wav.getnframes()
+
+    @property
+    def seconds(self):
+        return self.frames / self.rate
+
+    def _decode(self, data):
+        if self.width == 1:
+            samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float64) - 128.0) / 128.0
+        elif self.width == 3:
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+            samples = np.where(values >= 1 << 23, values - (1 << 24), values) / float(1 << 23)
+        elif self.width in (2, 4):
+            bits = 8 * self.width
+            samples = np.frombuffer(data, dtype=f'<i{self.width}').astype(np.float64) / float(1 << (bits - 1))
+        else:
+            raise ValueError(f"Unsupported sample width: {self.width} bytes")
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return samples
+
+    def chunks(self, seconds=CHUNK_SECONDS):
+        self._wav.rewind()
+        size = max(int(seconds * self.rate), 1)
+        while True:
+            data = self._wav.readframes(size)
+            if not data:
+                return
+            yield self._decode(data)
+
+    def close(self):
+        self._wav.close()
+
+
+def frame_pitch(frames, rate):
+    """F0 (Hz), harmonicity r (normalized correlation over one period) and RMS of each row of `frames`"""
+    n, length = frames.shape
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    window = np.hanning(length)
+    size = 1 << int(math.ceil(math.log2(2 * length)))
+    autocorr = np.fft.irfft(np.abs(np.fft.rfft(frames * window, size)) ** 2, size)[:, :length]
+    raw_autocorr = np.fft.irfft(np.abs(np.fft.rfft(frames, size)) ** 2, size)[:, :length]
+    window_autocorr = np.fft.irfft(np.abs(np.fft.rfft(window, size)) ** 2, size)[:length]
+    energy = autocorr[:, :1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Dividing by the window's own autocorrelation undoes the taper (Boersma 1993)
+        r = np.where(energy > 0, autocorr / energy, 0.0) / (window_autocorr / window_autocorr[0])
+    low = int(math.ceil(rate / F0_MAX))
+    high = min(int(rate / F0_MIN), length // 2)
+    segment = r[:, low:high]
+    best = segment.max(axis=1)
+    # First local maximum within OCTAVE_TOLERANCE of the best: the period rather than a multiple of it
+    is_local_max = np.zeros(segment.shape, dtype=bool)
+    is_local_max[:, 1:-1] = (segment[:, 1:-1] >= segment[:, :-2]) & (segment[:, 1:-1] >= segment[:, 2:])
+    lag = np.argmax(is_local_max & (segment >= OCTAVE_TOLERANCE * best[:, None]), axis=1)
+    lag = np.clip(lag, 1, segment.shape[1] - 2)
+    rows = np.arange(n)
+    y0, y1, y2 = segment[rows, lag - 1], segment[rows, lag], segment[rows, lag + 1]
+    denominator = y0 - 2 * y1 + y2
+    delta = np.where(denominator < 0, 0.5 * (y0 - y2) / np.where(denominator < 0, denominator, 1.0), 0.0)
+    delta = np.clip(delta, -0.5, 0.5)
+    f0 = rate / (low + lag + delta)
+
+    # Harmonicity: correlation of the frame with itself one period later, normalized by the energy
+    # of both overlapping parts, so it never exceeds 1 (Cauchy-Schwarz)
+    energy = np.concatenate([np.zeros((n, 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+    period = low + lag + np.rint(delta).astype(int)
+    head = energy[rows, length - period]
+    tail = energy[:, -1] - energy[rows, period]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        harmonicity = np.where(head * tail > 0, raw_autocorr[rows, period] / np.sqrt(head * tail), 0.0)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return f0, harmonicity, rms
+
+
+class _CycleTracker:
+    """Streams samples and returns one peak per glottal cycle, with peak-to-peak amplitudes"""
+
+    def __init__(self, rate, half_window, fit_radius):
+        self.rate = rate
+        self.w = half_window
+        self.fit_offsets = np.arange(-fit_radius, fit_radius + 1)
+        # Maps the samples around a peak to the coefficients (a, b, c) of a t^2 + b t + c
+        self.fit = np.linalg.pinv(np.column_stack([self.fit_offsets ** 2, self.fit_offsets,
+                                                   np.ones(len(self.fit_offsets))]))
+        self.buffer = np.empty(0)
+        self.offset = 0
+        self.next_start = half_window + 1
+        self.last = None
+        self.starts, self.periods, self.amplitudes = [], [], []
+
+    def feed(self, chunk):
+        buf = np.concatenate([self.buffer, chunk])
+        w = self.w
+        end = self.offset + len(buf) - w - 1
+        if end > self.next_start:
+            first, stop = self.next_start - self.offset, end - self.offset
+            x = buf[first:stop]
+            neighbourhood_max = running_max(buf[first - w:stop + w], 2 * w + 1)
+            is_peak = (x >= neighbourhood_max) & (x > buf[first - 1:stop - 1]) & (x > 0)
+            index = np.flatnonzero(is_peak) + first
+            a, b, c = self.fit @ buf[index[:, None] + self.fit_offsets].T
+            radius = self.fit_offsets[-1]
+            curved = a < 0
+            delta = np.where(curved, np.clip(-b / (2.0 * np.where(curved, a, -1.0)), -radius, radius), 0.0)
+            times = (index + self.offset + delta) / self.rate
+            heights = np.where(curved, a * delta ** 2 + b * delta + c, buf[index])
+            self._add(buf, index, times, heights)
+            self.next_start = end
+        keep = self.next_start - w - 1
+        if self.last is not None:
+            keep = min(keep, self.last[0])
+        self.buffer = buf[keep - self.offset:]
+        self.offset = keep
+
+    def _add(self, buf, index, times, heights):
+        if self.last is not None:
+            last_index, last_time, last_height = self.last
+            index = np.concatenate([[last_index - self.offset], index])
+            times = np.concatenate([[last_time], times])
+            heights = np.concatenate([[last_height], heights])
+        if len(index) >= 2:
+            troughs = np.minimum.reduceat(buf, index)[:-1]
+            self.starts.append(times[:-1])
+            self.periods.append(np.diff(times))
+            self.amplitudes.append(heights[:-1] - troughs)
+        if len(index):
+            self.last = (int(index[-1]) + self.offset, float(times[-1]), float(heights[-1]))
+
+    def cycles(self):
+        if not self.periods:
+            return np.empty(0), np.empty(0), np.empty(0)
+        return np.concatenate(self.starts), np.concatenate(self.periods), np.concatenate(self.amplitudes)
+
+
+def _local(values, valid):
+    """mean |x[k+1] - x[k]| over pairs of valid cycles"""
+    ok = valid[1:] & valid[:-1]
+    return float(np.abs(np.diff(values))[ok].mean()) if ok.any() else float('nan')
+
+
+def _quotient(values, valid, points):
+    """mean |x[k] - mean of the `points` cycles centred on k| over fully valid neighbourhoods"""
+    kernel = np.ones(points)
+    if len(values) < points:
+        return float('nan')
+    ok = np.convolve(valid.astype(float), kernel, 'valid') == points
+    radius = points // 2
+    deviation = np.abs(values[radius:len(values) - radius] - np.convolve(values, kernel, 'valid') / points)
+    return float(deviation[ok].mean()) if ok.any() else float('nan')
+
+
+def _ddx(values, valid):
+    """mean |(x[k+1] - x[k]) - (x[k] - x[k-1])| over valid triples"""
+    ok = valid[2:] & valid[1:-1] & valid[:-2]
+    return float(np.abs(np.diff(values, 2))[ok].mean()) if ok.any() else float('nan')
+
+
+def perturbation(periods, amplitudes, valid=None):
+    """Jitter and shimmer measures (dataset columns) of a sequence of cycles"""
+    valid = np.ones(len(periods), dtype=bool) if valid is None else valid
+    period = periods[valid].mean()
+    amplitude = amplitudes[valid].mean()
+    log_ratio = np.abs(20.0 * np.log10(amplitudes[1:] / amplitudes[:-1]))
+    pairs = valid[1:] & valid[:-1]
+    return {
+        'MDVP:Jitter(%)': _local(periods, valid) / period,
+        'MDVP:Jitter(Abs)': _local(periods, valid),
+        'MDVP:RAP': _quotient(periods, valid, 3) / period,
+        'MDVP:PPQ': _quotient(periods, valid, 5) / period,
+        'Jitter:DDP': _ddx(periods, valid) / period,
+        'MDVP:Shimmer': _local(amplitudes, valid) / amplitude,
+        'MDVP:Shimmer(dB)': float(log_ratio[pairs].mean()) if pairs.any() else float('nan'),
+        'Shimmer:APQ3': _quotient(amplitudes, valid, 3) / amplitude,
+        'Shimmer:APQ5': _quotient(amplitudes, valid, 5) / amplitude,
+        'MDVP:APQ': _quotient(amplitudes, valid, 11) / amplitude,
+        'Shimmer:DDA': _ddx(amplitudes, valid) / amplitude,
+    }
+
+
+def embed(x, dim, delay):
+    """Time-delay embedding: row n is (x[n], x[n + delay], ..., x[n + (dim - 1) delay])"""
+    count = len(x) - (dim - 1) * delay
+    return np.stack([x[i * delay:i * delay + count] for i in range(dim)], axis=1)
+
+
+def rpde(x, dim=RPDE_DIM, delay=RPDE_DELAY, radius=RPDE_RADIUS, t_max=RPDE_TMAX, points=RPDE_POINTS):
+    """Recurrence period density entropy in [0, 1] (Little et al. 2007)"""
+    x = x / max(np.abs(x).max(), 1e-12)
+    X = embed(x, dim, delay)
+    if len(X) <= t_max + 1:
+        return float('nan')
+    starts = np.linspace(0, len(X) - t_max - 1, min(points, len(X) - t_max), dtype=int)
+    lags = np.arange(t_max + 1)
+    histogram = np.zeros(t_max + 1)
+    for block in np.array_split(starts, max(len(starts) // 200, 1)):
+        distance = np.sqrt(((X[block[:, None] + lags] - X[block][:, None, :]) ** 2).sum(axis=2))
+        inside = distance < radius
+        left = np.argmax(~inside, axis=1)
+        returned = inside & (lags >= left[:, None])
+        first = np.argmax(returned, axis=1)
+        found = returned[np.arange(len(block)), first] & (~inside).any(axis=1)
+        histogram += np.bincount(first[found], minlength=t_max + 1)
+    total = histogram[1:].sum()
+    if total == 0:
+        return float('nan')
+    p = histogram[1:][histogram[1:] > 0] / total
+    return float(-(p * np.log(p)).sum() / math.log(t_max))
+
+
+def dfa(x, scales=DFA_SCALES):
+    """Detrended fluctuation analysis exponent, mapped to (0, 1) by a sigmoid (Little et al. 2007)"""
+    profile = np.cumsum(x - x.mean())
+    fluctuations = []
+    for scale in scales:
+        boxes = profile[:len(profile) // scale * scale].reshape(-1, scale)
+        t = np.arange(scale) - (scale - 1) / 2.0
+        centred = boxes - boxes.mean(axis=1, keepdims=True)
+        slope = centred @ t / (t @ t)
+        residual = centred - slope[:, None] * t
+        fluctuations.append(np.sqrt(np.mean(residual ** 2)))
+    alpha = np.polyfit(np.log(scales), np.log(fluctuations), 1)[0]
+    return float(1.0 / (1.0 + math.exp(-alpha)))
+
+
+def correlation_dimension(x, dim=D2_DIM, delay=D2_DELAY, points=D2_POINTS, theiler=D2_THEILER):
+    """Grassberger-Procaccia correlation dimension of the delay-embedded signal"""
+    X = embed(x / max(np.abs(x).max(), 1e-12), dim, delay)
+    index = np.linspace(0, len(X) - 1, min(points, len(X)), dtype=int)
+    Y = X[index]
+    squared = (Y ** 2).sum(axis=1)
+    distance = np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2.0 * Y @ Y.T, 0.0))
+    i, j = np.triu_indices(len(index), k=1)
+    # Pairs close in time are trivially close in space; leave them out (Theiler window)
+    distance = distance[i, j][np.abs(index[i] - index[j]) > theiler]
+    fractions = np.geomspace(0.005, 0.1, 8)
+    radii = np.quantile(distance, fractions)
+    if radii[0] <= 0:
+        return float('nan')
+    return float(np.polyfit(np.log(radii), np.log(fractions), 1)[0])
+
+
+def pitch_entropy(frequencies):
+    """(PPE, spread1, spread2) of a sequence of cycle frequencies"""
+    log_f0 = np.log(frequencies)
+    if len(log_f0) < 10:
+        return float('nan'), float('nan'), float('nan')
+    # Whiten the slow pitch movement with a least-squares AR(2) predictor
+    design = np.column_stack([log_f0[1:-1], log_f0[:-2], np.ones(len(log_f0) - 2)])
+    coefficients = np.linalg.lstsq(design, log_f0[2:], rcond=None)[0]
+    residual = log_f0[2:] - design @ coefficients
+    semitones = residual * 12.0 / math.log(2.0)
+    counts = np.histogram(np.clip(semitones, PPE_BINS[0], PPE_BINS[-1]), PPE_BINS)[0]
+    p = counts[counts > 0] / counts.sum()
+    ppe = float(-(p * np.log(p)).sum() / math.log(len(PPE_BINS) - 1))
+    spread1 = float(np.log(max(residual.std(), 1e-12)))
+    spread2 = float((12.0 * np.log2(frequencies / frequencies.mean())).std())
+    return ppe, spread1, spread2
+
+
+def _resample(x, rate, target):
+    if rate == target or len(x) < 2:
+        return x
+    count = int(len(x) * target / rate)
+    return np.interp(np.arange(count) * (rate / target), np.arange(len(x)), x)
+
+
+def extract(source, chunk_seconds=CHUNK_SECONDS):
+    """Dataset-column feature dict and an analysis summary for one recording (path or file object)"""
+    from diagnosis.schema import get_schema
+
+    reader = WavReader(source)
+    try:
+        rate = reader.rate
+        length, hop = int(FRAME_SECONDS * rate), int(HOP_SECONDS * rate)
+        # Pass 1: pitch contour, voicing and harmonicity per frame
+        f0s, peaks, levels = [], [], []
+        pending = np.empty(0)
+        for chunk in reader.chunks(chunk_seconds):
+            pending = np.concatenate([pending, chunk])
+            if len(pending) < length:
+                continue
+            count = 1 + (len(pending) - length) // hop
+            frames = np.lib.stride_tricks.sliding_window_view(pending, length)[::hop][:count]
+            f0, peak, rms = frame_pitch(frames, rate)
+            f0s.append(f0)
+            peaks.append(peak)
+            levels.append(rms)
+            pending = pending[count * hop:]
+        if not f0s:
+            raise ValueError('Recording is shorter than one analysis frame')
+        f0, peak, rms = np.concatenate(f0s), np.concatenate(peaks), np.concatenate(levels)
+        loud = rms > rms.max() * 10 ** (-SILENCE_DB / 20.0)
+        voiced = loud & (peak > VOICING_THRESHOLD) & (f0 >= F0_MIN) & (f0 <= F0_MAX)
+        if voiced.sum() < 3:
+            raise ValueError('No sustained voicing found in the recording')
+        median_period = rate / np.median(f0[voiced])
+
+        # Pass 2: glottal cycles, plus a bounded voiced excerpt for the nonlinear measures
+        tracker = _CycleTracker(rate, max(int(PEAK_WINDOW * median_period), 2),
+                                max(int(PEAK_FIT * median_period), 1))
+        excerpt, kept, limit, position = [], 0, int(NONLINEAR_SECONDS * rate), 0
+        sample_frame = None
+        for chunk in reader.chunks(chunk_seconds):
+            tracker.feed(chunk)
+            if kept < limit:
+                sample_frame = np.clip((np.arange(position, position + len(chunk)) - length // 2) // hop,
+                                       0, len(voiced) - 1)
+                part = chunk[voiced[sample_frame]][:limit - kept]
+                excerpt.append(part)
+                kept += len(part)
+            position += len(chunk)
+        starts, periods, amplitudes = tracker.cycles()
+    finally:
+        reader.close()
+
+    frame = np.clip(np.round((starts * rate - length / 2.0) / hop).astype(int), 0, len(voiced) - 1)
+    with np.errstate(divide='ignore'):
+        deviation = np.abs(1.0 / periods / f0[frame] - 1.0)
+    valid = voiced[frame] & (deviation < CYCLE_TOLERANCE) & (amplitudes > 0)
+    if valid.sum() < MIN_CYCLES:
+        raise ValueError(f"Only {int(valid.sum())} clean glottal cycles found; need at least {MIN_CYCLES}")
+
+    r = np.clip(peak[voiced], 1e-6, 1.0 - 1e-6)
+    signal = _resample(np.concatenate(excerpt), rate, NONLINEAR_RATE)
+    frequencies = 1.0 / periods[valid]
+    ppe, spread1, spread2 = pitch_entropy(frequencies)
+    features = {
+        'MDVP:Fo(Hz)': float(frequencies.mean()),
+        'MDVP:Fhi(Hz)': float(frequencies.max()),
+        'MDVP:Flo(Hz)': float(frequencies.min()),
+    }
+    features.update(perturbation(periods, amplitudes, valid))
+    features.update({
+        'NHR': float(np.mean((1.0 - r) / r)),
+        'HNR': float(np.mean(10.0 * np.log10(r / (1.0 - r)))),
+        'RPDE': rpde(signal),
+        'DFA': dfa(signal),
+        'spread1': spread1,
+        'spread2': spread2,
+        'D2': correlation_dimension(signal),
+        'PPE': ppe,
+    })
+    summary = {
+        'rate': rate,
+        'audio_seconds': round(position / rate, 3),
+        'voiced_fraction': round(float(voiced.mean()), 4),
+        'cycles': int(valid.sum()),
+    }
+    return {column: features[column] for column in get_schema('parkinsons').columns}, summary
+
+
+def extract_file(path, measure_memory=True):
+    """(path, features or None, report) -- the report carries timing, peak traced memory or the error"""
+    if measure_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    report = {'path': path}
+    features = None
+    try:
+        features, summary = extract(path)
+        report.update(summary)
+    except (ValueError, EOFError, wave.Error) as e:
+        report['error'] = str(e)
+    report['seconds'] = round(time.perf_counter() - start, 4)
+    if measure_memory:
+        report['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return path, features, report
+
+
+def find_recordings(paths):
+    """WAV files among `paths`, descending into directories"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                found.extend(os.path.join(directory, name) for name in sorted(names)
+                             if name.lower().endswith(WAV_SUFFIXES))
+        else:
+            found.append(path)
+    return found
+
+
+def extract_files(paths, workers=None, measure_memory=True):
+    """Yield extract_file() results in input order, spread over `workers` processes"""
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield extract_file(path, measure_memory)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(extract_file, paths, [measure_memory] * len(paths))
+
+
+def synthesize(f0=150.0, jitter=0.005, shimmer=0.03, seconds=3.0, rate=44100, noise_db=None, seed=0):
+    """Synthetic sustained vowel with random cycle-to-cycle period and amplitude perturbation
+
+    Returns the samples and the perturbation measures of the true peak times and
+    amplitudes, to check `extract` against.
+    """
+    rng = np.random.default_rng(seed)
+    count = int(seconds * f0) + 2
+    periods = (1.0 + jitter * rng.standard_normal(count)) / f0
+    amplitudes = 0.5 * (1.0 + shimmer * rng.standard_normal(count))
+    starts = np.concatenate([[0.0], np.cumsum(periods)[:-1]])
+    t = np.arange(int(starts[-1] * rate)) / rate
+    cycle = np.searchsorted(starts, t, side='right') - 1
+    phase = 2.0 * np.pi * (t - starts[cycle]) / periods[cycle]
+
+    def shape(phi):
+        # Zero at each cycle boundary, so amplitude steps between cycles leave no discontinuity
+        return np.sin(phi) + 0.5 * np.sin(2.0 * phi) + 0.25 * np.sin(3.0 * phi)
+
+    samples = amplitudes[cycle] * shape(phase)
+    grid = np.linspace(0.0, 2.0 * np.pi, 100001)
+    values = shape(grid)
+    peak_phase = grid[values.argmax()]
+    swing = values.max() - values.min()
+    if noise_db is not None:
+        samples = samples + rng.standard_normal(len(samples)) * samples.std() * 10 ** (-noise_db / 20.0)
+    # Ground truth from the true peak times (one fixed phase into each cycle) and peak-to-peak amplitudes
+    peak_times = starts + peak_phase / (2.0 * np.pi) * periods
+    truth = perturbation(np.diff(peak_times)[:-1], (amplitudes * swing)[:-2])
+    return samples, truth
+
+
+def write_wav(path, samples, rate=44100):
+    """16-bit mono PCM"""
+    pcm = np.clip(np.round(samples * 32767.0), -32768, 32767).astype('<i2')
+    with wave.open(path, 'wb') as fh:
+        fh.setnchannels(1)
+        fh.setsampwidth(2)
+        fh.setframerate(rate)
+        fh.writeframes(pcm.tobytes())
+
+
+VERIFY_CASES = [
+    {'f0': 110.0, 'jitter': 0.002, 'shimmer': 0.02},
+    {'f0': 110.0, 'jitter': 0.01, 'shimmer': 0.08},
+    {'f0': 150.0, 'jitter': 0.005, 'shimmer': 0.04},
+    {'f0': 220.0, 'jitter': 0.002, 'shimmer': 0.02},
+    {'f0': 220.0, 'jitter': 0.01, 'shimmer': 0.08},
+    {'f0': 150.0, 'jitter': 0.005, 'shimmer': 0.04, 'noise_db': 30.0},
+]
+VERIFY_COLUMNS = ('MDVP:Jitter(%)', 'MDVP:RAP', 'MDVP:PPQ', 'MDVP:Shimmer', 'Shimmer:APQ3', 'MDVP:APQ')
+
+
+def verify(cases=VERIFY_CASES, seconds=3.0, tolerance=0.1, workers=None):
+    """Extract synthetic recordings of known jitter/shimmer; returns rows and the worst relative error"""
+    rows, worst = [], 0.0
+    with tempfile.TemporaryDirectory() as directory:
+        paths, truths = [], []
+        for number, case in enumerate(cases):
+            samples, truth = synthesize(seconds=seconds, seed=number, **case)
+            path = os.path.join(directory, f'case{number}.wav')
+            write_wav(path, samples)
+            paths.append(path)
+            truths.append(truth)
+        for case, truth, (path, features, report) in zip(cases, truths, extract_files(paths, workers)):
+            if features is None:
+                raise ValueError(f"Extraction failed for {case}: {report['error']}")
+            errors = {column: abs(features[column] - truth[column]) / truth[column] for column in VERIFY_COLUMNS}
+            # Noise adds genuine perturbation on top of the synthetic one; only the clean cases are scored
+            if case.get('noise_db') is None:
+                worst = max(worst, max(errors.values()))
+            rows.append({'case': case, 'truth': truth, 'features': features, 'errors': errors, 'report': report})
+    return rows, worst <= tolerance, worst
+
+
+def _format_case(case):
+    text = f"F0 {case['f0']:g} Hz, jitter {case['jitter']:.1%}, shimmer {case['shimmer']:.0%}"
+    return text + (f", noise {case['noise_db']:g} dB" if case.get('noise_db') is not None else '')
+
+
+def _write_csv(fh, rows, columns):
+    writer = csv.DictWriter(fh, columns, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parkinson's voice features from sustained-vowel WAV recordings")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    extract_parser = subparsers.add_parser('extract', help='features of WAV files or directories of them')
+    extract_parser.add_argument('paths', nargs='+')
+    extract_parser.add_argument('--output', help='CSV to write (default: stdout)')
+    extract_parser.add_argument('--workers', type=int, help='processes (default: one per CPU)')
+    extract_parser.add_argument('--predict', action='store_true', help='append the parkinsons model prediction')
+    synth_parser = subparsers.add_parser('synth', help='write a synthetic sustained vowel')
+    synth_parser.add_argument('path')
+    synth_parser.add_argument('--f0', type=float, default=150.0)
+    synth_parser.add_argument('--jitter', type=float, default=0.005, help='relative s.d. of the cycle periods')
+    synth_parser.add_argument('--shimmer', type=float, default=0.03, help='relative s.d. of the cycle amplitudes')
+    synth_parser.add_argument('--seconds', type=float, default=3.0)
+    synth_parser.add_argument('--rate', type=int, default=44100)
+    synth_parser.add_argument('--noise-db', type=float, help='add white noise this many dB below the signal')
+    verify_parser = subparsers.add_parser('verify', help='check the measures on synthetic signals')
+    verify_parser.add_argument('--tolerance', type=float, default=0.1, help='largest relative error allowed')
+    verify_parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'synth':
+        samples, truth = synthesize(args.f0, args.jitter, args.shimmer, args.seconds, args.rate, args.noise_db)
+        write_wav(args.path, samples, args.rate)
+        print(f"wrote {args.path}: " + ', '.join(f"{column} {value:.5f}" for column, value in truth.items()))
+        return
+
+    if args.command == 'verify':
+        rows, passed, worst = verify(tolerance=args.tolerance, workers=args.workers)
+        for row in rows:
+            print(f"{_format_case(row['case'])} ({row['report']['seconds'] * 1000:.0f} ms)")
+            for column in VERIFY_COLUMNS:
+                print(f"  {column:<15} true {row['truth'][column]:.5f}  measured {row['features'][column]:.5f}  "
+                      f"error {row['errors'][column]:6.1%}")
+        print(f"worst relative error on clean signals {worst:.1%} ({'within' if passed else 'above'} "
+              f"{args.tolerance:.0%})")
+        if not passed:
+            raise SystemExit(1)
+        return
+
+    from diagnosis.schema import get_schema
+
+    columns = get_schema('parkinsons').columns
+    paths = find_recordings(args.paths)
+    if not paths:
+        parser.error('no WAV recordings found')
+    rows, failures = [], 0
+    for path, features, report in extract_files(paths, args.workers):
+        memory = report.get('peak_memory_bytes', 0) / 2 ** 20
+        if features is None:
+            failures += 1
+            print(f"{path}: FAILED {report['error']} ({report['seconds'] * 1000:.0f} ms)", file=sys.stderr)
+            continue
+        print(f"{path}: {report['audio_seconds']:.1f} s audio, {report['cycles']} cycles, "
+              f"{report['seconds'] * 1000:.0f} ms, peak {memory:.1f} MiB", file=sys.stderr)
+        rows.append(dict(features, name=os.path.splitext(os.path.basename(path))[0]))
+    output_columns = ['name'] + columns
+    if args.predict and rows:
+        from diagnosis import batch
+        from diagnosis.registry import get_registry
+
+        model = get_registry()['parkinsons']
+        X = np.array([[row[column] for column in columns] for row in rows])
+        predictions, scores = batch.score_array(model, X)
+        for i, row in enumerate(rows):
+            row['prediction'] = int(predictions[i])
+            row['score'] = None if scores is None else float(scores[i])
+        output_columns += ['prediction', 'score']
+    if args.output:
+        with open(args.output, 'w', newline='') as fh:
+            _write_csv(fh, rows, output_columns)
+    else:
+        _write_csv(sys.stdout, rows, output_columns)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pytest
+
+from diagnosis import batch
+from diagnosis.artifact import export_model, load_kernel, read_artifact, save_kernel, write_artifact
+from diagnosis.registry import MODEL_FILES, MODELS_DIR, load_pickle
+from diagnosis.schema import get_schema
+
+pytestmark = [pytest.mark.filterwarnings('ignore::sklearn.exceptions.InconsistentVersionWarning'),
+              pytest.mark.filterwarnings('ignore:X does not have valid feature names')]
+
+
+def test_arrays_and_metadata_round_trip(tmp_path):
+    arrays = {'weights': np.arange(12, dtype=np.float32).reshape(3, 4), 'ids': np.array([3, 1, 2], dtype=np.int64),
+              'flags': np.array([True, False]), 'empty': np.empty((0, 4), dtype=np.float64)}
+    path = write_artifact(str(tmp_path / 'model.mdl'), arrays, {'name': 'test', 'rows': 3})
+    loaded, header = read_artifact(path)
+    assert header['name'] == 'test' and header['rows'] == 3
+    assert set(loaded) == set(arrays)
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        np.testing.assert_array_equal(loaded[name], array)
+
+
+def test_non_artifact_is_rejected(tmp_path):
+    path = tmp_path / 'model.mdl'
+    path.write_bytes(b'not an artifact' * 4)
+    with pytest.raises(ValueError, match='not a model artifact'):
+        load_kernel(str(path))
+
+
+@pytest.mark.parametrize('name', list(MODEL_FILES))
+def test_saved_kernel_loads_back_equal(name, tmp_path):
+    kernel = load_kernel(os.path.join(MODELS_DIR, os.path.splitext(MODEL_FILES[name])[0] + '.mdl'))
+    loaded = load_kernel(save_kernel(kernel, str(tmp_path / f'{name}.mdl'), kernel.metadata))
+    for attribute in ('coef', 'classes_'):
+        np.testing.assert_array_equal(getattr(loaded, attribute), getattr(kernel, attribute))
+    assert loaded.intercept == kernel.intercept
+    assert (loaded.link, loaded.dtype, loaded.name) == (kernel.link, kernel.dtype, kernel.name)
+    assert list(loaded.feature_names_in_) == list(kernel.feature_names_in_)
+
+
+@pytest.mark.parametrize('name', list(MODEL_FILES))
+def test_exported_model_predicts_like_the_pickle(name, tmp_path):
+    model = load_pickle(os.path.join(MODELS_DIR, MODEL_FILES[name]))
+    schema = get_schema(name)
+    X = schema.vectorize_frame(schema.load_dataset())
+    kernel = load_kernel(export_model(name, model, str(tmp_path / f'{name}.mdl'), feature_names=schema.columns))
+    np.testing.assert_array_equal(batch.score_array(kernel, X)[0], batch.score_array(model, X)[0])
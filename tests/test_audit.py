@@ -0,0 +1,46 @@
+import gc
+import os
+import shutil
+
+import pytest
+
+from diagnosis import audit
+from diagnosis.artifact import file_sha256
+from diagnosis.audit import AuditLog, artifact_digest, query
+from diagnosis.kernel import LinearKernel
+from diagnosis.registry import MODELS_DIR, load_model, load_pickle
+
+
+@pytest.mark.filterwarnings('ignore::sklearn.exceptions.InconsistentVersionWarning')
+def test_records_carry_the_digest_of_the_loaded_file(tmp_path):
+    path = os.path.join(MODELS_DIR, 'diabetes_model.sav')
+    artifact, pickled = load_model(path), load_pickle(path)
+    log = AuditLog(str(tmp_path / 'audit.db'))
+    try:
+        log.record('diabetes', artifact, [0.0] * 8, 1, 0.9, source='test')
+        log.record('diabetes', pickled, [0.0] * 8, 0, 0.1, source='test')
+        assert log.flush()
+    finally:
+        log.close()
+    versions = [record['model_version'] for record in query(str(tmp_path / 'audit.db'))]
+    assert versions == ['sha256:' + file_sha256(artifact.source_path), 'sha256:' + file_sha256(path)]
+
+
+def test_digest_is_taken_when_the_model_is_loaded(tmp_path):
+    path = str(tmp_path / 'Thyroid_model.mdl')
+    shutil.copy(os.path.join(MODELS_DIR, 'Thyroid_model.mdl'), path)
+    expected = 'sha256:' + file_sha256(path)
+    model = load_model(path)
+    os.remove(path)
+    assert artifact_digest(model) == expected
+
+
+@pytest.mark.filterwarnings('ignore::sklearn.exceptions.InconsistentVersionWarning')
+def test_digests_do_not_keep_models_alive():
+    # Built in memory, so it has no file digest and is hashed (and cached) by its pickle
+    model = LinearKernel.from_estimator(load_pickle(os.path.join(MODELS_DIR, 'Thyroid_model.sav')))
+    artifact_digest(model)
+    count = len(audit._digests)
+    del model
+    gc.collect()
+    assert len(audit._digests) == count - 1
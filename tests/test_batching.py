@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+import pytest
+
+from diagnosis.batching import MicroBatcher
+
+
+class _RecordingModel:
+    """Sign of the first column, recording the size of every batch it scores"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def predict(self, X):
+        self.batches.append(len(X))
+        if self.fail:
+            raise RuntimeError('scoring failed')
+        return (X[:, 0] > 0).astype(np.int64)
+
+    def decision_function(self, X):
+        return X[:, 0]
+
+
+@pytest.fixture
+def rows():
+    return np.random.default_rng(0).normal(size=(25, 3))
+
+
+def _submit_all(batcher, rows):
+    futures = [batcher.submit(row) for row in rows]
+    return [future.result(timeout=5) for future in futures]
+
+
+def test_queued_rows_are_scored_together_and_answered_per_row(rows):
+    model = _RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=500.0)
+    try:
+        results = _submit_all(batcher, rows)
+    finally:
+        batcher.close()
+    assert model.batches == [len(rows)]
+    assert results == [(int(row[0] > 0), float(row[0])) for row in rows]
+
+
+def test_batches_are_capped_at_max_batch_size(rows):
+    model = _RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=10, max_wait_ms=500.0)
+    try:
+        _submit_all(batcher, rows)
+    finally:
+        batcher.close()
+    assert model.batches == [10, 10, 5]
+    assert batcher.stats()['batch_size']['count'] == 3
+
+
+def test_a_lone_row_waits_at_most_max_wait(rows):
+    model = _RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=50.0)
+    try:
+        start = time.perf_counter()
+        batcher.predict(rows[0], timeout=5)
+        elapsed = time.perf_counter() - start
+    finally:
+        batcher.close()
+    assert model.batches == [1]
+    assert 0.04 <= elapsed < 1.0
+
+
+def test_a_scoring_error_reaches_every_request_in_the_batch(rows):
+    batcher = MicroBatcher(_RecordingModel(fail=True), max_batch_size=64, max_wait_ms=200.0)
+    try:
+        futures = [batcher.submit(row) for row in rows[:5]]
+        for future in futures:
+            with pytest.raises(RuntimeError, match='scoring failed'):
+                future.result(timeout=5)
+    finally:
+        batcher.close()
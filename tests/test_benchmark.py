@@ -0,0 +1,24 @@
+from diagnosis.benchmark import compare
+
+
+def _report(load_ms, p50_ms, rows_per_second):
+    mode = {'p50_ms': p50_ms, 'p95_ms': p50_ms, 'p99_ms': p50_ms, 'rows_per_second': rows_per_second}
+    return {'models': {'diabetes': {'load_ms': load_ms, 'modes': {'single': mode}}}, 'peak_rss_bytes': None}
+
+
+def test_sub_millisecond_jitter_is_not_a_regression():
+    baseline = _report(0.3, 0.004, 250000.0)
+    # Doubling sub-ms timings is far beyond 25% but well inside the 1 ms noise floor
+    assert compare(_report(0.6, 0.008, 240000.0), baseline) == []
+
+
+def test_large_regressions_are_reported():
+    regressions = compare(_report(30.0, 4.0, 100000.0), _report(10.0, 1.0, 250000.0))
+    assert [message.split(':')[0] for message in regressions] == [
+        'diabetes load_ms', 'diabetes single p50_ms', 'diabetes single p95_ms', 'diabetes single p99_ms',
+        'diabetes single rows_per_second']
+
+
+def test_floor_can_be_disabled():
+    assert compare(_report(0.6, 0.004, 250000.0), _report(0.3, 0.004, 250000.0), min_delta_ms=0.0) == [
+        'diabetes load_ms: 0.3 -> 0.6 (+100.0%)']
@@ -0,0 +1,50 @@
+import gc
+
+import numpy as np
+
+from diagnosis import cache
+from diagnosis.cache import MemoryBackend, PredictionCache, model_version
+from diagnosis.kernel import LinearKernel
+
+
+def _forest(labels_flipped):
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.random((200, 3))
+    y = (X[:, 0] > 0.5).astype(int)
+    return RandomForestClassifier(n_estimators=5, random_state=0).fit(X, 1 - y if labels_flipped else y)
+
+
+def test_non_linear_models_get_distinct_versions():
+    assert model_version(_forest(False)) != model_version(_forest(True))
+
+
+def test_version_is_stable_for_equal_content():
+    assert model_version(_forest(False)) == model_version(_forest(False))
+
+
+def test_kernel_version_follows_its_weights():
+    kernel = LinearKernel([1.0, 2.0], 0.5, [0, 1])
+    shifted = LinearKernel([1.0, 2.0], -0.5, [0, 1])
+    assert model_version(kernel) != model_version(shifted)
+    assert model_version(kernel) == model_version(LinearKernel([1.0, 2.0], 0.5, [0, 1]))
+
+
+def test_cache_does_not_serve_a_replaced_models_predictions():
+    prediction_cache = PredictionCache(MemoryBackend())
+    row = np.array([0.9, 0.1, 0.1])
+    for model in (_forest(False), _forest(True)):
+        expected = int(model.predict(row.reshape(1, -1))[0])
+        prediction, _ = prediction_cache.get_or_compute(model, row, lambda r: (int(model.predict(r.reshape(1, -1))[0]),
+                                                                              None))
+        assert prediction == expected
+
+
+def test_fingerprints_do_not_keep_models_alive():
+    model = LinearKernel([1.0], 0.0, [0, 1])
+    model_version(model)
+    before = len(cache._fingerprints)
+    del model
+    gc.collect()
+    assert len(cache._fingerprints) == before - 1
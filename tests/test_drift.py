@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from diagnosis.drift import DriftMonitor, Reference, ks, ks_pvalue, psi
+
+
+@pytest.fixture(scope='module')
+def reference():
+    X = np.random.default_rng(0).normal(size=(20000, 2))
+    return Reference.from_array('test', ['shifted', 'steady'], X)
+
+
+def _live(rows=5000, shift=1.0, seed=1):
+    X = np.random.default_rng(seed).normal(size=(rows, 2))
+    X[:, 0] += shift
+    return X
+
+
+def test_psi_and_ks_of_known_counts():
+    assert psi(np.array([50, 50]), np.array([50, 50])) == 0.0
+    # (0.25 - 0.5) ln(0.5) + (0.75 - 0.5) ln(1.5)
+    assert psi(np.array([50, 50]), np.array([25, 75])) == pytest.approx(0.25 * np.log(3.0))
+    assert ks(np.array([50, 50]), np.array([25, 75])) == pytest.approx(0.25)
+    assert ks_pvalue(0.0, 100, 100) == 1.0
+    assert ks_pvalue(0.25, 100, 100) < 0.01 < ks_pvalue(0.1, 100, 100)
+
+
+def test_a_shifted_feature_is_flagged_and_the_other_is_not(reference):
+    monitor = DriftMonitor(reference)
+    monitor.observe_batch(_live())
+    report = monitor.report()
+    shifted, steady = report['features']['shifted'], report['features']['steady']
+    assert shifted['status'] == 'significant' and shifted['psi'] > 0.25
+    assert steady['status'] == 'stable' and steady['psi'] < 0.1
+    assert report['drifted'] == ['shifted'] and report['max_psi_feature'] == 'shifted'
+    # A one-sd shift of a normal moves the CDFs apart by up to 2 * Phi(0.5) - 1 = 0.383; deciles see most of it
+    assert 0.3 < shifted['ks'] <= 0.383 + 0.02
+    assert shifted['ks_pvalue'] < 1e-6 and steady['ks_pvalue'] > 1e-3
+
+
+def test_rows_and_batches_count_alike(reference):
+    X = _live(rows=300)
+    one_by_one, batched = DriftMonitor(reference), DriftMonitor(reference)
+    for row in X:
+        one_by_one.observe(row)
+    batched.observe_batch(X)
+    np.testing.assert_array_equal(one_by_one.counts()[0], batched.counts()[0])
+    assert one_by_one.report() == batched.report()
+
+
+def test_window_forgets_old_inputs(reference):
+    monitor = DriftMonitor(reference, window=1000)
+    monitor.observe_batch(_live(rows=1000, shift=3.0))
+    for seed in (2, 3):
+        monitor.observe_batch(_live(rows=1000, shift=0.0, seed=seed))
+    report = monitor.report()
+    assert report['rows'] == 2000 and report['observed'] == 3000
+    assert report['features']['shifted']['status'] == 'stable'
@@ -0,0 +1,34 @@
+import gc
+import os
+import weakref
+
+import numpy as np
+import pytest
+
+from diagnosis import explain
+from diagnosis.artifact import load_kernel
+from diagnosis.explain import get_explainer
+from diagnosis.registry import MODELS_DIR
+
+
+def _kernel():
+    return load_kernel(os.path.join(MODELS_DIR, 'diabetes_model.mdl'))
+
+
+def test_cached_explainers_do_not_keep_models_alive():
+    model = _kernel()
+    get_explainer(model).explain(np.zeros((1, 8)))
+    count = len(explain._explainers)
+    released = weakref.ref(model)
+    del model
+    gc.collect()
+    assert released() is None
+    assert len(explain._explainers) == count - 1
+
+
+def test_explainer_is_reused_while_the_model_lives():
+    model = _kernel()
+    assert get_explainer(model) is get_explainer(model)
+    record = get_explainer(model).explain(np.ones((1, 8)))[0]
+    assert len(record['top_features']) == 3
+    assert record['score'] == pytest.approx(float(np.ones(8) @ np.asarray(model.coef, dtype=np.float64)) + float(model.intercept))
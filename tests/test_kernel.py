@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from diagnosis import batch
+from diagnosis.artifact import artifact_registry
+from diagnosis.kernel import LinearKernel, verify
+from diagnosis.registry import MODEL_FILES, ModelRegistry, load_pickle
+
+# The bundled pickles were written by an older scikit-learn and fitted on named columns
+pytestmark = [pytest.mark.filterwarnings('ignore::sklearn.exceptions.InconsistentVersionWarning'),
+              pytest.mark.filterwarnings('ignore:X does not have valid feature names')]
+
+
+@pytest.fixture(scope='module')
+def sklearn_models():
+    return ModelRegistry(loader=load_pickle)
+
+
+@pytest.fixture(scope='module')
+def kernels():
+    return artifact_registry()
+
+
+@pytest.mark.parametrize('name', list(MODEL_FILES))
+def test_artifact_agrees_with_sklearn_on_the_dataset(name, sklearn_models, kernels):
+    model, kernel = sklearn_models[name], kernels[name]
+    X = batch.prepare_features(batch.load_dataset(name), name, model)
+    np.testing.assert_array_equal(kernel.predict(X.astype(np.float32)), model.predict(X))
+    np.testing.assert_allclose(kernel.decision_function(X.astype(np.float32)), model.decision_function(X),
+                               rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.parametrize('name', list(MODEL_FILES))
+def test_compiled_estimator_matches_its_probabilities(name, sklearn_models):
+    model = sklearn_models[name]
+    kernel = LinearKernel.from_estimator(model)
+    X = batch.prepare_features(batch.load_dataset(name), name, model)
+    if hasattr(kernel, 'predict_proba') and hasattr(model, 'predict_proba'):
+        np.testing.assert_allclose(kernel.predict_proba(X)[:, 1], model.predict_proba(X)[:, 1], atol=1e-4)
+    np.testing.assert_array_equal(kernel.predict(X), model.predict(X))
+
+
+def test_verify_reports_no_mismatches():
+    report = verify(repeat=1)
+    assert set(report) == set(MODEL_FILES)
+    assert all(result['mismatches'] == 0 and result['agreement'] == 1.0 for result in report.values())
@@ -0,0 +1,103 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from diagnosis.online import OnlineLearner, OnlineLearners, mcnemar_p_value
+from diagnosis.registry import MODELS_DIR, ModelRegistry
+from diagnosis.router import ModelRouter
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    shutil.copy(os.path.join(MODELS_DIR, 'diabetes_model.mdl'), tmp_path)
+    return str(tmp_path)
+
+
+def _learner(models_dir, **options):
+    return OnlineLearner('diabetes', ModelRouter(ModelRegistry(models_dir)), promote=False, **options)
+
+
+def test_checkpoint_records_the_router_primary(models_dir):
+    learner = _learner(models_dir)
+    assert learner.base_version['version'] == 'diabetes_model'
+    assert learner.base_version['path'] == 'diabetes_model.mdl'
+    assert learner.base_version['digest'].startswith('sha256:')
+
+
+def test_resumes_while_the_primary_is_unchanged(models_dir):
+    learner = _learner(models_dir, checkpoint_rows=10 ** 6)
+    learner.rows_trained = 123
+    learner.checkpoint()
+    resumed = _learner(models_dir)
+    assert resumed.rows_trained == 123
+    assert resumed.base_version == learner.base_version
+
+
+def test_restarts_from_a_primary_promoted_by_hand(models_dir):
+    learner = _learner(models_dir)
+    learner.checkpoint()
+    os.makedirs(os.path.join(models_dir, 'candidates'))
+    shutil.copy(os.path.join(models_dir, 'diabetes_model.mdl'), os.path.join(models_dir, 'candidates', 'manual.mdl'))
+    router = ModelRouter(ModelRegistry(models_dir))
+    router.deploy('diabetes', os.path.join('candidates', 'manual.mdl'), 'manual')
+    router.promote('diabetes', 'manual')
+
+    resumed = OnlineLearner('diabetes', ModelRouter(ModelRegistry(models_dir)), promote=False)
+    assert resumed.base_version['version'] == 'manual'
+    assert resumed.base_version['path'] == os.path.join('candidates', 'manual.mdl')
+
+
+def test_mcnemar_p_value():
+    assert mcnemar_p_value(0, 0) == 1.0
+    assert mcnemar_p_value(5, 0) == pytest.approx(1 / 32)
+    assert mcnemar_p_value(3, 3) == pytest.approx(42 / 64)
+    # 11 wins to 4 losses is a clear majority of the disagreements but not significant at 5%
+    assert mcnemar_p_value(11, 4) > 0.05
+    assert mcnemar_p_value(40, 15) < 0.01
+
+
+def test_an_update_that_only_ties_the_primary_is_not_promoted(models_dir):
+    learner = _learner(models_dir)
+    learner.rows_trained = 1
+    gate = learner.evaluate()
+    assert gate['wins'] == gate['losses'] == 0
+    assert gate['p_value'] == 1.0
+    assert not gate['passed']
+
+
+def _rows(n, seed=0):
+    from diagnosis import training
+
+    X, y = training.load_training_data('diabetes')
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(X), n)
+    return X[rows] + rng.normal(0.0, 0.01, (n, X.shape[1])), y[rows]
+
+
+def test_checkpoint_keeps_the_unfinished_mini_batch(models_dir):
+    learner = _learner(models_dir, batch_size=64)
+    X, y = _rows(40)
+    learner.update(X, y)
+    assert 0 < learner._buffered < 64
+    learner.checkpoint(train_buffered=False)
+    resumed = _learner(models_dir, batch_size=64)
+    assert resumed._buffered == learner._buffered
+    np.testing.assert_array_equal(resumed._batch_X[:resumed._buffered], learner._batch_X[:learner._buffered])
+    np.testing.assert_array_equal(resumed._batch_y[:resumed._buffered], learner._batch_y[:learner._buffered])
+
+
+def test_due_checkpoints_run_in_the_background(models_dir):
+    learners = OnlineLearners(ModelRouter(ModelRegistry(models_dir)), batch_size=16, checkpoint_rows=32,
+                              promote=False)
+    try:
+        X, y = _rows(200)
+        result = learners.update('diabetes', X, y)
+        assert result['due'] and result['checkpoint'] is None
+        assert learners.flush()
+    finally:
+        learners.close()
+    gate = learners.learner('diabetes').last_gate
+    assert 'error' not in gate and gate['rows_trained'] >= 32
+    assert os.path.exists(learners.learner('diabetes').path)
@@ -0,0 +1,59 @@
+import pytest
+
+from diagnosis.panel import build_records, screen
+from diagnosis.schema import get_schema
+
+MALE_SMOKER_LABELS = {'age': 50, 'sex': 'Male', 'smoking': 'Yes'}
+# The same patient on the panel's own code scales (FEMALE_MALE, NO_YES)
+MALE_SMOKER_CODES = {'age': 50, 'sex': 1, 'smoking': 1}
+
+
+def _encoded(records, disease, column):
+    schema = get_schema(disease)
+    return schema.feature(column).encode([records[disease][column]])[0]
+
+
+@pytest.mark.parametrize('patient', [MALE_SMOKER_LABELS, MALE_SMOKER_CODES])
+def test_shared_fields_reach_each_disease_in_its_own_codes(patient):
+    records = build_records(patient)
+    assert _encoded(records, 'heart_disease', 'sex') == 1
+    assert _encoded(records, 'lung_cancer', 'GENDER') == 1
+    # Thyroid codes Male=0, the lung survey codes Yes=2
+    assert _encoded(records, 'thyroid', 'sex') == 0
+    assert _encoded(records, 'lung_cancer', 'SMOKING') == 2
+    assert records['diabetes']['Age'] == 50
+
+
+def test_label_and_code_input_build_the_same_records():
+    assert build_records(MALE_SMOKER_LABELS) == build_records(MALE_SMOKER_CODES)
+
+
+def test_invalid_shared_code_is_rejected():
+    with pytest.raises(ValueError, match='sex'):
+        build_records({'age': 50, 'sex': 7})
+
+
+def test_section_value_wins_over_shared_field():
+    records = build_records({'sex': 'Male', 'thyroid': {'sex': 'Female'}})
+    assert _encoded(records, 'thyroid', 'sex') == 1
+
+
+class _BrokenModel:
+    n_features_in_ = 8
+
+    def predict(self, X):
+        raise RuntimeError('model exploded')
+
+
+@pytest.mark.filterwarnings('ignore:X does not have valid feature names')
+def test_a_failing_model_is_reported_without_losing_the_others():
+    from diagnosis.registry import ModelRegistry
+
+    registry = ModelRegistry()
+    registry.replace('diabetes', _BrokenModel(), None)
+    patient = {'diabetes': get_schema('diabetes').negative_sample,
+               'parkinsons': get_schema('parkinsons').negative_sample}
+    outcomes = {o['model']: o for o in screen(patient, registry, diseases=['diabetes', 'parkinsons']).outcomes}
+    assert outcomes['diabetes']['status'] == 'error'
+    assert 'model exploded' in outcomes['diabetes']['error']
+    assert outcomes['parkinsons']['status'] == 'ok'
@@ -0,0 +1,37 @@
+import os
+import threading
+import time
+
+from diagnosis.profiling import SlowRequestProfiler
+
+
+def test_overlapping_cprofile_requests_fall_back_to_sampling(tmp_path):
+    profiler = SlowRequestProfiler('cprofile', slow_ms=0.0, directory=str(tmp_path))
+    inside = threading.Barrier(2)
+    errors = []
+
+    def request(name):
+        try:
+            with profiler.profile(name):
+                inside.wait(timeout=5)
+                time.sleep(0.01)
+        except Exception as e:  # cProfile raises on a second active profiler in Python 3.12+
+            errors.append(e)
+
+    threads = [threading.Thread(target=request, args=(f'request{i}',)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    extensions = sorted(os.path.splitext(capture['path'])[1] for capture in profiler.captures)
+    assert extensions == ['.folded', '.prof']
+
+
+def test_cprofile_is_used_again_once_free(tmp_path):
+    profiler = SlowRequestProfiler('cprofile', slow_ms=0.0, directory=str(tmp_path))
+    for name in ('first', 'second'):
+        with profiler.profile(name):
+            pass
+    assert [os.path.splitext(capture['path'])[1] for capture in profiler.captures] == ['.prof', '.prof']
@@ -0,0 +1,84 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from diagnosis.panel import screen
+from diagnosis.registry import MODELS_DIR, ModelRegistry
+from diagnosis.router import MODE_SHADOW, MODE_SPLIT, ModelRouter, load_manifest
+from diagnosis.schema import get_schema
+from diagnosis.sensitivity import sweep
+
+pytestmark = pytest.mark.filterwarnings('ignore:X does not have valid feature names')
+
+
+@pytest.fixture
+def router(tmp_path):
+    shutil.copy(os.path.join(MODELS_DIR, 'diabetes_model.mdl'), tmp_path)
+    os.makedirs(tmp_path / 'candidates')
+    shutil.copy(os.path.join(MODELS_DIR, 'diabetes_model.mdl'), tmp_path / 'candidates' / 'copy.mdl')
+    router = ModelRouter(ModelRegistry(str(tmp_path)))
+    yield router
+    router.close()
+
+
+def _rows(n=20):
+    return np.random.default_rng(0).uniform(1.0, 100.0, (n, get_schema('diabetes').n_features))
+
+
+def test_shadow_agrees_with_an_identical_primary_and_is_counted_as_background(router):
+    router.deploy('diabetes', os.path.join('candidates', 'copy.mdl'), 'copy', MODE_SHADOW)
+    for row in _rows():
+        version, _, _ = router.score('diabetes', row.reshape(1, -1))
+        assert version.version == 'diabetes_model'
+    assert router.flush()
+    versions = router.stats()['deployments']['diabetes']['versions']
+    assert versions['diabetes_model']['requests'] == 20
+    assert versions['diabetes_model']['background']['requests'] == 0
+    assert versions['copy']['requests'] == 0
+    assert versions['copy']['background']['requests'] == 20
+    assert versions['copy']['agreement'] == 1.0
+
+
+def test_primary_runs_behind_a_split_candidate_only_in_background(router):
+    router.deploy('diabetes', os.path.join('candidates', 'copy.mdl'), 'copy', MODE_SPLIT, 0.5)
+    served = [router.score('diabetes', row.reshape(1, -1))[0].version for row in _rows(200)]
+    assert router.flush()
+    versions = router.stats()['deployments']['diabetes']['versions']
+    assert versions['copy']['requests'] == served.count('copy') > 0
+    assert versions['diabetes_model']['requests'] == served.count('diabetes_model') > 0
+    # The primary re-scores the split's requests to measure agreement, in the background only
+    assert versions['diabetes_model']['background']['requests'] == served.count('copy')
+    assert versions['copy']['agreement'] == 1.0
+
+
+def test_promote_and_roll_back(router):
+    registry = router.registry
+    original = registry['diabetes']
+    router.deploy('diabetes', os.path.join('candidates', 'copy.mdl'), 'copy', MODE_SHADOW)
+    router.promote('diabetes', 'copy')
+    deployment = router.deployment('diabetes')
+    assert deployment.primary.version == 'copy'
+    assert registry['diabetes'] is deployment.primary.model is not original
+    assert [(c.version, c.mode) for c in deployment.candidates] == [('diabetes_model', MODE_SHADOW)]
+    assert load_manifest(router.manifest_path)['diabetes']['primary']['version'] == 'copy'
+
+    router.promote('diabetes', 'diabetes_model')
+    assert router.deployment('diabetes').primary.version == 'diabetes_model'
+    assert registry['diabetes'] is original
+    # A restarted router reads the rollback back from the manifest
+    assert ModelRouter(ModelRegistry(router.models_dir)).deployment('diabetes').primary.version == 'diabetes_model'
+
+
+def test_panel_and_sweeps_are_routed(router):
+    router.deploy('diabetes', os.path.join('candidates', 'copy.mdl'), 'copy', MODE_SHADOW)
+    router.promote('diabetes', 'copy')
+    schema = get_schema('diabetes')
+    result = screen({'diabetes': schema.negative_sample}, router.registry, diseases=['diabetes'], router=router)
+    assert result.outcomes[0]['model_version'] == 'copy'
+    assert sweep(None, 'diabetes', schema.negative_sample, ['Glucose'], 20, router=router).model_version == 'copy'
+    assert router.flush()
+    stats = router.stats()['deployments']['diabetes']['versions']
+    assert stats['copy']['requests'] == 2
+    assert stats['diabetes_model']['background']['requests'] == 2
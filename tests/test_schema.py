@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from diagnosis.schema import get_schema
+
+
+@pytest.mark.parametrize('value', ['Male', 'MALE', 'male', ' male '])
+def test_labels_match_case_insensitively_in_records_and_frames(value):
+    feature = get_schema('heart_disease').feature('sex')
+    expected = feature.options['Male']
+    assert feature.encode([value])[0] == expected
+    assert feature.encode_series(pd.Series([value], dtype=object))[0] == expected
+
+
+def test_unknown_label_is_rejected():
+    with pytest.raises(ValueError, match='sex'):
+        get_schema('heart_disease').feature('sex').encode(['unknown'])
+
+
+def test_imputed_codes_are_accepted_only_at_the_preprocessor_value():
+    from diagnosis.preprocess import get_preprocessor
+    from diagnosis.schema import DATASETS_DIR
+
+    schema = get_schema('thyroid')
+    frame = pd.read_csv(f'{DATASETS_DIR}/prepocessed_hypothyroid.csv')
+    X = schema.vectorize_frame(frame)
+    imputed = get_preprocessor('thyroid').means['sex']
+    assert set(X[:, schema.columns.index('sex')]) == {0.0, 1.0, imputed}
+
+    frame.loc[0, 'sex'] = 0.5
+    with pytest.raises(ValueError, match='sex'):
+        schema.vectorize_frame(frame)
+
+
+@pytest.mark.parametrize('value', [0.5, '0.5', 2])
+def test_numbers_that_are_not_codes_are_rejected_in_records(value):
+    with pytest.raises(ValueError, match='sex'):
+        get_schema('thyroid').feature('sex').encode([value])
+
+
+@pytest.mark.parametrize('value', [None, float('nan')])
+def test_missing_categorical_value_is_rejected(value):
+    with pytest.raises(ValueError, match='Missing value for sex'):
+        get_schema('thyroid').feature('sex').encode(['Male', value])
+
+
+@pytest.mark.parametrize('value', [None, float('nan'), float('inf'), '-inf'])
+def test_missing_or_non_finite_number_is_rejected(value):
+    with pytest.raises(ValueError, match='TSH'):
+        get_schema('thyroid').feature('tsh').encode([value])
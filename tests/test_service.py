@@ -0,0 +1,80 @@
+import pytest
+
+from diagnosis import batch
+from diagnosis.registry import get_registry
+from diagnosis.schema import SCHEMAS, get_schema
+from diagnosis.service import create_app
+
+pytestmark = [pytest.mark.filterwarnings('ignore::sklearn.exceptions.InconsistentVersionWarning'),
+              pytest.mark.filterwarnings('ignore:X does not have valid feature names')]
+
+
+@pytest.fixture(scope='module')
+def client():
+    return create_app(preload=False).test_client()
+
+
+@pytest.mark.parametrize('sex', [None, 0.5, '0.5', 'unknown'])
+def test_invalid_categorical_value_is_a_bad_request(client, sex):
+    record = dict(get_schema('thyroid').negative_sample, sex=sex)
+    response = client.post('/predict/thyroid', json=record)
+    assert response.status_code == 400
+    assert 'sex' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('k', ['0', '101', 'five'])
+def test_similar_k_out_of_range_is_a_bad_request(client, k):
+    response = client.post(f'/similar/thyroid?k={k}', json=get_schema('thyroid').negative_sample)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_health_lists_the_models(client):
+    response = client.get('/health')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'ok'
+    assert set(body['models']) == set(SCHEMAS)
+
+
+@pytest.mark.parametrize('name', list(SCHEMAS))
+def test_predict_scores_the_sample_patients(client, name):
+    schema = get_schema(name)
+    response = client.post(f'/predict/{name}', json={'records': [schema.negative_sample, schema.positive_sample]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['model'] == name and body['model_version']
+    model = get_registry()[name]
+    expected, _ = batch.score_array(model, batch.records_to_array(
+        [schema.negative_sample, schema.positive_sample], name, model))
+    assert [result['prediction'] for result in body['results']] == expected.tolist()
+
+
+def test_a_single_record_is_answered_inline(client):
+    response = client.post('/predict/heart_disease', json=get_schema('heart_disease').negative_sample)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['prediction'] in (0, 1)
+    assert 0.0 <= body['probability'] <= 1.0
+    assert 'results' not in body
+
+
+def test_unknown_model_is_not_found(client):
+    response = client.post('/predict/flu', json={})
+    assert response.status_code == 404
+    assert 'diabetes' in response.get_json()['models']
+
+
+@pytest.mark.parametrize('payload', ['"text"', '[1, 2]', '{"records": [{"Glucose": 100}]}'])
+def test_malformed_bodies_are_bad_requests(client, payload):
+    response = client.post('/predict/diabetes', data=payload, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json()['error']
+
+
+def test_stats_and_metrics_count_predictions(client):
+    client.post('/predict/heart_disease', json=get_schema('heart_disease').negative_sample)
+    assert 'heart_disease' in client.get('/stats').get_json()['latency']
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'predictions_total' in response.get_data(as_text=True)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from diagnosis.similar import COMPACT_MIN_ROWS, MAX_K, NeighborIndex, benchmark
+
+K = 7
+
+
+def _clustered_rows(rows, seed):
+    """Rows around a few centres, as the real datasets are, in the 8 diabetes columns"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0.0, 5.0, (12, 8))
+    return centres[rng.integers(0, len(centres), rows)] + rng.normal(0.0, 1.0, (rows, 8))
+
+
+def _brute_force(index, X, ids, queries, k):
+    Z, Q = index.standardize(X).astype(np.float64), index.standardize(queries).astype(np.float64)
+    distances = np.sqrt(((Q[:, None, :] - Z[None, :, :]) ** 2).sum(axis=2))
+    order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    return ids[order], np.take_along_axis(distances, order, axis=1)
+
+
+def _assert_exact(index, X, ids, queries, k=K):
+    expected_ids, expected_distances = _brute_force(index, X, ids, queries, k)
+    found_ids, found_distances, _, _ = index.query(queries, k)
+    np.testing.assert_allclose(found_distances, expected_distances, rtol=1e-4, atol=1e-5)
+    np.testing.assert_array_equal(found_ids, expected_ids)
+
+
+@pytest.fixture
+def data():
+    X = _clustered_rows(5000, seed=0)
+    return X, (X[:, 0] > 0).astype(np.int64)
+
+
+def test_query_matches_brute_force(data):
+    X, y = data
+    index = NeighborIndex.build('diabetes', X, y)
+    queries = _clustered_rows(50, seed=1)
+    _assert_exact(index, X, np.arange(len(X)), queries)
+
+
+def test_query_far_from_every_cluster_matches_brute_force(data):
+    X, y = data
+    index = NeighborIndex.build('diabetes', X, y)
+    _assert_exact(index, X, np.arange(len(X)), np.full((3, 8), 40.0))
+
+
+def test_inserted_rows_are_searched_before_and_after_compaction(data):
+    X, y = data
+    index = NeighborIndex.build('diabetes', X, y)
+    added = _clustered_rows(200, seed=2)
+    new_ids = index.insert(added, np.ones(len(added), dtype=np.int64))
+    assert index.delta_rows == len(added)
+    all_X, all_ids = np.vstack([X, added]), np.concatenate([np.arange(len(X)), new_ids])
+    queries = added[:20] + 0.01
+    _assert_exact(index, all_X, all_ids, queries)
+
+    more = _clustered_rows(COMPACT_MIN_ROWS + 1, seed=3)
+    more_ids = index.insert(more, np.zeros(len(more), dtype=np.int64))
+    assert index.delta_rows == 0
+    _assert_exact(index, np.vstack([all_X, more]), np.concatenate([all_ids, more_ids]), queries)
+
+
+def test_saved_index_answers_like_the_built_one(data, tmp_path):
+    X, y = data
+    path = NeighborIndex.build('diabetes', X, y).save(str(tmp_path / 'diabetes.idx'))
+    loaded = NeighborIndex.load(path)
+    added = _clustered_rows(100, seed=4)
+    new_ids = loaded.insert(added, np.ones(len(added), dtype=np.int64))
+    reopened = NeighborIndex.load(path)
+    assert reopened.delta_rows == len(added)
+    _assert_exact(reopened, np.vstack([X, added]), np.concatenate([np.arange(len(X)), new_ids]),
+                  _clustered_rows(30, seed=5))
+
+
+def test_benchmark_check_finds_no_mismatches():
+    assert benchmark('heart_disease', 20000, queries=50, check=50)['mismatches'] == 0
+
+
+@pytest.mark.parametrize('k', [0, -1, MAX_K + 1])
+def test_k_out_of_range_is_rejected(data, k):
+    X, y = data
+    with pytest.raises(ValueError, match='k must be'):
+        NeighborIndex.build('diabetes', X, y).query(X[:1], k)
@@ -0,0 +1,48 @@
+import io
+
+import numpy as np
+import pytest
+
+from diagnosis.voice import VERIFY_CASES, VERIFY_COLUMNS, extract, synthesize, write_wav
+
+CLEAN_CASES = [case for case in VERIFY_CASES if case.get('noise_db') is None]
+
+
+def _recording(tmp_path, seed=0, **case):
+    samples, truth = synthesize(seconds=3.0, seed=seed, **case)
+    path = str(tmp_path / f'vowel{seed}.wav')
+    write_wav(path, samples)
+    return path, truth
+
+
+@pytest.mark.parametrize('case', CLEAN_CASES, ids=lambda case: f"{case['f0']:g}Hz-{case['jitter']}-{case['shimmer']}")
+def test_known_jitter_and_shimmer_are_recovered(tmp_path, case):
+    path, truth = _recording(tmp_path, **case)
+    features, summary = extract(path)
+    for column in VERIFY_COLUMNS:
+        assert features[column] == pytest.approx(truth[column], rel=0.1), column
+    assert features['MDVP:Fo(Hz)'] == pytest.approx(case['f0'], rel=0.02)
+    assert summary['voiced_fraction'] > 0.9
+
+
+def test_chunk_size_does_not_change_the_measures(tmp_path):
+    path, _ = _recording(tmp_path, f0=150.0, jitter=0.005, shimmer=0.04)
+    whole, _ = extract(path, chunk_seconds=10.0)
+    streamed, _ = extract(path, chunk_seconds=0.25)
+    for column in VERIFY_COLUMNS:
+        assert streamed[column] == pytest.approx(whole[column], rel=1e-6), column
+
+
+def test_file_objects_and_paths_agree(tmp_path):
+    path, _ = _recording(tmp_path, f0=220.0, jitter=0.002, shimmer=0.02)
+    with open(path, 'rb') as fh:
+        from_bytes, _ = extract(io.BytesIO(fh.read()))
+    from_path, _ = extract(path)
+    assert from_bytes == from_path
+
+
+def test_silence_is_rejected(tmp_path):
+    path = str(tmp_path / 'silence.wav')
+    write_wav(path, np.zeros(44100 * 2))
+    with pytest.raises(ValueError):
+        extract(path)